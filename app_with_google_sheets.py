@@ -7,51 +7,138 @@
 import streamlit as st
 import pandas as pd
 from html_to_excel import (
-    parse_html_transactions,
-    create_daily_summary,
+    parse_many,
     create_detailed_transactions_df,
-    create_items_summary_df
+    create_items_summary_df,
+    write_excel_sheets
 )
 from google_sheets_connector import (
     init_gsheets_connection,
-    get_cloud_history,
-    save_to_cloud,
-    transactions_to_flat_df,
-    cloud_data_to_transactions,
-    check_connection_status,
-    clear_cloud_cache
+    get_spreadsheet_url,
+    open_worksheet,
+    get_manifest_key,
+    get_sheet_mirror,
+    check_connection_status
 )
+from local_history import LocalHistory, SheetReplicator, ReplicationWorker
+from parse_cache import ParseCache
+from rollup_cube import week_starts
+from categories import CategoryClassifier
+from dataset import Dataset
+from transaction_store import TransactionStore
+from basket_engine import BasketEngine
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 import io
+import time
 
 # ============================================================
 # CACHED FUNCTIONS - לשיפור ביצועים
 # ============================================================
 
-def get_transactions_hash(transactions):
-    """יצירת hash מרשימת טרנזקציות לצורך cache key"""
-    if not transactions:
-        return "empty"
-    # יצירת מחרוזת ייחודית מהנתונים
-    key_parts = [f"{t['order_id']}_{t['date']}_{t['total']}" for t in transactions]
-    return hash(tuple(key_parts))
+def get_upload_key(uploaded_files):
+    """מזהה לקבוצת הקבצים שהועלו - file_id של Streamlit, או שם וגודל"""
+    return tuple(getattr(f, 'file_id', None) or (f.name, len(f.getvalue())) for f in uploaded_files)
+
+@st.cache_resource
+def get_parse_cache():
+    """cache פענוח קבוע על הדיסק - משותף לכל הסשנים"""
+    return ParseCache()
+
+@st.cache_resource
+def get_local_history():
+    """ההיסטוריה המקומית (SQLite) - מקור הנתונים הראשי, משותף לכל הסשנים"""
+    return LocalHistory()
+
+@st.cache_resource
+def get_replication_worker(_history, sheet_name="History"):
+    """
+    סנכרון רקע של ההיסטוריה המקומית מול הגיליון - worker אחד לתהליך (מופעל ב-start).
+    ה-client וה-URL נקראים כאן, ב-thread של הסקריפט; ה-thread של ה-worker פותח את הגיליון
+    בלי st ובלי cache, ושגיאות מגיעות רק ל-worker.last_error
+    """
+    gc = init_gsheets_connection()
+    spreadsheet_url = get_spreadsheet_url()
+    return ReplicationWorker(SheetReplicator(_history, lambda: open_worksheet(gc, spreadsheet_url, sheet_name),
+                                             get_manifest_key(sheet_name), mirror=get_sheet_mirror()))
+
+def format_age(seconds):
+    """זמן שעבר בניסוח קצר - לפני N שניות / דקות / שעות"""
+    if seconds < 60:
+        return f"לפני {int(seconds)} שניות"
+    if seconds < 3600:
+        return f"לפני {int(seconds // 60)} דקות"
+    return f"לפני {int(seconds // 3600)} שעות"
+
+@st.fragment(run_every=5)
+def sync_status_indicator(worker, history, shown_revision):
+    """
+    מצב הסנכרון ברקע - מתעדכן כל 5 שניות בלי להריץ את כל הדף.
+    כשמחזור ברקע שינה את ההיסטוריה, הדף כולו רץ מחדש ומחליף לגרסה החדשה
+    """
+    if history.revision != shown_revision and not worker.refreshing:
+        st.rerun()
 
-@st.cache_data(ttl=600, show_spinner=False)
-def cached_create_daily_summary(cache_key, _transactions):
-    """יצירת סיכום יומי עם cache"""
-    return create_daily_summary(_transactions)
+    pending = history.pending_count()
+    if worker.refreshing:
+        st.caption("🔄 מתרענן מהענן ברקע...")
+    elif worker.last_error:
+        st.warning(f"⚠️ הסנכרון לענן נכשל: {worker.last_error}")
+    elif worker.last_success is None:
+        st.caption("⏳ ממתין לסנכרון ראשון מהענן...")
+    elif pending:
+        st.caption(f"⏳ {pending} עסקאות ממתינות להעלאה לענן")
+    else:
+        st.caption(f"☁️ עודכן {format_age(time.time() - worker.last_success)}")
 
 @st.cache_data(ttl=600, show_spinner=False)
-def cached_create_trans_df(cache_key, _transactions):
+def cached_create_trans_df(cache_key, _store):
     """יצירת DataFrame טרנזקציות עם cache"""
-    return create_detailed_transactions_df(_transactions)
+    trans_df = create_detailed_transactions_df(_store)
+    trans_df['Date'] = pd.to_datetime(trans_df['Date'])
+    # שבוע ישראלי - מתחיל ביום ראשון
+    trans_df['WeekStart'] = pd.to_datetime(week_starts(trans_df['Date'].to_numpy()))
+    return trans_df
 
 @st.cache_data(ttl=600, show_spinner=False)
-def cached_create_items_df(cache_key, _transactions):
+def cached_create_items_df(cache_key, _store):
     """יצירת DataFrame פריטים עם cache"""
-    return create_items_summary_df(_transactions)
+    return create_items_summary_df(_store)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def cached_excel_report(cache_key, _daily_df, _trans_df, _items_df):
+    """קובץ Excel מלא (write-only, בזרימה) עם cache"""
+    output = io.BytesIO()
+    write_excel_sheets(output, [
+        ('דוח יומי', _daily_df, 15),
+        ('טרנזקציות', _trans_df, 14),
+        ('פריטים', _items_df, [30] + [15] * (len(_items_df.columns) - 1)),
+    ])
+    return output.getvalue()
+
+@st.cache_resource
+def get_category_classifier(categories):
+    """מסווג ליעדי הקטגוריות (tuple של שמות) - נשמר עם הסריקות של כל שמות הפריטים שכבר נראו"""
+    return CategoryClassifier.from_names(categories)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def cached_time_profile(cache_key, bucket_minutes, _store):
+    """פרופיל שעות, ימים ומפת חום עם cache לפי טווח וגודל חלון"""
+    return _store.time_profile(bucket_minutes)
+
+@st.cache_resource(ttl=600, show_spinner=False)
+def cached_basket_engine(cache_key, _store):
+    """מנוע סל קניות (מטריצה דלילה) עם cache לפי fingerprint"""
+    return BasketEngine.from_store(_store)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def cached_basket_rules(cache_key, min_support, min_confidence, _store):
+    """סלים שכיחים של 3+ מוצרים וכללי הקשר שלהם עם cache לפי fingerprint וסף - כרייה אחת לשניהם"""
+    engine = cached_basket_engine(cache_key, _store)
+    itemsets = engine.frequent_itemsets(min_support)
+    rules = engine.association_rules(min_support, min_confidence, min_size=3, itemsets=itemsets)
+    return itemsets[itemsets['size'] >= 3].reset_index(drop=True), rules
 
 # Page Configuration
 st.set_page_config(
@@ -75,9 +162,6 @@ if 'goals' not in st.session_state:
 if 'data_source' not in st.session_state:
     st.session_state.data_source = 'html'
 
-if 'transactions' not in st.session_state:
-    st.session_state.transactions = []
-
 if 'cloud_connected' not in st.session_state:
     st.session_state.cloud_connected = False
 
@@ -110,6 +194,24 @@ if data_source in ['cloud', 'combined']:
         if connection_status['connected']:
             st.success("✅ מחובר ל-Google Sheets")
             st.session_state.cloud_connected = True
+            if connection_status.get('error'):
+                st.warning(connection_status['error'])
+
+            if connection_status.get('latency_ms') is not None:
+                headroom = connection_status['quota_headroom']
+                quota_text = (f" · מכסה פנויה: {headroom['read']}/{headroom['read_per_minute']} קריאות"
+                              if headroom else "")
+                st.caption(f"זמן תגובה: {connection_status['latency_ms']:,.0f} ms · "
+                           f"נבדק {format_age(connection_status['checked_seconds_ago'])}{quota_text}")
+
+            # מוני SheetsClient - כל הבקשות של התהליך
+            metrics = getattr(init_gsheets_connection(), 'metrics', None)
+            if metrics:
+                st.caption(
+                    f"בקשות API: {metrics['calls']} · ניסיונות חוזרים: {metrics['retries']} · "
+                    f"429: {metrics['rate_limited']} · מאוחדות: {metrics['coalesced']} · "
+                    f"התקבלו {metrics['bytes_received'] / 1024:,.0f} KB"
+                )
         else:
             st.error("❌ לא מחובר")
             st.session_state.cloud_connected = False
@@ -132,91 +234,121 @@ if data_source in ['html', 'combined']:
     )
 
 # Data Loading
-transactions = []
-html_transactions = []
-cloud_transactions = []
+html_count = 0
+cloud_store = None
+upload_key = None
 
-# Load from HTML
+# Load from HTML - כל קובץ מפוענח פעם אחת ל-TransactionStore; נשמר ב-session לפי מזהה הקובץ
 if data_source in ['html', 'combined'] and uploaded_files:
-    for uploaded_file in uploaded_files:
-        try:
-            html_content = uploaded_file.read().decode('utf-8')
-            file_transactions = parse_html_transactions(html_content)
-            html_transactions.extend(file_transactions)
-        except Exception as e:
-            st.sidebar.error(f"❌ שגיאה: {str(e)}")
-
-    if html_transactions:
-        st.sidebar.success(f"✅ {len(html_transactions)} טרנזקציות מ-HTML")
-
-# Load from Cloud - with session state caching
-if data_source in ['cloud', 'combined'] and st.session_state.cloud_connected:
-    # בדוק אם כבר יש נתונים ב-session state
-    cache_key = 'cloud_transactions_cache'
-
-    if cache_key not in st.session_state or st.session_state.get('force_reload', False):
-        with st.spinner("טוען מהענן..."):
-            cloud_df = get_cloud_history()
-            if not cloud_df.empty:
-                cloud_transactions = cloud_data_to_transactions(cloud_df)
-                st.session_state[cache_key] = cloud_transactions
-                st.session_state['force_reload'] = False
-            else:
-                st.session_state[cache_key] = []
-
-    cloud_transactions = st.session_state.get(cache_key, [])
-    if cloud_transactions:
-        st.sidebar.success(f"✅ {len(cloud_transactions)} טרנזקציות מהענן")
-
-# Combine transactions
-if data_source == 'html':
-    transactions = html_transactions
-elif data_source == 'cloud':
-    transactions = cloud_transactions
-else:
-    all_trans = html_transactions + cloud_transactions
-    seen = set()
-    for t in all_trans:
-        if t['order_id'] not in seen:
-            transactions.append(t)
-            seen.add(t['order_id'])
-
-st.session_state.transactions = transactions
-
-# Cloud Sync Button
-if data_source == 'combined' and html_transactions and st.session_state.cloud_connected:
+    upload_key = get_upload_key(uploaded_files)
+    parsed_files = st.session_state.setdefault('html_parsed_files', {})
+    for uploaded_file, file_key in zip(uploaded_files, upload_key):
+        if file_key not in parsed_files:
+            file_transactions, file_errors = parse_many([uploaded_file], cache=get_parse_cache())
+            parsed_files[file_key] = (TransactionStore.from_transactions(file_transactions), file_errors)
+    for file_key in [key for key in parsed_files if key not in upload_key]:
+        del parsed_files[file_key]
+
+    for file_key in upload_key:
+        for file_name, error in parsed_files[file_key][1]:
+            st.sidebar.error(f"❌ שגיאה ב-{file_name}: {error}")
+
+    html_count = sum(len(parsed_files[file_key][0]) for file_key in upload_key)
+    if html_count:
+        st.sidebar.success(f"✅ {html_count} טרנזקציות מ-HTML")
+
+# Load from local history - ההיסטוריה המקומית היא המקור; הגיליון מסונכרן אליה ברקע
+history = None
+replication_worker = None
+if data_source in ['cloud', 'combined']:
+    history = get_local_history()
+
+    if st.session_state.cloud_connected:
+        # הסנכרון רץ ברקע גם בפעם הראשונה - הממשק לא ממתין לגיליון
+        replication_worker = get_replication_worker(history).start()
+
+    # קריאה מחדש רק כשההיסטוריה השתנתה (revision) - קודם מה-snapshot שה-worker כבר טען
+    history_revision = history.revision
+    cached_history = st.session_state.get('local_history_cache')
+    if cached_history is None or cached_history[0] != history_revision:
+        snapshot = replication_worker.snapshot if replication_worker is not None else None
+        if snapshot is not None and snapshot[0] == history_revision:
+            _, history_store = snapshot
+        else:
+            history_store = history.load_store()
+        cached_history = (history_revision, history_store if len(history_store) else None)
+        st.session_state['local_history_cache'] = cached_history
+
+    _, cloud_store = cached_history
+    if cloud_store is not None:
+        st.sidebar.success(f"✅ {len(cloud_store)} טרנזקציות מההיסטוריה")
+
+    if replication_worker is not None:
+        with st.sidebar:
+            sync_status_indicator(replication_worker, history, history_revision)
+
+# Combine transactions - Dataset אחד ב-session: הבסיס (ענן או ריק) נבנה פעם אחת,
+# וקבצי HTML חדשים ממוזגים אליו אינקרמנטלית. HTML גובר על הענן באותה הזמנה
+dataset_base_key = (data_source, cloud_store.fingerprint if cloud_store is not None else None)
+dataset_state = st.session_state.get('dataset_state')
+merged_keys = dataset_state['merged'] if dataset_state else []
+
+if (dataset_state is None or dataset_state['base_key'] != dataset_base_key
+        or any(file_key not in (upload_key or ()) for file_key in merged_keys)):
+    if cloud_store is not None:
+        base_dataset = Dataset(cloud_store)
+    else:
+        base_dataset = Dataset.from_transactions([])
+    dataset_state = {'base_key': dataset_base_key, 'merged': [], 'dataset': base_dataset}
+    st.session_state['dataset_state'] = dataset_state
+
+dataset = dataset_state['dataset']
+pending_keys = [file_key for file_key in (upload_key or ()) if file_key not in dataset_state['merged']]
+if pending_keys:
+    added_ids, updated_ids = dataset.merge(TransactionStore.concat(
+        st.session_state['html_parsed_files'][file_key][0] for file_key in pending_keys
+    ))
+    if dataset_state['merged'] or cloud_store is not None:
+        st.sidebar.info(f"🔄 מוזגו {len(added_ids)} הזמנות חדשות, {len(updated_ids)} עודכנו")
+    dataset_state['merged'] = dataset_state['merged'] + pending_keys
+
+store = dataset.store
+cube = dataset.cube
+dataset_store = store
+
+# Save Button - קליטה להיסטוריה המקומית; ההעלאה לענן ברקע
+if data_source == 'combined' and html_count:
     st.sidebar.markdown("---")
-    if st.sidebar.button("📤 שמור לענן", type="primary"):
+    if st.sidebar.button("📤 שמור להיסטוריה ולענן", type="primary"):
         with st.spinner("שומר..."):
-            flat_df = transactions_to_flat_df(html_transactions)
-            added = save_to_cloud(flat_df)
-            if added > 0:
-                clear_cloud_cache()  # ניקוי cache אחרי שמירה
-                st.sidebar.success(f"✅ נוספו {added} רשומות!")
+            html_store = TransactionStore.concat(
+                st.session_state['html_parsed_files'][file_key][0] for file_key in upload_key)
+            added, updated = history.ingest_store(html_store)
+            if added or updated:
+                if replication_worker is not None:
+                    replication_worker.trigger()
+                st.sidebar.success(f"✅ נשמרו {len(added)} עסקאות חדשות, {len(updated)} עודכנו")
                 st.rerun()
             else:
                 st.sidebar.info("אין רשומות חדשות")
 
-# Refresh button for cloud data
-if data_source in ['cloud', 'combined'] and st.session_state.cloud_connected:
-    if st.sidebar.button("🔄 רענן נתונים מהענן"):
-        clear_cloud_cache()
-        st.session_state['force_reload'] = True
-        if 'cloud_transactions_cache' in st.session_state:
-            del st.session_state['cloud_transactions_cache']
-        st.rerun()
+# Refresh button for cloud data - מחזור סנכרון ברקע; הנתונים הנוכחיים נשארים מוצגים
+if replication_worker is not None:
+    if st.sidebar.button("🔄 רענן נתונים מהענן", disabled=replication_worker.refreshing):
+        replication_worker.trigger()
+        st.sidebar.caption("🔄 הרענון התחיל ברקע")
 
 # DATE FILTER SECTION
 start_date = None
 end_date = None
 
-if transactions:
+if len(dataset_store):
     st.sidebar.markdown("---")
     st.sidebar.markdown("## 📅 סינון תאריכים")
 
-    all_dates = [t['date'] for t in transactions]
-    min_date = min(all_dates)
-    max_date = max(all_dates)
+    store_days = store.day_index()
+    min_date = pd.Timestamp(store_days[0]).date()
+    max_date = pd.Timestamp(store_days[-1]).date()
 
     filter_option = st.sidebar.selectbox(
         "בחר תקופה מהירה:",
@@ -310,16 +442,14 @@ if transactions:
         st.sidebar.error("⚠️ תאריך התחלה חייב להיות לפני תאריך סיום")
         start_date, end_date = end_date, start_date
 
-    filtered_transactions = [t for t in transactions if start_date <= t['date'] <= end_date]
+    store = dataset.date_slice(start_date, end_date)
 
-    if len(filtered_transactions) == 0:
+    if len(store) == 0:
         st.sidebar.warning(f"⚠️ אין נתונים בטווח התאריכים הנבחר")
-    elif len(filtered_transactions) != len(transactions):
-        st.sidebar.info(f"🔍 מוצגות {len(filtered_transactions)} מתוך {len(transactions)} טרנזקציות")
+    elif len(store) != len(dataset_store):
+        st.sidebar.info(f"🔍 מוצגות {len(store)} מתוך {len(dataset_store)} טרנזקציות")
     else:
-        st.sidebar.success(f"📊 מוצגות כל {len(transactions)} הטרנזקציות")
-
-    transactions = filtered_transactions
+        st.sidebar.success(f"📊 מוצגות כל {len(store)} הטרנזקציות")
 
 # Sidebar - Goals Settings
 st.sidebar.markdown("---")
@@ -349,7 +479,7 @@ st.sidebar.metric("הכנסה חודשית", f"₪ {st.session_state.goals['reve
 st.sidebar.metric("הכנסה שבועית", f"₪ {st.session_state.goals['revenue_weekly']:,.0f}")
 
 # Main Content
-if not transactions:
+if not len(dataset_store):
     st.info("👈 בחר מקור נתונים והעלה קבצים או התחבר לענן")
 
     with st.expander("📚 הוראות הגדרה", expanded=True):
@@ -358,7 +488,7 @@ if not transactions:
         
         צור קובץ `.streamlit/secrets.toml` עם credentials של Google Service Account.
         """)
-elif len(transactions) == 0:
+elif len(store) == 0:
     st.warning("⚠️ אין נתונים בטווח התאריכים הנבחר. נסה לבחור טווח תאריכים אחר.")
 else:
     # Display Filter Status Bar
@@ -370,33 +500,24 @@ else:
         days_in_range = (end_date - start_date).days + 1
         st.metric("📆 ימים", f"{days_in_range}")
     with filter_col3:
-        st.metric("🔢 טרנזקציות", f"{len(transactions):,}")
+        st.metric("🔢 טרנזקציות", f"{len(store):,}")
     with filter_col4:
         source_label = {'html': 'HTML', 'cloud': 'ענן', 'combined': 'משולב'}[data_source]
         st.metric("📁 מקור", source_label)
 
     st.markdown("---")
 
-    # Create cache key from filtered transactions
-    cache_key = get_transactions_hash(transactions)
-
-    # Create DataFrames with caching
-    daily_df = cached_create_daily_summary(cache_key, transactions)
-    if 'date' in daily_df.columns:
-        daily_df = daily_df.copy()
-        daily_df['date'] = pd.to_datetime(daily_df['date'])
+    # מפתח ה-cache הוא ה-fingerprint של הנתונים המסוננים - בלי מעבר על העסקאות בכל rerun
+    cache_key = store.fingerprint
 
-    trans_df = cached_create_trans_df(cache_key, transactions)
-    trans_df = trans_df.copy()
-    items_df = cached_create_items_df(cache_key, transactions)
+    # סיכומי התקופה מהקובייה - חיתוך טווח ימים, בלי מעבר על העסקאות
+    daily_df = cube.daily(start_date, end_date)
+    weekly_df_cube = cube.weekly(start_date, end_date)
+    period_totals = cube.totals(start_date, end_date)
 
-    trans_df['Date'] = pd.to_datetime(trans_df['Date'])
-    # שבוע ישראלי - מתחיל ביום ראשון
-    # weekday(): Monday=0, Sunday=6
-    # נחשב כמה ימים עברו מיום ראשון: (weekday + 1) % 7
-    trans_df['WeekStart'] = trans_df['Date'] - trans_df['Date'].dt.weekday.apply(
-        lambda x: pd.Timedelta(days=(x + 1) % 7)
-    )
+    # Create DataFrames with caching
+    trans_df = cached_create_trans_df(cache_key, store)
+    items_df = cached_create_items_df(cache_key, store)
 
     monthly_goal = st.session_state.goals['revenue_monthly']
 
@@ -412,13 +533,14 @@ else:
         st.markdown("### 📈 דוח יומי")
 
         col1, col2, col3, col4 = st.columns(4)
-        daily_total = trans_df['Total Amount'].sum()
+        daily_total = period_totals['revenue']
+        period_trans_count = period_totals['transactions']
         achievement = (daily_total / monthly_goal * 100) if monthly_goal > 0 else 0
 
         col1.metric("סה״כ הכנסה", f"₪ {daily_total:,.0f}", f"{achievement:.1f}% מהיעד")
         col2.metric("ממוצע יומי", f"₪ {daily_total / max(len(daily_df), 1):,.0f}")
-        col3.metric("מספר עסקאות", f"{len(trans_df):,}")
-        col4.metric("ממוצע לעסקה", f"₪ {daily_total / max(len(trans_df), 1):,.0f}")
+        col3.metric("מספר עסקאות", f"{period_trans_count:,}")
+        col4.metric("ממוצע לעסקה", f"₪ {daily_total / max(period_trans_count, 1):,.0f}")
 
         st.markdown("---")
 
@@ -483,24 +605,22 @@ else:
     with tab4:
         st.markdown("### 📉 ניתוח מתקדם")
 
-        weeks = sorted(trans_df['WeekStart'].unique())
+        weeks = weekly_df_cube['week_start'].tolist()
 
         if weeks:
             weekly_stats = []
-            for i, week in enumerate(weeks, 1):
-                week_data = trans_df[trans_df['WeekStart'] == week]
-                rev = week_data['Total Amount'].sum()
+            for i, (week, rev, count) in enumerate(zip(weeks, weekly_df_cube['revenue'], weekly_df_cube['transactions']), 1):
                 weekly_stats.append({
                     'שבוע': f'שבוע {i}', 'תאריך': week.strftime('%d/%m/%Y'),
-                    'הכנסה': rev, 'עסקאות': len(week_data),
+                    'הכנסה': rev, 'עסקאות': count,
                     'תרומה ליעד (%)': (rev / monthly_goal * 100) if monthly_goal > 0 else 0
                 })
 
             col1, col2, col3, col4 = st.columns(4)
             col1.metric("שבועות", len(weeks))
             col2.metric("שבוע מוביל", max(weekly_stats, key=lambda x: x['הכנסה'])['שבוע'])
-            col3.metric("סה״כ", f"₪ {trans_df['Total Amount'].sum():,.0f}")
-            col4.metric("ממוצע שבועי", f"₪ {trans_df['Total Amount'].sum() / max(len(weeks), 1):,.0f}")
+            col3.metric("סה״כ", f"₪ {period_totals['revenue']:,.0f}")
+            col4.metric("ממוצע שבועי", f"₪ {period_totals['revenue'] / max(len(weeks), 1):,.0f}")
 
             st.markdown("---")
             weekly_df = pd.DataFrame(weekly_stats)
@@ -522,17 +642,12 @@ else:
     with tab5:
         st.markdown("## 📅 השוואת חודשים")
 
-        # Get all transactions (not filtered) for comparison
-        all_trans_for_comparison = st.session_state.transactions
-
-        if not all_trans_for_comparison:
+        # כל הנתונים (לא המסוננים) להשוואה
+        if not len(dataset_store):
             st.warning("אין נתונים להשוואה")
         else:
-            # Get available months from all data
-            all_dates = [t['date'] for t in all_trans_for_comparison]
-
-            # Create month options
-            months_available = sorted(set((d.year, d.month) for d in all_dates), reverse=True)
+            # Create month options - מאינדקס התאריכים של כל הנתונים
+            months_available = dataset_store.months()[::-1]
 
             if len(months_available) < 2:
                 st.warning("נדרשים לפחות 2 חודשים של נתונים להשוואה")
@@ -573,20 +688,23 @@ else:
                     )
                     previous_month = months_available[previous_month_idx]
 
-                # Filter transactions for each month
-                def get_month_transactions(transactions, year, month):
-                    return [t for t in transactions if t['date'].year == year and t['date'].month == month]
+                # טווח הימים של כל חודש - כל ההשוואות נענות מהקובייה של כל הנתונים
+                def get_month_range(year, month):
+                    month_start = pd.Timestamp(year=year, month=month, day=1)
+                    return month_start, month_start + pd.offsets.MonthEnd(0)
 
-                current_trans = get_month_transactions(all_trans_for_comparison, current_month[0], current_month[1])
-                previous_trans = get_month_transactions(all_trans_for_comparison, previous_month[0], previous_month[1])
+                current_range = get_month_range(current_month[0], current_month[1])
+                previous_range = get_month_range(previous_month[0], previous_month[1])
+                current_totals = cube.totals(*current_range)
+                previous_totals = cube.totals(*previous_range)
 
                 st.markdown("---")
 
                 # === REVENUE COMPARISON ===
                 st.markdown("### 💰 השוואת הכנסות")
 
-                current_revenue = sum(t['total'] for t in current_trans)
-                previous_revenue = sum(t['total'] for t in previous_trans)
+                current_revenue = current_totals['revenue']
+                previous_revenue = previous_totals['revenue']
 
                 revenue_diff = current_revenue - previous_revenue
                 revenue_pct_change = ((current_revenue / previous_revenue) - 1) * 100 if previous_revenue > 0 else 0
@@ -648,8 +766,8 @@ else:
                 # === TRANSACTIONS COMPARISON ===
                 st.markdown("### 🧾 השוואת עסקאות")
 
-                current_trans_count = len(current_trans)
-                previous_trans_count = len(previous_trans)
+                current_trans_count = current_totals['transactions']
+                previous_trans_count = previous_totals['transactions']
                 trans_diff = current_trans_count - previous_trans_count
                 trans_pct_change = ((current_trans_count / previous_trans_count) - 1) * 100 if previous_trans_count > 0 else 0
 
@@ -680,27 +798,10 @@ else:
                 # Define categories to track
                 categories = list(st.session_state.goals['category_monthly'].keys())
 
-                # Calculate category totals for each month
-                def get_category_stats(transactions, categories):
-                    stats = {}
-                    for cat in categories:
-                        count = sum(
-                            item['quantity']
-                            for t in transactions
-                            for item in t['items']
-                            if cat in item['name']
-                        )
-                        revenue = sum(
-                            item['total_price']
-                            for t in transactions
-                            for item in t['items']
-                            if cat in item['name']
-                        )
-                        stats[cat] = {'quantity': count, 'revenue': revenue}
-                    return stats
-
-                current_cat_stats = get_category_stats(current_trans, categories)
-                previous_cat_stats = get_category_stats(previous_trans, categories)
+                # Calculate category totals for each month - פריט נספר בכל קטגוריה ששמה מוכל בשמו
+                classifier = get_category_classifier(tuple(categories))
+                current_cat_stats = cube.category_totals(classifier, *current_range).to_dict('index')
+                previous_cat_stats = cube.category_totals(classifier, *previous_range).to_dict('index')
 
                 # Create comparison dataframe
                 category_comparison = []
@@ -799,23 +900,12 @@ else:
                 # === TOP PRODUCTS COMPARISON ===
                 st.markdown("### 🏆 השוואת מוצרים מובילים")
 
-                # Get top products for each month
-                def get_top_products(transactions, n=10):
-                    products = {}
-                    for t in transactions:
-                        for item in t['items']:
-                            name = item['name']
-                            if name not in products:
-                                products[name] = {'quantity': 0, 'revenue': 0}
-                            products[name]['quantity'] += item['quantity']
-                            products[name]['revenue'] += item['total_price']
-
-                    # Sort by revenue
-                    sorted_products = sorted(products.items(), key=lambda x: x[1]['revenue'], reverse=True)
-                    return dict(sorted_products[:n])
+                # Get top products for each month - ממוינים לפי הכנסה
+                def get_top_products(month_range, n=10):
+                    return cube.item_totals(*month_range).head(n).to_dict('index')
 
-                current_top = get_top_products(current_trans, 10)
-                previous_top = get_top_products(previous_trans, 10)
+                current_top = get_top_products(current_range, 10)
+                previous_top = get_top_products(previous_range, 10)
 
                 # Combine unique products
                 all_top_products = set(current_top.keys()) | set(previous_top.keys())
@@ -853,65 +943,53 @@ else:
         st.markdown("## 🕐 ניתוח שעות שיא")
         st.info("ניתוח דפוסי מכירות לפי שעות ביום וימים בשבוע - לאופטימיזציה של משמרות ושיווק")
 
-        if not transactions:
+        if len(store) == 0:
             st.warning("אין נתונים לניתוח")
         else:
-            # Prepare hourly data
-            hourly_data = []
-            daily_data_by_day = []
-
-            day_names_heb = {
-                6: 'ראשון', 0: 'שני', 1: 'שלישי', 2: 'רביעי',
-                3: 'חמישי', 4: 'שישי', 5: 'שבת'
-            }
-
-            for t in transactions:
-                if t['time']:
-                    hour = t['time'].hour
-                    # Get day of week (Sunday = 0 in Israeli week)
-                    day_num = (t['date'].weekday() + 1) % 7
-                    day_name = day_names_heb.get(t['date'].weekday(), 'לא ידוע')
-
-                    hourly_data.append({
-                        'hour': hour,
-                        'day_num': day_num,
-                        'day_name': day_name,
-                        'revenue': t['total'],
-                        'items': len(t['items'])
-                    })
+            bucket_minutes = st.radio(
+                "גודל חלון זמן:",
+                options=[60, 30, 15],
+                format_func=lambda m: f"{m} דקות",
+                horizontal=True,
+                key='peak_bucket_minutes'
+            )
+
+            # Prepare hourly data - מעבר אחד: (יום בשבוע × חלון זמן), ראשון = 0 בשבוע הישראלי
+            profile = cached_time_profile(cache_key, bucket_minutes, store)
+            buckets_df = profile['buckets']
 
-            if hourly_data:
-                hourly_df = pd.DataFrame(hourly_data)
+            if not buckets_df.empty:
 
                 # === HOURLY SUMMARY ===
                 st.markdown("### ⏰ סיכום לפי שעות")
 
-                hourly_summary = hourly_df.groupby('hour').agg({
-                    'revenue': ['sum', 'count', 'mean']
-                }).round(2)
-                hourly_summary.columns = ['סה״כ הכנסה', 'מספר עסקאות', 'ממוצע לעסקה']
-                hourly_summary = hourly_summary.reset_index()
-                hourly_summary.columns = ['שעה', 'סה״כ הכנסה', 'מספר עסקאות', 'ממוצע לעסקה']
+                hourly_summary = pd.DataFrame({
+                    'שעה': buckets_df['label'],
+                    'סה״כ הכנסה': buckets_df['revenue'].round(2),
+                    'מספר עסקאות': buckets_df['transactions'],
+                    'ממוצע לעסקה': buckets_df['avg'].round(2)
+                })
 
                 # Find peak hours
                 peak_hour = hourly_summary.loc[hourly_summary['סה״כ הכנסה'].idxmax(), 'שעה']
                 peak_revenue = hourly_summary['סה״כ הכנסה'].max()
                 low_hour = hourly_summary.loc[hourly_summary['סה״כ הכנסה'].idxmin(), 'שעה']
+                bucket_hours = buckets_df['start_minute'] // 60
 
                 col_h1, col_h2, col_h3, col_h4 = st.columns(4)
 
                 with col_h1:
-                    st.metric("🔥 שעת שיא", f"{int(peak_hour):02d}:00", delta=f"₪ {peak_revenue:,.0f}")
+                    st.metric("🔥 שעת שיא", peak_hour, delta=f"₪ {peak_revenue:,.0f}")
 
                 with col_h2:
-                    st.metric("😴 שעה חלשה", f"{int(low_hour):02d}:00")
+                    st.metric("😴 שעה חלשה", low_hour)
 
                 with col_h3:
-                    morning_rev = hourly_df[hourly_df['hour'].between(6, 12)]['revenue'].sum()
+                    morning_rev = buckets_df.loc[bucket_hours.between(6, 12), 'revenue'].sum()
                     st.metric("🌅 בוקר (6-12)", f"₪ {morning_rev:,.0f}")
 
                 with col_h4:
-                    afternoon_rev = hourly_df[hourly_df['hour'].between(12, 18)]['revenue'].sum()
+                    afternoon_rev = buckets_df.loc[bucket_hours.between(12, 18), 'revenue'].sum()
                     st.metric("☀️ צהריים (12-18)", f"₪ {afternoon_rev:,.0f}")
 
                 # Hourly revenue chart
@@ -925,7 +1003,7 @@ else:
                     text='מספר עסקאות'
                 )
                 fig_hourly.update_traces(texttemplate='%{text} עסקאות', textposition='outside')
-                fig_hourly.update_layout(xaxis=dict(dtick=1), yaxis_title='הכנסה (₪)')
+                fig_hourly.update_layout(xaxis=dict(type='category'), yaxis_title='הכנסה (₪)')
                 st.plotly_chart(fig_hourly, use_container_width=True)
 
                 st.markdown("---")
@@ -933,19 +1011,13 @@ else:
                 # === DAILY SUMMARY ===
                 st.markdown("### 📅 סיכום לפי ימים בשבוע")
 
-                # Sort by Israeli week order
-                day_order = ['ראשון', 'שני', 'שלישי', 'רביעי', 'חמישי', 'שישי', 'שבת']
-
-                daily_summary = hourly_df.groupby('day_name').agg({
-                    'revenue': ['sum', 'count', 'mean']
-                }).round(2)
-                daily_summary.columns = ['סה״כ הכנסה', 'מספר עסקאות', 'ממוצע לעסקה']
-                daily_summary = daily_summary.reset_index()
-                daily_summary.columns = ['יום', 'סה״כ הכנסה', 'מספר עסקאות', 'ממוצע לעסקה']
-
-                # Sort by day order
-                daily_summary['sort_order'] = daily_summary['יום'].apply(lambda x: day_order.index(x) if x in day_order else 7)
-                daily_summary = daily_summary.sort_values('sort_order').drop('sort_order', axis=1)
+                # כבר לפי סדר השבוע הישראלי
+                daily_summary = pd.DataFrame({
+                    'יום': profile['weekdays']['day_name'],
+                    'סה״כ הכנסה': profile['weekdays']['revenue'].round(2),
+                    'מספר עסקאות': profile['weekdays']['transactions'],
+                    'ממוצע לעסקה': profile['weekdays']['avg'].round(2)
+                })
 
                 # Find best and worst days
                 best_day = daily_summary.loc[daily_summary['סה״כ הכנסה'].idxmax(), 'יום']
@@ -977,23 +1049,15 @@ else:
                 # === HEATMAP ===
                 st.markdown("### 🗺️ מפת חום - שעות × ימים")
 
-                # Create pivot table for heatmap
-                heatmap_data = hourly_df.groupby(['day_name', 'hour'])['revenue'].sum().reset_index()
-                heatmap_pivot = heatmap_data.pivot(index='day_name', columns='hour', values='revenue').fillna(0)
-
-                # Reorder days
-                heatmap_pivot = heatmap_pivot.reindex(day_order)
-                heatmap_pivot = heatmap_pivot.dropna(how='all')
-
                 fig_heatmap = px.imshow(
-                    heatmap_pivot,
+                    profile['heatmap'],
                     labels=dict(x="שעה", y="יום", color="הכנסה (₪)"),
                     title='מפת חום: הכנסות לפי יום ושעה',
                     color_continuous_scale='RdYlGn',
                     aspect='auto'
                 )
                 fig_heatmap.update_layout(
-                    xaxis=dict(dtick=1),
+                    xaxis=dict(type='category'),
                     height=400
                 )
                 st.plotly_chart(fig_heatmap, use_container_width=True)
@@ -1008,9 +1072,9 @@ else:
                 with col_rec1:
                     st.success(f"""
                     **שעות שיא למשמרות מחוזקות:**
-                    - שעת השיא: {int(peak_hour):02d}:00
+                    - שעת השיא: {peak_hour}
                     - מומלץ לחזק איוש בשעות אלו
-                    - שקול מבצעים בשעות החלשות ({int(low_hour):02d}:00)
+                    - שקול מבצעים בשעות החלשות ({low_hour})
                     """)
 
                 with col_rec2:
@@ -1027,7 +1091,6 @@ else:
                     display_hourly = hourly_summary.copy()
                     display_hourly['סה״כ הכנסה'] = display_hourly['סה״כ הכנסה'].apply(lambda x: f"₪ {x:,.0f}")
                     display_hourly['ממוצע לעסקה'] = display_hourly['ממוצע לעסקה'].apply(lambda x: f"₪ {x:,.0f}")
-                    display_hourly['שעה'] = display_hourly['שעה'].apply(lambda x: f"{int(x):02d}:00")
                     st.dataframe(display_hourly, use_container_width=True, hide_index=True)
 
                     st.markdown("**לפי ימים:**")
@@ -1043,21 +1106,20 @@ else:
         st.markdown("## 🛒 ניתוח סל קניות")
         st.info("גלה אילו מוצרים נקנים יחד - לבניית קומבינציות ומבצעים")
 
-        if not transactions:
+        if len(store) == 0:
             st.warning("אין נתונים לניתוח")
         else:
-            # Analyze baskets with 2+ items
-            multi_item_transactions = [t for t in transactions if len(t['items']) >= 2]
+            basket_engine = cached_basket_engine(cache_key, store)
+            multi_trans = basket_engine.multi_item_count
 
-            if not multi_item_transactions:
+            if not multi_trans:
                 st.warning("אין עסקאות עם יותר ממוצר אחד")
             else:
                 st.markdown(f"### 📊 סטטיסטיקות כלליות")
 
-                total_trans = len(transactions)
-                multi_trans = len(multi_item_transactions)
-                avg_basket_size = sum(len(t['items']) for t in transactions) / total_trans if total_trans > 0 else 0
-                avg_basket_value = sum(t['total'] for t in transactions) / total_trans if total_trans > 0 else 0
+                total_trans = len(basket_engine)
+                avg_basket_size = basket_engine.line_counts.mean() if total_trans > 0 else 0
+                avg_basket_value = basket_engine.totals.mean() if total_trans > 0 else 0
 
                 col_b1, col_b2, col_b3, col_b4 = st.columns(4)
 
@@ -1080,35 +1142,18 @@ else:
                 st.markdown("### 👫 זוגות מוצרים פופולריים")
                 st.caption("מוצרים שנקנים יחד באותה עסקה")
 
-                from collections import Counter
-                from itertools import combinations
-
-                # Count product pairs
-                pair_counter = Counter()
-
-                for t in multi_item_transactions:
-                    # Get unique product names in transaction
-                    products = list(set(item['name'] for item in t['items']))
-
-                    if len(products) >= 2:
-                        # Generate all pairs
-                        for pair in combinations(sorted(products), 2):
-                            pair_counter[pair] += 1
-
                 # Get top pairs
-                top_pairs = pair_counter.most_common(20)
-
-                if top_pairs:
-                    pairs_data = []
-                    for pair, count in top_pairs:
-                        pairs_data.append({
-                            'מוצר 1': pair[0],
-                            'מוצר 2': pair[1],
-                            'מספר עסקאות משותפות': count,
-                            'אחוז מעסקאות מרובות': round(count / multi_trans * 100, 1)
-                        })
-
-                    pairs_df = pd.DataFrame(pairs_data)
+                top_pairs_df = basket_engine.pairs(top=20)
+
+                if not top_pairs_df.empty:
+                    pairs_df = pd.DataFrame({
+                        'מוצר 1': top_pairs_df['item_a'],
+                        'מוצר 2': top_pairs_df['item_b'],
+                        'מספר עסקאות משותפות': top_pairs_df['count'],
+                        'אחוז מעסקאות מרובות': (top_pairs_df['count'] / multi_trans * 100).round(1),
+                        'Confidence': (top_pairs_df['confidence_ab'] * 100).round(1),
+                        'Lift': top_pairs_df['lift'].round(2)
+                    })
 
                     # Top pairs chart
                     top_10_pairs = pairs_df.head(10).copy()
@@ -1130,55 +1175,68 @@ else:
 
                     # Pairs table
                     st.markdown("#### 📋 טבלת זוגות מלאה")
+                    st.caption("Confidence - אחוז מהעסקאות עם מוצר 1 שכוללות גם את מוצר 2; "
+                               "Lift מעל 1 - נקנים יחד יותר ממה שהיה צפוי במקרה")
                     display_pairs = pairs_df.copy()
                     display_pairs['אחוז מעסקאות מרובות'] = display_pairs['אחוז מעסקאות מרובות'].apply(lambda x: f"{x}%")
+                    display_pairs['Confidence'] = display_pairs['Confidence'].apply(lambda x: f"{x}%")
                     st.dataframe(display_pairs, use_container_width=True, hide_index=True)
 
+                # === FREQUENT ITEMSETS (3+) ===
+                st.markdown("#### 🧺 סלים שכיחים של 3+ מוצרים")
+                col_fs1, col_fs2 = st.columns(2)
+                with col_fs1:
+                    min_support_pct = st.slider("תמיכה מינימלית (% מהעסקאות)", 0.1, 5.0, 0.5, 0.1,
+                                                key='basket_min_support')
+                with col_fs2:
+                    min_confidence_pct = st.slider("ביטחון מינימלי לכלל (%)", 10, 100, 50, 5,
+                                                   key='basket_min_confidence')
+
+                itemsets_df, rules_df = cached_basket_rules(
+                    cache_key, min_support_pct / 100, min_confidence_pct / 100, store
+                )
+
+                if itemsets_df.empty:
+                    st.info("לא נמצאו סלים של 3+ מוצרים מעל סף התמיכה - נסה להוריד את הסף")
+                else:
+                    st.dataframe(pd.DataFrame({
+                        'מוצרים': itemsets_df['items'].map(' + '.join),
+                        'גודל': itemsets_df['size'],
+                        'מספר עסקאות': itemsets_df['count'],
+                        'תמיכה': (itemsets_df['support'] * 100).round(2).astype(str) + '%'
+                    }).head(20), use_container_width=True, hide_index=True)
+
+                    if not rules_df.empty:
+                        st.markdown("**כללי קשר - מי שקנה את כל אלה קנה גם:**")
+                        st.dataframe(pd.DataFrame({
+                            'אם נקנו': rules_df['antecedent'].map(' + '.join),
+                            'נקנה גם': rules_df['consequent'],
+                            'מספר עסקאות': rules_df['count'],
+                            'Confidence': (rules_df['confidence'] * 100).round(1).astype(str) + '%',
+                            'Lift': rules_df['lift'].round(2)
+                        }).head(20), use_container_width=True, hide_index=True)
+
                 st.markdown("---")
 
                 # === FREQUENTLY BOUGHT WITH ===
                 st.markdown("### 🔗 לקוחות שקנו X קנו גם...")
 
-                # Get all unique products
-                all_products = set()
-                for t in transactions:
-                    for item in t['items']:
-                        all_products.add(item['name'])
-
                 selected_product = st.selectbox(
                     "בחר מוצר:",
-                    options=sorted(all_products),
+                    options=basket_engine.products.tolist(),
                     key='basket_product_select'
                 )
 
                 if selected_product:
-                    # Find transactions containing this product
-                    related_trans = [t for t in multi_item_transactions
-                                    if any(item['name'] == selected_product for item in t['items'])]
-
-                    if related_trans:
-                        # Count other products in these transactions
-                        related_products = Counter()
-                        for t in related_trans:
-                            for item in t['items']:
-                                if item['name'] != selected_product:
-                                    related_products[item['name']] += 1
+                    related_df, related_count = basket_engine.related(selected_product, top=10)
 
-                        top_related = related_products.most_common(10)
-
-                        if top_related:
+                    if related_count:
+                        if not related_df.empty:
                             st.markdown(f"**מוצרים שנקנו יחד עם '{selected_product}':**")
 
-                            related_data = []
-                            for product, count in top_related:
-                                pct = count / len(related_trans) * 100
-                                related_data.append({
-                                    'מוצר': product,
-                                    'מספר פעמים': count,
-                                    'אחוז': pct
-                                })
-
-                            related_df = pd.DataFrame(related_data)
+                            related_df = related_df.rename(columns={
+                                'product': 'מוצר', 'count': 'מספר פעמים', 'pct': 'אחוז'
+                            })
 
                             fig_related = px.bar(
                                 related_df,
@@ -1202,20 +1260,9 @@ else:
                 # === BASKET SIZE ANALYSIS ===
                 st.markdown("### 📦 ניתוח גודל סל")
 
-                basket_sizes = [len(t['items']) for t in transactions]
-                basket_values = [t['total'] for t in transactions]
-
-                basket_analysis = []
-                for size in sorted(set(basket_sizes)):
-                    matching = [(s, v) for s, v in zip(basket_sizes, basket_values) if s == size]
-                    avg_value = sum(v for _, v in matching) / len(matching)
-                    basket_analysis.append({
-                        'גודל סל': size,
-                        'מספר עסקאות': len(matching),
-                        'ממוצע ערך': avg_value
-                    })
-
-                basket_df = pd.DataFrame(basket_analysis)
+                basket_df = basket_engine.basket_sizes().rename(columns={
+                    'size': 'גודל סל', 'transactions': 'מספר עסקאות', 'avg_value': 'ממוצע ערך'
+                })
 
                 col_bs1, col_bs2 = st.columns(2)
 
@@ -1247,15 +1294,15 @@ else:
                 # === COMBO RECOMMENDATIONS ===
                 st.markdown("### 💡 המלצות לקומבינציות")
 
-                if top_pairs and len(top_pairs) >= 3:
-                    top_3_pairs = top_pairs[:3]
+                if len(top_pairs_df) >= 3:
+                    first, second, third = top_pairs_df.head(3).to_dict('records')
 
                     st.success(f"""
                     **קומבינציות מומלצות למבצעים:**
                     
-                    1. 🥇 **{top_3_pairs[0][0][0]}** + **{top_3_pairs[0][0][1]}** ({top_3_pairs[0][1]} עסקאות משותפות)
-                    2. 🥈 **{top_3_pairs[1][0][0]}** + **{top_3_pairs[1][0][1]}** ({top_3_pairs[1][1]} עסקאות משותפות)
-                    3. 🥉 **{top_3_pairs[2][0][0]}** + **{top_3_pairs[2][0][1]}** ({top_3_pairs[2][1]} עסקאות משותפות)
+                    1. 🥇 **{first['item_a']}** + **{first['item_b']}** ({first['count']} עסקאות משותפות)
+                    2. 🥈 **{second['item_a']}** + **{second['item_b']}** ({second['count']} עסקאות משותפות)
+                    3. 🥉 **{third['item_a']}** + **{third['item_b']}** ({third['count']} עסקאות משותפות)
                     """)
 
     # Tab 8: Achievements
@@ -1263,24 +1310,20 @@ else:
         st.markdown("## 🏆 לוח הישגים")
         st.info("שיאים, הישגים ואבני דרך")
 
-        if not transactions:
+        if len(store) == 0:
             st.warning("אין נתונים להצגה")
         else:
-            all_trans_for_achievements = st.session_state.transactions
+            # שיאים מכל הנתונים (לא המסוננים) - ישירות מה-store
+            all_daily = dataset_store.daily_summary()
+            daily_totals = dict(zip(all_daily['date'], all_daily['total_sales']))
+            daily_trans_count = dict(zip(all_daily['date'], all_daily['transaction_count']))
+            all_totals = dataset_store.transactions['total']
 
             st.markdown("### 🎖️ שיאים אישיים")
 
             # === REVENUE RECORDS ===
             col_r1, col_r2, col_r3 = st.columns(3)
 
-            # Best day ever
-            daily_totals = {}
-            for t in all_trans_for_achievements:
-                date = t['date']
-                if date not in daily_totals:
-                    daily_totals[date] = 0
-                daily_totals[date] += t['total']
-
             if daily_totals:
                 best_day = max(daily_totals.items(), key=lambda x: x[1])
                 worst_day = min(daily_totals.items(), key=lambda x: x[1])
@@ -1294,7 +1337,9 @@ else:
 
                 with col_r2:
                     # Biggest single transaction
-                    biggest_trans = max(all_trans_for_achievements, key=lambda x: x['total'])
+                    biggest = all_totals.idxmax()
+                    biggest_trans = {'total': all_totals[biggest],
+                                     'order_id': dataset_store.transactions['order_id'][biggest]}
                     st.metric(
                         "💰 העסקה הגדולה ביותר",
                         f"₪ {biggest_trans['total']:,.0f}",
@@ -1303,13 +1348,6 @@ else:
 
                 with col_r3:
                     # Most transactions in a day
-                    daily_trans_count = {}
-                    for t in all_trans_for_achievements:
-                        date = t['date']
-                        if date not in daily_trans_count:
-                            daily_trans_count[date] = 0
-                        daily_trans_count[date] += 1
-
                     busiest_day = max(daily_trans_count.items(), key=lambda x: x[1])
                     st.metric(
                         "🔥 היום הכי עמוס",
@@ -1325,17 +1363,9 @@ else:
             col_p1, col_p2, col_p3 = st.columns(3)
 
             # Best selling product (by quantity)
-            product_qty = {}
-            product_revenue = {}
-
-            for t in all_trans_for_achievements:
-                for item in t['items']:
-                    name = item['name']
-                    if name not in product_qty:
-                        product_qty[name] = 0
-                        product_revenue[name] = 0
-                    product_qty[name] += item['quantity']
-                    product_revenue[name] += item['total_price']
+            products = dataset_store.items.groupby('name', sort=False)[['quantity', 'total_price']].sum()
+            product_qty = dict(zip(products.index, products['quantity']))
+            product_revenue = dict(zip(products.index, products['total_price']))
 
             if product_qty:
                 top_qty_product = max(product_qty.items(), key=lambda x: x[1])
@@ -1369,9 +1399,9 @@ else:
             # === STREAKS AND MILESTONES ===
             st.markdown("### 🎯 אבני דרך")
 
-            total_revenue = sum(t['total'] for t in all_trans_for_achievements)
-            total_transactions = len(all_trans_for_achievements)
-            total_items = sum(len(t['items']) for t in all_trans_for_achievements)
+            total_revenue = all_totals.sum()
+            total_transactions = len(dataset_store)
+            total_items = len(dataset_store.items)
             total_days = len(daily_totals) if daily_totals else 0
 
             # Milestone cards
@@ -1488,13 +1518,7 @@ else:
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                daily_df.to_excel(writer, sheet_name='דוח יומי', index=False)
-                trans_df.to_excel(writer, sheet_name='טרנזקציות', index=False)
-                items_df.to_excel(writer, sheet_name='פריטים', index=False)
-
-            st.download_button("📥 Excel מלא", output.getvalue(),
+            st.download_button("📥 Excel מלא", cached_excel_report(cache_key, daily_df, trans_df, items_df),
                 f"report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.xlsx",
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
@@ -1517,7 +1541,7 @@ else:
         with goal_tab1:
             st.markdown(f"### סיכום: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}")
 
-            period_total = trans_df['Total Amount'].sum()
+            period_total = period_totals['revenue']
             days_in_period = (end_date - start_date).days + 1
             proportional_goal = monthly_goal * (days_in_period / 30)
             rev_pct = (period_total / proportional_goal * 100) if proportional_goal > 0 else 0
@@ -1531,11 +1555,13 @@ else:
             st.markdown("---")
 
             category_goals = st.session_state.goals['category_monthly']
+            period_cat_stats = cube.category_totals(
+                get_category_classifier(tuple(category_goals)), start_date, end_date)
             progress_data = []
 
             for cat, goal in category_goals.items():
                 prop_goal = goal * (days_in_period / 30)
-                count = sum(item['quantity'] for t in transactions for item in t['items'] if cat in item['name'])
+                count = period_cat_stats.loc[cat, 'quantity']
                 progress_data.append({'קטגוריה': cat, 'יעד': round(prop_goal, 1), 'בפועל': count,
                                      'התקדמות': (count / prop_goal * 100) if prop_goal > 0 else 0})
 
@@ -1554,18 +1580,18 @@ else:
 
         with goal_tab2:
             st.markdown("### ניתוח שבועי")
-            weeks = sorted(trans_df['WeekStart'].unique())
+            weeks = weekly_df_cube['week_start'].tolist()
 
             if weeks:
                 week_idx = st.selectbox("בחר שבוע", range(len(weeks)),
                                        format_func=lambda x: f"שבוע {x+1}: {weeks[x].strftime('%d/%m/%Y')}")
 
                 selected = weeks[week_idx]
-                week_trans = [t for t in transactions
-                             if pd.to_datetime(t['date']).date() >= selected.date()
-                             and pd.to_datetime(t['date']).date() < (selected + pd.Timedelta(days=7)).date()]
+                # השבוע הנבחר, חתוך לטווח התאריכים המסונן
+                week_range = (max(selected, pd.Timestamp(start_date)),
+                              min(selected + pd.Timedelta(days=6), pd.Timestamp(end_date)))
 
-                weekly_rev = trans_df[trans_df['WeekStart'] == selected]['Total Amount'].sum()
+                weekly_rev = weekly_df_cube['revenue'].iloc[week_idx]
                 weekly_goal = st.session_state.goals['revenue_weekly']
                 weekly_pct = (weekly_rev / weekly_goal * 100) if weekly_goal > 0 else 0
 
@@ -1578,10 +1604,12 @@ else:
                 st.markdown("---")
 
                 category_goals_w = st.session_state.goals['category_weekly']
+                week_cat_stats = cube.category_totals(
+                    get_category_classifier(tuple(category_goals_w)), *week_range)
                 progress_w = []
 
                 for cat, goal in category_goals_w.items():
-                    count = sum(item['quantity'] for t in week_trans for item in t['items'] if cat in item['name'])
+                    count = week_cat_stats.loc[cat, 'quantity']
                     progress_w.append({'קטגוריה': cat, 'יעד': goal, 'בפועל': count,
                                       'התקדמות': (count / goal * 100) if goal > 0 else 0})
 
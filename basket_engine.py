@@ -0,0 +1,278 @@
+"""
+Basket Engine Module - ניתוח סל קניות על מטריצה דלילה
+
+המנוע בונה פעם אחת מטריצת מופעים דלילה X (עסקה × מוצר, 1 אם המוצר נקנה בעסקה) ומשם:
+- ספירת זוגות: מכפלה דלילה אחת X.T @ X - האלכסון הוא מספר העסקאות של כל מוצר
+  ומחוץ לאלכסון מספר העסקאות המשותפות לכל זוג
+- שלשות: עמודה לכל זוג שכיח (מכפלה איבר-איבר של שתי העמודות) ומכפלה דלילה נוספת מול X
+- אינדקס הפוך מוצר -> עסקאות (X בפורמט CSC) לשליפה מיידית של "נקנה גם עם"
+- סלים שכיחים בכל גודל (Eclat): לכל מוצר bitset של העסקאות שלו (int של פייתון),
+  והתמיכה של סל היא popcount של החיתוך (AND) בין ה-bitsets - בלי מעבר חוזר על העסקאות
+
+לכל זוג, שלשה וכלל מחושבים support, confidence ו-lift.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class BasketEngine:
+    """
+    מנוע סל קניות על מטריצת מופעים דלילה
+
+    Args:
+        incidence: csr_matrix בינארית בגודל עסקאות × מוצרים
+        products: שמות המוצרים (ממוינים) לפי סדר העמודות
+        line_counts: מספר שורות פריט לכל עסקה
+        totals: סכום כל עסקה
+    """
+
+    def __init__(self, incidence, products, line_counts, totals):
+        self.incidence = incidence.tocsr()
+        self.products = np.asarray(products, dtype=object)
+        self.line_counts = np.asarray(line_counts)
+        self.totals = np.asarray(totals, dtype=float)
+        self._product_index = pd.Index(self.products)
+        self._by_product = self.incidence.tocsc()
+        self._cooccurrence = None
+
+    @classmethod
+    def from_store(cls, store):
+        """בניית המנוע מ-TransactionStore - מוצר שמופיע כמה פעמים באותה עסקה נספר פעם אחת"""
+        names = store.items['name'].astype(str).to_numpy(dtype=object)
+        products, codes = np.unique(names, return_inverse=True)
+        tx = store.items['tx'].to_numpy()
+        n_transactions = len(store)
+
+        incidence = sparse.csr_matrix(
+            (np.ones(len(tx), dtype=np.int32), (tx, codes)),
+            shape=(n_transactions, len(products))
+        )
+        incidence.sum_duplicates()
+        incidence.data[:] = 1
+        return cls(incidence, products, store.item_counts(), store.transactions['total'].to_numpy())
+
+    def __len__(self):
+        return self.incidence.shape[0]
+
+    @property
+    def multi_item_count(self) -> int:
+        """מספר העסקאות עם שתי שורות פריט או יותר"""
+        return int((self.line_counts >= 2).sum())
+
+    def product_counts(self):
+        """מספר העסקאות שבהן הופיע כל מוצר"""
+        return np.diff(self._by_product.indptr)
+
+    def cooccurrence(self):
+        """מטריצת ספירות משותפות מוצר × מוצר (X.T @ X) - מחושבת פעם אחת"""
+        if self._cooccurrence is None:
+            self._cooccurrence = (self._by_product.T @ self._by_product).tocsr()
+        return self._cooccurrence
+
+    def transactions_with(self, product):
+        """מיקומי העסקאות שבהן נקנה המוצר - מהאינדקס ההפוך"""
+        code = self._product_index.get_loc(product)
+        return self._by_product.indices[self._by_product.indptr[code]:self._by_product.indptr[code + 1]]
+
+    def pairs(self, min_count=1, top=None):
+        """
+        זוגות מוצרים שנקנו יחד, ממוינים לפי מספר עסקאות משותפות יורד.
+
+        Returns:
+            DataFrame: item_a, item_b (item_a < item_b), count, support,
+            confidence_ab, confidence_ba, lift
+        """
+        upper = sparse.triu(self.cooccurrence(), k=1).tocoo()
+        keep = upper.data >= min_count
+        a, b, counts = upper.row[keep], upper.col[keep], upper.data[keep]
+
+        singles = self.product_counts()
+        n = max(len(self), 1)
+        result = pd.DataFrame({
+            'item_a': self.products[a],
+            'item_b': self.products[b],
+            'count': counts.astype(np.int64),
+            'support': counts / n,
+            'confidence_ab': counts / singles[a],
+            'confidence_ba': counts / singles[b],
+            'lift': counts * n / (singles[a].astype(float) * singles[b])
+        })
+        return _top(result, ['item_a', 'item_b'], top)
+
+    def triples(self, min_count=2, top=None):
+        """
+        שלשות מוצרים שנקנו יחד. נבנות רק מזוגות שכיחים (count >= min_count) - שלשה שכיחה
+        מחייבת שכל הזוגות שלה שכיחים.
+
+        Returns:
+            DataFrame: item_a, item_b, item_c (ממוינים), count, support,
+            confidence (הסיכוי ל-item_c בהינתן item_a ו-item_b), lift
+        """
+        upper = sparse.triu(self.cooccurrence(), k=1).tocoo()
+        keep = upper.data >= min_count
+        a, b, pair_counts = upper.row[keep], upper.col[keep], upper.data[keep]
+
+        columns = ['item_a', 'item_b', 'item_c', 'count', 'support', 'confidence', 'lift']
+        if len(a) == 0:
+            return pd.DataFrame(columns=columns)
+
+        # עמודה לכל זוג: 1 בעסקאות שבהן שני המוצרים נקנו
+        both = self._by_product[:, a].multiply(self._by_product[:, b]).tocsc()
+        counts = (both.T @ self._by_product).tocoo()
+        # כל שלשה נספרת פעם אחת - המוצר השלישי אחרי שני מוצרי הזוג
+        keep = (counts.col > b[counts.row]) & (counts.data >= min_count)
+        pair, c, triple_counts = counts.row[keep], counts.col[keep], counts.data[keep]
+
+        singles = self.product_counts()
+        n = max(len(self), 1)
+        result = pd.DataFrame({
+            'item_a': self.products[a[pair]],
+            'item_b': self.products[b[pair]],
+            'item_c': self.products[c],
+            'count': triple_counts.astype(np.int64),
+            'support': triple_counts / n,
+            'confidence': triple_counts / pair_counts[pair],
+            'lift': triple_counts * n / (pair_counts[pair].astype(float) * singles[c])
+        }, columns=columns)
+        return _top(result, ['item_a', 'item_b', 'item_c'], top)
+
+    def frequent_itemsets(self, min_support=0.01, min_size=1, max_size=None):
+        """
+        סלים שכיחים (Eclat על bitsets) - כל קבוצת מוצרים שנקנתה יחד בלפחות min_support מהעסקאות.
+
+        Args:
+            min_support: שבר מהעסקאות (0.01 = 1%); לפחות עסקה אחת
+            min_size, max_size: טווח גודל הסלים בתוצאה (max_size=None - ללא הגבלה)
+
+        Returns:
+            DataFrame: items (tuple ממוין של שמות), size, count, support -
+            ממוין לפי count יורד
+        """
+        min_count = max(1, math.ceil(min_support * len(self)))
+        found = self._mine(min_count, max_size)
+        n = max(len(self), 1)
+        result = pd.DataFrame({
+            'items': [tuple(self.products[list(codes)]) for codes in found],
+            'size': [len(codes) for codes in found],
+            'count': np.array(list(found.values()), dtype=np.int64),
+        }, columns=['items', 'size', 'count'])
+        result['support'] = result['count'] / n
+        result = result[result['size'] >= min_size]
+        return result.sort_values(['count', 'size', 'items'], ascending=[False, False, True],
+                                  kind='stable').reset_index(drop=True)
+
+    def association_rules(self, min_support=0.01, min_confidence=0.5, min_size=2, max_size=None, itemsets=None):
+        """
+        כללי קשר מהסלים השכיחים: לכל סל בגודל min_size ומעלה, כלל "שאר המוצרים -> מוצר אחד".
+
+        Args:
+            itemsets: תוצאה של frequent_itemsets עם min_size=1 ואותו min_support - הכללים נגזרים
+                ממנה בלי לכרות שוב (הסינון לפי גודל נעשה אחר כך על הסלים עצמם)
+
+        Returns:
+            DataFrame: antecedent (tuple), consequent, size, count, support, confidence, lift -
+            ממוין לפי lift יורד
+        """
+        if itemsets is None:
+            itemsets = self.frequent_itemsets(min_support, max_size=max_size)
+        # כל תת-קבוצה של סל שכיח שכיחה גם היא - הספירה שלה כבר נמצאת
+        counts = dict(zip(itemsets['items'], itemsets['count'].tolist()))
+        n = max(len(self), 1)
+
+        rows = []
+        for items, count in counts.items():
+            if len(items) < max(min_size, 2) or (max_size is not None and len(items) > max_size):
+                continue
+            for consequent in items:
+                antecedent = tuple(item for item in items if item != consequent)
+                confidence = count / counts[antecedent]
+                if confidence < min_confidence:
+                    continue
+                rows.append({
+                    'antecedent': antecedent,
+                    'consequent': consequent,
+                    'size': len(items),
+                    'count': count,
+                    'support': count / n,
+                    'confidence': confidence,
+                    'lift': confidence * n / counts[(consequent,)]
+                })
+        columns = ['antecedent', 'consequent', 'size', 'count', 'support', 'confidence', 'lift']
+        result = pd.DataFrame(rows, columns=columns)
+        return result.sort_values(['lift', 'count'], ascending=False, kind='stable').reset_index(drop=True)
+
+    def _mine(self, min_count, max_size=None):
+        """Eclat - מילון {tuple של קודי מוצר ממוינים: מספר עסקאות} לכל הסלים השכיחים"""
+        counts = self.product_counts()
+        candidates = [(code, self._bitset(code), int(counts[code]))
+                      for code in np.argsort(counts, kind='stable') if counts[code] >= min_count]
+        found = {}
+        _eclat((), candidates, min_count, max_size, found)
+        return found
+
+    def _bitset(self, code) -> int:
+        """העסקאות של מוצר כ-int שבו ביט i דולק אם המוצר נקנה בעסקה i"""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self._by_product.indices[self._by_product.indptr[code]:self._by_product.indptr[code + 1]]] = True
+        return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+    def related(self, product, top=10):
+        """
+        המוצרים שנקנו הכי הרבה יחד עם product.
+
+        Returns:
+            (DataFrame של product, count, pct, מספר העסקאות מרובות הפריטים שכוללות את product).
+            count הוא מספר העסקאות המשותפות ו-pct אחוז מהעסקאות מרובות הפריטים שכוללות את product
+        """
+        code = self._product_index.get_loc(product)
+        positions = self.transactions_with(product)
+        base = int((self.line_counts[positions] >= 2).sum())
+
+        row = self.cooccurrence().getrow(code).tocoo()
+        others = row.col != code
+        counts = row.data[others].astype(np.int64)
+        result = pd.DataFrame({
+            'product': self.products[row.col[others]],
+            'count': counts,
+            'pct': counts / base * 100 if base else np.zeros(len(counts))
+        })
+        return _top(result, ['product'], top), base
+
+    def basket_sizes(self):
+        """מספר עסקאות וערך ממוצע לכל גודל סל (מספר שורות פריט)"""
+        frame = pd.DataFrame({'size': self.line_counts, 'total': self.totals})
+        return frame.groupby('size', sort=True).agg(
+            transactions=('total', 'size'),
+            avg_value=('total', 'mean')
+        ).reset_index()
+
+
+def _eclat(prefix, candidates, min_count, max_size, found):
+    """
+    הרחבת prefix בכל מועמד בתורו; המועמדים להמשך הם המוצרים שאחריו שהחיתוך איתם עדיין שכיח.
+    candidates ממוינים לפי תמיכה עולה - כך הענפים הרחבים נחתכים מוקדם
+    """
+    for i, (code, bits, count) in enumerate(candidates):
+        itemset = prefix + (code,)
+        found[tuple(sorted(itemset))] = count
+        if max_size is not None and len(itemset) >= max_size:
+            continue
+        extensions = []
+        for other, other_bits, _ in candidates[i + 1:]:
+            both = bits & other_bits
+            both_count = both.bit_count()
+            if both_count >= min_count:
+                extensions.append((other, both, both_count))
+        if extensions:
+            _eclat(itemset, extensions, min_count, max_size, found)
+
+
+def _top(frame, name_columns, top):
+    """מיון לפי count יורד (ובשוויון לפי השמות) וחיתוך ל-top שורות"""
+    frame = frame.sort_values(['count'] + name_columns, ascending=[False] + [True] * len(name_columns),
+                              kind='stable').reset_index(drop=True)
+    return frame if top is None else frame.head(top)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark - סיכום יומי וסיכום פריטים על 100K+ שורות פריט
+
+הרצה:
+    python bench_aggregation.py [מספר עסקאות]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from transaction_store import TransactionStore
+from html_to_excel import create_daily_summary, create_items_summary_df
+
+
+def make_store(n_transactions, items_per_transaction=3, n_products=250, seed=0):
+    """store סינתטי - שנה של עסקאות בבית קפה"""
+    rng = np.random.default_rng(seed)
+    n_items = n_transactions * items_per_transaction
+
+    timestamps = pd.Timestamp('2025-01-01 07:00') + pd.to_timedelta(
+        np.sort(rng.integers(0, 365 * 24 * 60, n_transactions)), unit='min')
+    tx = np.repeat(np.arange(n_transactions), items_per_transaction)
+    product = rng.integers(0, n_products, n_items)
+    quantity = rng.integers(1, 4, n_items).astype(float)
+    unit_price = (product % 40 + 10).astype(float)
+    total_price = quantity * unit_price
+
+    items = pd.DataFrame({
+        'tx': tx,
+        'name': pd.Series([f'מוצר {p}' for p in range(n_products)]).to_numpy()[product],
+        'code': product.astype(str),
+        'cashier': 'קופאי ראשי',
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'taxable_amount': total_price / 1.18,
+        'total_price': total_price,
+        'vat_amount': total_price - total_price / 1.18
+    })
+    totals = np.bincount(tx, weights=total_price, minlength=n_transactions)
+    transactions = pd.DataFrame({
+        'order_id': np.arange(n_transactions).astype(str),
+        'invoice_num': '', 'transaction_type': 'חשבונית מס', 'z_number': '1',
+        'register': 'ראשית', 'customer_name': '', 'customer_code': '',
+        'total_items': totals / 1.18, 'total_vat': totals - totals / 1.18, 'total': totals,
+        'timestamp': timestamps
+    })
+    payments = pd.DataFrame({
+        'tx': np.arange(n_transactions), 'method': 'ויזה', 'amount': totals,
+        'approval': None, 'reference': None
+    })
+    return TransactionStore(transactions, items, payments)
+
+
+def main():
+    n_transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    store = make_store(n_transactions)
+    print(f"{len(store):,} transactions, {len(store.items):,} line items")
+
+    for name, func in [('daily summary', create_daily_summary), ('items summary', create_items_summary_df)]:
+        func(store)  # warm-up
+        start = time.perf_counter()
+        result = func(store)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<15} {elapsed * 1000:8.1f} ms  ({len(result):,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark - ניתוח סל (זוגות, שלשות, סלים שכיחים וכללים) על שנה של עסקאות
+
+שנה נבנית משכפול דוחות הדוגמה (ארבעה שבועות) עם הזזת תאריכים, כך שהקשרים בין המוצרים אמיתיים.
+
+הרצה:
+    python bench_basket.py [מספר שבועות] [min_support]
+"""
+import sys
+import time
+
+import pandas as pd
+
+from basket_engine import BasketEngine
+from html_to_excel import parse_many
+from transaction_store import TransactionStore
+
+SAMPLE_FILES = ['week1_01-07-dec.html', 'week2_08-14-dec.html',
+                'week3_15-21-dec.html', 'week4_22-28-dec.html']
+
+
+def make_year_store(n_weeks=52):
+    """store של n_weeks שבועות - עותקים של דוחות הדוגמה, כל עותק מוזז בארבעה שבועות"""
+    transactions, _ = parse_many(SAMPLE_FILES)
+    sample = TransactionStore.from_transactions(transactions)
+    copies = []
+    for i in range(-(-n_weeks // 4)):
+        tx = sample.transactions.copy()
+        tx['timestamp'] = tx['timestamp'] + pd.Timedelta(weeks=4 * i)
+        tx['order_id'] = tx['order_id'].astype(str) + f'-{i}'
+        copies.append(TransactionStore(tx, sample.items, sample.payments))
+    return TransactionStore.concat(copies)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    n_weeks = int(sys.argv[1]) if len(sys.argv) > 1 else 52
+    min_support = float(sys.argv[2]) if len(sys.argv) > 2 else 0.005
+    store = make_year_store(n_weeks)
+    print(f"{len(store):,} transactions, {len(store.items):,} line items, min_support={min_support:.1%}")
+
+    engine, elapsed = timed(lambda: BasketEngine.from_store(store))
+    print(f"  {'build engine':<18} {elapsed:8.1f} ms")
+    for name, func in [
+        ('pairs', lambda: engine.pairs()),
+        ('triples', lambda: engine.triples(min_count=2)),
+        ('frequent itemsets', lambda: engine.frequent_itemsets(min_support)),
+        ('rules (3+)', lambda: engine.association_rules(min_support, min_confidence=0.3, min_size=3)),
+        ('related', lambda: engine.related(engine.products[0])[0]),
+    ]:
+        result, elapsed = timed(func)
+        print(f"  {name:<18} {elapsed:8.1f} ms  ({len(result):,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark - זיכרון וזמן של ייצוא שורות פריט ל-Excel
+
+משווה את write_excel_sheets (write-only, חלקים של 2,000 עסקאות) ל-pd.ExcelWriter על DataFrame מלא.
+השיא נמדד ב-tracemalloc מתחילת הייצוא (ה-store עצמו כבר בזיכרון ואינו נספר);
+הזמנים כוללים את התקורה של tracemalloc ולכן איטיים מהרגיל.
+
+הרצה:
+    python bench_excel_export.py [מספרי עסקאות...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from bench_aggregation import make_store
+from html_to_excel import write_excel_sheets
+
+CHUNK_TRANSACTIONS = 2000
+
+
+def item_chunks(store):
+    """פירוט הפריטים בחלקים של CHUNK_TRANSACTIONS עסקאות"""
+    for lo in range(0, len(store), CHUNK_TRANSACTIONS):
+        yield store.slice_rows(lo, min(lo + CHUNK_TRANSACTIONS, len(store))).items_detail_df()
+
+
+def streaming_export(store, path):
+    write_excel_sheets(path, [('Items', item_chunks(store), 14)])
+
+
+def excel_writer_export(store, path):
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        store.items_detail_df().to_excel(writer, sheet_name='Items', index=False)
+
+
+def measure(func, store, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(store, path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000, 6000, 18000]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'items.xlsx')
+        for n_transactions in sizes:
+            store = make_store(n_transactions)
+            store.fingerprint  # מחושב פעם אחת לכל ה-store (slice_rows גוזר ממנו) - לא חלק מהייצוא
+            print(f"{len(store.items):,} line items")
+            for name, func in [('write-only', streaming_export), ('pd.ExcelWriter', excel_writer_export)]:
+                # ExcelWriter מחזיק את כל התאים בזיכרון - רק על הגדלים הקטנים
+                if func is excel_writer_export and n_transactions > 6000:
+                    continue
+                elapsed, peak = measure(func, store, path)
+                print(f"  {name:<15} {elapsed:7.1f} s  peak {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
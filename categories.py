@@ -0,0 +1,124 @@
+"""
+Categories Module - סיווג פריטים לקטגוריות
+
+כל מילות המפתח של כל הקטגוריות מקומפלות לאוטומט Aho-Corasick אחד, כך שסיווג שם פריט
+הוא מעבר אחד על התווים שלו - בלי לולאה על כל מילת מפתח. כל שם פריט ייחודי מסווג פעם אחת
+והתוצאה נשמרת, ולכן סיווג טבלת פריטים שלמה עולה כמספר השמות הייחודיים בלבד.
+
+אותו מעבר מוצא את כל הקטגוריות שמתאימות לשם (מסכת ביטים של קטגוריות לכל מצב באוטומט):
+- classify / classify_many - הקטגוריה שהוגדרה ראשונה מבין המתאימות (כמו לולאת מילות המפתח המקורית)
+- matches / match_many - כל הקטגוריות המתאימות, כמו יעדי הקטגוריות בדשבורד שבהם כל יעד
+  נבדק בנפרד (`if cat in item['name']`) ופריט יכול להיספר בכמה יעדים
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_CATEGORY = 'אחר'
+
+
+class CategoryClassifier:
+    """
+    מסווג שמות פריטים לפי מילות מפתח
+
+    Args:
+        keywords: מילון {קטגוריה: רשימת מילות מפתח}, לפי סדר עדיפות
+        default: הקטגוריה לשם שלא נמצאה בו אף מילת מפתח
+        case_sensitive: False - ההשוואה אינה תלויה באותיות גדולות/קטנות
+    """
+
+    def __init__(self, keywords, default=DEFAULT_CATEGORY, case_sensitive=True):
+        self.categories = list(keywords)
+        self.default = default
+        self.case_sensitive = case_sensitive
+        self._cache = {}
+
+        # טבלת מעברים: לכל מצב מילון תו -> מצב; לכל מצב מסכת ביטים של הקטגוריות שמסתיימות בו
+        # (ביט i - הקטגוריה ה-i לפי סדר העדיפות)
+        self._goto = [{}]
+        self._fail = [0]
+        self._mask = [0]
+        for rank, category in enumerate(self.categories):
+            for keyword in keywords[category]:
+                self._add(self._normalize(str(keyword)), rank)
+        self._build_fail_links()
+
+    @classmethod
+    def from_names(cls, categories, default=None):
+        """מסווג שבו כל קטגוריה היא גם מילת המפתח שלה - כמו יעדי הקטגוריות בדשבורד"""
+        return cls({category: [category] for category in categories}, default=default)
+
+    def classify(self, name):
+        """הקטגוריה של שם פריט אחד - הראשונה לפי סדר העדיפות מבין המתאימות"""
+        mask = self._scan(name)
+        if not mask:
+            return self.default
+        return self.categories[(mask & -mask).bit_length() - 1]
+
+    def matches(self, name):
+        """כל הקטגוריות שמתאימות לשם פריט, לפי סדר העדיפות (tuple ריק אם אין)"""
+        mask = self._scan(name)
+        return tuple(category for rank, category in enumerate(self.categories) if mask >> rank & 1)
+
+    def classify_many(self, names):
+        """קטגוריה לכל שם ברשימה או בעמודה - כל שם ייחודי מסווג פעם אחת"""
+        return self._many(names, self.classify)
+
+    def match_many(self, names):
+        """tuple של כל הקטגוריות המתאימות לכל שם - כל שם ייחודי נסרק פעם אחת"""
+        return self._many(names, self.matches)
+
+    def _many(self, names, func):
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object).astype(str))
+        if len(codes) == 0:
+            return np.array([], dtype=object)
+        results = np.empty(len(uniques), dtype=object)
+        results[:] = [func(name) for name in uniques]
+        return results[codes]
+
+    def _scan(self, name):
+        """מעבר אחד על התווים - מסכת הקטגוריות שמילת מפתח שלהן מופיעה בשם (נשמרת בזיכרון)"""
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        state, mask = 0, 0
+        for char in self._normalize(str(name)):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            mask |= self._mask[state]
+        self._cache[name] = mask
+        return mask
+
+    def _normalize(self, text):
+        return text if self.case_sensitive else text.lower()
+
+    def _add(self, keyword, rank):
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._mask.append(0)
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._mask[state] |= 1 << rank
+
+    def _build_fail_links(self):
+        """קישורי כישלון ב-BFS; כל מצב יורש את ההתאמות של מצב הכישלון שלו (סיומות של המחרוזת)"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._mask[child] |= self._mask[self._fail[child]]
+                queue.append(child)
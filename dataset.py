@@ -0,0 +1,179 @@
+"""
+Dataset Module - מערך הנתונים הטעון של הדשבורד
+
+Dataset מחזיק את ה-TransactionStore הממוין לפי תאריך ואת הקובייה המצטברת, ומאפשר למזג אליו העלאות חדשות באופן אינקרמנטלי:
+- merge מזהה אילו הזמנות חדשות ואילו השתנו (לפי hash תוכן של כל עסקה). הזמנה מזוהה במפתח
+  הקנוני (z_number, register, order_id) דרך אינדקס hash; שורות ישנות בלי Z מותאמות לפי קופה והזמנה
+- הקובייה מתעדכנת רק בהפרש - הגרסאות הישנות מוחסרות והחדשות מתווספות
+- לכל יום נשמר תקציר (סכום ה-hash של העסקאות באותו יום), ו-fingerprint של טווח תאריכים
+  נגזר מהתקצירים של הימים בטווח - כך caches של טווחים שלא נגעו בהם ממשיכים לפגוע
+"""
+
+import numpy as np
+import pandas as pd
+
+from rollup_cube import RollupCube
+from transaction_store import TransactionStore, combine_fingerprints
+
+
+def _day(value) -> np.datetime64:
+    return pd.Timestamp(value).to_datetime64().astype('datetime64[D]')
+
+
+class Dataset:
+    """
+    מערך נתונים ממוין לפי תאריך עם קובייה ותקצירים יומיים
+
+    Args:
+        store: TransactionStore (ימוין לפי תאריך אם צריך)
+    """
+
+    def __init__(self, store):
+        # סדר קנוני (זמן, order_id) - אותו תוכן נותן אותו סדר, לא משנה באיזה סדר מוזג
+        order = store.date_order()
+        if not np.array_equal(order, np.arange(len(order))):
+            store = store.take(order)
+
+        self.cube = RollupCube.from_store(store)
+        self._tx_hashes = store.transaction_hashes()
+        self._order_index = None
+        self._days = np.array([], dtype='datetime64[D]')
+        self._day_hashes = np.array([], dtype=np.uint64)
+        self._day_counts = np.array([], dtype=np.int64)
+        self._add_day_hashes(store.day_index(), self._tx_hashes, 1)
+        # store משלנו, עם fingerprint שנגזר מהתקצירים היומיים
+        self.store = TransactionStore(store.transactions, store.items, store.payments,
+                                      fingerprint=self.range_fingerprint())
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        return cls(TransactionStore.from_transactions(transactions))
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def fingerprint(self) -> str:
+        return self.store.fingerprint
+
+    def merge(self, new_transactions):
+        """
+        מיזוג טרנזקציות חדשות (TransactionStore, או רשימת מילונים מה-parser). הזמנה (לפי המפתח הקנוני) שכבר קיימת עם תוכן שונה מוחלפת בגרסה החדשה;
+        הזמנה שמופיעה כמה פעמים באותה העלאה - המופע האחרון קובע (קובץ מאוחר מחליף קובץ קודם).
+
+        Returns:
+            (added, updated) - רשימות order_id של הזמנות שנוספו ושל הזמנות שעודכנו
+        """
+        new_store = new_transactions if isinstance(new_transactions, TransactionStore) else \
+            TransactionStore.from_transactions(new_transactions)
+        if not len(new_store):
+            return [], []
+
+        order_ids = new_store.transactions['order_id'].astype(str).to_numpy()
+        keys = new_store.transaction_keys()
+        # המופע האחרון של כל מפתח: np.unique מחזיר מופע ראשון, ולכן על המערך ההפוך
+        _, last_reversed = np.unique(keys[::-1].astype(str), return_index=True)
+        latest = np.sort(len(keys) - 1 - last_reversed)
+        new_hashes = new_store.transaction_hashes()[latest]
+
+        existing = self._find(new_store, latest)
+        is_new = existing < 0
+        changed = np.zeros(len(latest), dtype=bool)
+        changed[~is_new] = self._tx_hashes[existing[~is_new]] != new_hashes[~is_new]
+        if not is_new.any() and not changed.any():
+            return [], []
+
+        incoming_positions = latest[is_new | changed]
+        removed_positions = existing[changed]
+        incoming = new_store.take(incoming_positions)
+        removed = self.store.take(removed_positions)
+        incoming_hashes = new_hashes[is_new | changed]
+
+        # קובייה ותקצירים יומיים - רק ההפרש
+        self.cube = self.cube.update(added=incoming, removed=removed)
+        self._add_day_hashes(removed.day_index(), self._tx_hashes[removed_positions], -1)
+        self._add_day_hashes(incoming.day_index(), incoming_hashes, 1)
+
+        # store: העסקאות הישנות שנשארו ואחריהן החדשות, בסדר כרונולוגי
+        keep = np.ones(len(self.store), dtype=bool)
+        keep[removed_positions] = False
+        kept_positions = np.flatnonzero(keep)
+        combined = TransactionStore.concat([self.store.take(kept_positions), incoming])
+        order = combined.date_order()
+
+        self.store = combined.take(order, fingerprint=self.range_fingerprint())
+        self._tx_hashes = np.concatenate([self._tx_hashes[kept_positions], incoming_hashes])[order]
+        self._order_index = None
+
+        return order_ids[latest[is_new]].tolist(), order_ids[latest[changed]].tolist()
+
+    def range_fingerprint(self, start_date=None, end_date=None) -> str:
+        """fingerprint של טווח תאריכים (כולל) - נגזר מהתקצירים של הימים בטווח בלבד"""
+        lo, hi = self._day_bounds(start_date, end_date)
+        return combine_fingerprints(self._days[lo:hi].astype(np.int64), self._day_hashes[lo:hi])
+
+    def date_slice(self, start_date, end_date):
+        """TransactionStore של הטווח - חיתוך, בלי מעבר על הנתונים"""
+        lo, hi = self.store.date_bounds(start_date, end_date)
+        return self.store.slice_rows(lo, hi, fingerprint=self.range_fingerprint(start_date, end_date))
+
+    def _find(self, new_store, positions):
+        """
+        מיקום כל עסקה חדשה ב-store הקיים (1- אם אינה קיימת) - חיפוש במפתח הקנוני המלא,
+        ואם לא נמצאה וחסר Z באחד הצדדים (שורות ענן מלפני עמודת Z_Number) - לפי קופה והזמנה
+        """
+        key_index, short_index, short_positions = self._get_key_index()
+        existing = key_index.get_indexer(new_store.transaction_keys()[positions])
+
+        missing = np.flatnonzero(existing < 0)
+        if len(missing) and len(short_index):
+            tx = new_store.transactions.iloc[positions[missing]]
+            found = short_index.get_indexer(_short_keys(tx))
+            candidates = np.where(found >= 0, short_positions[found], -1)
+            matched = candidates >= 0
+            existing_z = self.store.transactions['z_number'].fillna('').astype(str).to_numpy()
+            new_z = tx['z_number'].fillna('').astype(str).to_numpy()
+            matched[matched] &= (new_z[matched] == '') | (existing_z[candidates[matched]] == '')
+            existing[missing[matched]] = candidates[matched]
+        return existing
+
+    def _get_key_index(self):
+        """
+        אינדקס hash של המפתחות הקנוניים, ואינדקס קופה|הזמנה (רק הזמנות שאינן דו-משמעיות)
+        עם המיקום של כל אחת ב-store
+        """
+        if self._order_index is None:
+            short_keys = pd.Series(np.arange(len(self.store)), index=_short_keys(self.store.transactions))
+            short_keys = short_keys[~short_keys.index.duplicated(keep=False)]
+            self._order_index = (pd.Index(self.store.transaction_keys()),
+                                 short_keys.index, short_keys.to_numpy())
+        return self._order_index
+
+    def _day_bounds(self, start_date, end_date):
+        lo = 0 if start_date is None else np.searchsorted(self._days, _day(start_date), side='left')
+        hi = len(self._days) if end_date is None else np.searchsorted(self._days, _day(end_date), side='right')
+        return lo, hi
+
+    def _add_day_hashes(self, days, hashes, sign):
+        """עדכון התקצירים היומיים - חיבור (או חיסור) ה-hash של עסקאות לימים שלהן, מודולו 2^64"""
+        if len(days) == 0:
+            return
+        if sign < 0:
+            hashes = np.zeros_like(hashes) - hashes
+        all_days = np.concatenate([self._days, days])
+        unique_days, inverse = np.unique(all_days, return_inverse=True)
+
+        day_hashes = np.zeros(len(unique_days), dtype=np.uint64)
+        np.add.at(day_hashes, inverse, np.concatenate([self._day_hashes, hashes]))
+        day_counts = np.zeros(len(unique_days), dtype=np.int64)
+        np.add.at(day_counts, inverse, np.concatenate([self._day_counts, np.full(len(days), sign)]))
+
+        nonempty = day_counts > 0
+        self._days = unique_days[nonempty]
+        self._day_hashes = day_hashes[nonempty]
+        self._day_counts = day_counts[nonempty]
+
+
+def _short_keys(tx):
+    """register|order_id - להתאמת שורות שחסר בהן z_number"""
+    return (tx['register'].fillna('').astype(str) + '|' + tx['order_id'].astype(str)).to_numpy()
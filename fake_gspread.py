@@ -0,0 +1,272 @@
+"""
+Fake gspread - תחליף מקומי ל-gspread לבדיקות ללא רשת
+
+מממש את החלק של ה-API ש-google_sheets_connector משתמש בו, שומר את התאים בזיכרון
+כמחרוזות (כמו FORMATTED_VALUE) ורושם כל קריאה ב-calls יחד עם מספר התאים שנקראו,
+כדי שבדיקות יוכלו לוודא כמה נתונים עברו "ברשת".
+
+FakeSheetsSession הוא "שרת" מקומי ברמת ה-HTTP: session שמקבל את בקשות ה-REST של
+gspread.Client האמיתי ועונה מתוך FakeSpreadsheet, עם הזרקת שגיאות (429, 5xx) והשהיה.
+"""
+
+import json
+import threading
+import time
+from urllib.parse import unquote
+
+import gspread
+from gspread.utils import a1_range_to_grid_range
+
+
+class FakeWorksheet:
+    """גיליון בזיכרון - השורה הראשונה היא שורת הכותרות"""
+
+    def __init__(self, title='History', rows=None, spreadsheet=None, sheet_id=0):
+        self.title = title
+        self.id = sheet_id
+        self.spreadsheet = spreadsheet
+        self._rows = [[_cell(v) for v in row] for row in (rows or [])]
+        self.calls = []
+        self.cells_read = 0
+
+    # ------------------------------------------------------------
+    # קריאה
+    # ------------------------------------------------------------
+
+    def _record(self, name, values):
+        self.calls.append(name)
+        self.cells_read += sum(len(row) for row in values)
+        return values
+
+    def _range(self, range_name):
+        grid = a1_range_to_grid_range(range_name)
+        start_row = grid.get('startRowIndex', 0)
+        end_row = grid.get('endRowIndex', len(self._rows))
+        start_col = grid.get('startColumnIndex', 0)
+        end_col = grid.get('endColumnIndex')
+
+        values = []
+        for row in self._rows[start_row:end_row]:
+            values.append(_rstrip(row[start_col:end_col]))
+        # Sheets לא מחזיר שורות ריקות בסוף הטווח
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def get(self, range_name=None, **kwargs):
+        return self._record('get', self._range(range_name) if range_name else [list(r) for r in self._rows])
+
+    def batch_get(self, ranges, **kwargs):
+        values = [self._range(range_name) for range_name in ranges]
+        self.calls.append('batch_get')
+        self.cells_read += sum(len(row) for block in values for row in block)
+        return values
+
+    def row_values(self, row, **kwargs):
+        values = _rstrip(self._rows[row - 1]) if row <= len(self._rows) else []
+        return self._record('row_values', [values])[0]
+
+    def col_values(self, col, **kwargs):
+        values = _rstrip([row[col - 1] if len(row) >= col else '' for row in self._rows])
+        self._record('col_values', [[v] for v in values])
+        return values
+
+    def get_all_values(self, **kwargs):
+        return self._record('get_all_values', [list(row) for row in self._rows])
+
+    def get_all_records(self, **kwargs):
+        values = self._record('get_all_records', [list(row) for row in self._rows])
+        if not values:
+            return []
+        headers = values[0]
+        return [dict(zip(headers, row + [''] * (len(headers) - len(row)))) for row in values[1:]]
+
+    # ------------------------------------------------------------
+    # כתיבה
+    # ------------------------------------------------------------
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        self.calls.append('append_rows')
+        self._rows.extend([_cell(v) for v in row] for row in values)
+
+    def update(self, range_name=None, values=None, **kwargs):
+        self.calls.append('update')
+        grid = a1_range_to_grid_range(range_name)
+        start_row, start_col = grid.get('startRowIndex', 0), grid.get('startColumnIndex', 0)
+        for r, row in enumerate(values):
+            while len(self._rows) <= start_row + r:
+                self._rows.append([])
+            target = self._rows[start_row + r]
+            for c, value in enumerate(row):
+                while len(target) <= start_col + c:
+                    target.append('')
+                target[start_col + c] = _cell(value)
+
+    def delete_rows(self, start_index, end_index=None):
+        self.calls.append('delete_rows')
+        end_index = end_index or start_index
+        del self._rows[start_index - 1:end_index]
+
+    @property
+    def row_count(self):
+        return len(self._rows)
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets=None):
+        self._worksheets = {}
+        self.calls = []
+        for ws in worksheets or []:
+            self._add(ws)
+
+    def _add(self, ws):
+        ws.spreadsheet = self
+        self._worksheets[ws.title] = ws
+        return ws
+
+    def worksheet(self, title):
+        if title not in self._worksheets:
+            raise gspread.WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        return self._add(FakeWorksheet(title, sheet_id=len(self._worksheets)))
+
+    def batch_update(self, body):
+        """תומך ב-deleteDimension על שורות - הבקשות מבוצעות לפי הסדר, כמו ב-Sheets API"""
+        self.calls.append('batch_update')
+        by_id = {ws.id: ws for ws in self._worksheets.values()}
+        for request in body['requests']:
+            grid = request['deleteDimension']['range']
+            if grid['dimension'] != 'ROWS':
+                raise NotImplementedError(grid['dimension'])
+            ws = by_id[grid['sheetId']]
+            del ws._rows[grid['startIndex']:grid['endIndex']]
+        return {'replies': [{} for _ in body['requests']]}
+
+
+class FakeClient:
+    """תחליף ל-gspread.Client - כל URL פותח את אותו FakeSpreadsheet"""
+
+    def __init__(self, spreadsheet=None):
+        self.spreadsheet = spreadsheet or FakeSpreadsheet()
+
+    def open_by_url(self, url):
+        return self.spreadsheet
+
+
+class FakeResponse:
+    """מספיק מ-requests.Response בשביל gspread"""
+
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(payload if payload is not None else {}, ensure_ascii=False).encode('utf-8')
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSheetsSession:
+    """
+    session שעונה לבקשות Sheets API v4 של gspread מתוך FakeSpreadsheet
+
+    תומך בקריאת metadata, values.get, values.batchGet, values.append ו-batchUpdate.
+    fail() מזריק תשובות שגיאה לבקשות הבאות; delay משהה כל בקשה (לבדיקת בקשות מקבילות).
+    """
+
+    SPREADSHEET_ID = 'fake-spreadsheet'
+    URL = f'https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/edit'
+
+    def __init__(self, spreadsheet=None, delay=0.0):
+        self.spreadsheet = spreadsheet or FakeSpreadsheet()
+        self.delay = delay
+        self.requests = []
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def fail(self, status=429, times=1, retry_after=None):
+        """הבקשות הבאות (times) ייכשלו בסטטוס status"""
+        headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+        error = {'error': {'code': status, 'message': 'injected', 'status': 'RESOURCE_EXHAUSTED'}}
+        with self._lock:
+            self._failures.extend([FakeResponse(status, error, headers)] * times)
+
+    def get(self, endpoint, **kwargs):
+        return self._handle('get', endpoint, kwargs)
+
+    def post(self, endpoint, **kwargs):
+        return self._handle('post', endpoint, kwargs)
+
+    def put(self, endpoint, **kwargs):
+        return self._handle('put', endpoint, kwargs)
+
+    def _handle(self, method, endpoint, kwargs):
+        with self._lock:
+            self.requests.append((method, endpoint))
+            failure = self._failures.pop(0) if self._failures else None
+        if self.delay:
+            time.sleep(self.delay)
+        if failure is not None:
+            return failure
+
+        path = endpoint.split(f'/spreadsheets/{self.SPREADSHEET_ID}', 1)[1]
+        params = kwargs.get('params') or {}
+        body = kwargs.get('json') or {}
+        if method == 'get' and path == '':
+            return FakeResponse(200, self._metadata())
+        if method == 'get' and path == '/values:batchGet':
+            ranges = params['ranges']
+            return FakeResponse(200, {'valueRanges': [self._values(r) for r in ranges]})
+        if method == 'get' and path.startswith('/values/'):
+            return FakeResponse(200, self._values(unquote(path[len('/values/'):])))
+        if method == 'post' and path.startswith('/values/') and path.endswith(':append'):
+            ws, _ = self._split_range(unquote(path[len('/values/'):-len(':append')]))
+            ws.append_rows(body['values'])
+            return FakeResponse(200, {'updates': {'updatedRows': len(body['values'])}})
+        if method == 'post' and path == ':batchUpdate':
+            return FakeResponse(200, self.spreadsheet.batch_update(body))
+        return FakeResponse(404, {'error': {'code': 404, 'message': f'{method} {path}'}})
+
+    def _metadata(self):
+        sheets = [{'properties': {'sheetId': ws.id, 'title': ws.title, 'index': i,
+                                  'gridProperties': {'rowCount': max(ws.row_count, 1000), 'columnCount': 26}}}
+                  for i, ws in enumerate(self.spreadsheet._worksheets.values())]
+        return {'spreadsheetId': self.SPREADSHEET_ID, 'properties': {'title': 'Fake'}, 'sheets': sheets}
+
+    def _split_range(self, range_name):
+        # "'History'!A1:B2", או רק "'History'" לגיליון כולו
+        title, _, cells = range_name.rpartition('!') if '!' in range_name else (range_name, '', '')
+        return self.spreadsheet.worksheet(title.strip("'")), cells
+
+    def _values(self, range_name):
+        ws, cells = self._split_range(range_name)
+        values = ws._range(cells)
+        ws.cells_read += sum(len(row) for row in values)
+        return {'range': range_name, 'majorDimension': 'ROWS', 'values': values}
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _rstrip(row):
+    row = list(row)
+    while row and row[-1] == '':
+        row.pop()
+    return row
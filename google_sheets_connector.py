@@ -2,13 +2,25 @@
 Google Sheets Connector Module - מודול לחיבור וסנכרון עם Google Sheets
 """
 
+import os
+import re
+import hashlib
+import threading
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 import gspread
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
 import json
 
+from sheets_client import HealthProbe, SheetsClient, SheetsRateLimitError
+from transaction_store import TransactionStore, line_key
+
 
 # --- הגדרות ---
 # עמודות שמתאימות ל-Google Sheet
@@ -16,9 +28,41 @@ REQUIRED_COLUMNS = [
     "Transaction_ID", "Date", "Time", "Order_ID", "Invoice_ID",
     "Payment_Method", "Item_Name", "Item_Code", "Quantity",
     "Unit_Price", "Taxable_Amount", "Sale_Price", "VAT_Amount",
-    "Register", "Cashier"
+    "Register", "Cashier", "Z_Number"
 ]
 
+# Transaction_ID בפורמט הישן (date_order_name_quantity) - מתנגש כשאותו פריט מופיע פעמיים בהזמנה.
+# שורות כאלה עדיין נספרות בסנכרון כדי שלא יועלו שוב
+LEGACY_ID_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}_')
+
+# העמודות ש-cloud_data_to_store צריך (Transaction_ID משמש רק לסנכרון)
+TRANSACTION_MODEL_COLUMNS = [col for col in REQUIRED_COLUMNS if col != "Transaction_ID"]
+
+# סוגי עמודות בקריאה מה-Sheet - מספריות, וכאלה שנקראות כ-category (מעט ערכים שונים, הרבה חזרות)
+NUMERIC_COLUMNS = ['Quantity', 'Unit_Price', 'Taxable_Amount', 'Sale_Price', 'VAT_Amount']
+CATEGORY_COLUMNS = ['Item_Name', 'Payment_Method', 'Cashier', 'Register']
+
+# הודעה למשתמש כשמכסת הבקשות לדקה נוצלה גם אחרי הניסיונות החוזרים של SheetsClient
+RATE_LIMIT_MESSAGE = "⏳ חריגה ממכסת הבקשות של Google Sheets - נסה שוב בעוד דקה"
+
+# שניות עד שבדיקת החיבור (HealthProbe) מתרעננת ברקע
+HEALTH_PROBE_TTL = 30
+
+# קובץ manifest מקומי לסנכרון הדרגתי - מזהי Transaction_ID שכבר נמצאים בגיליון וה-watermark
+SYNC_MANIFEST_PATH = os.environ.get(
+    'CAFE_DASHBOARD_SYNC_MANIFEST',
+    os.path.join(os.path.expanduser('~'), '.cache', 'cafe-dashboard', 'sheets_sync.json')
+)
+
+# שניות עד שרענון של SheetMirror קורא שוב את הגיליון כולו - רק כך מתגלות עריכות בשורות ישנות
+MIRROR_FULL_RESYNC_SECONDS = 3600
+
+# עותק מקומי של הגיליון (Arrow IPC) ו-manifest של מספר שורות ו-checksum לכל גיליון
+MIRROR_DIR = os.environ.get(
+    'CAFE_DASHBOARD_MIRROR_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'cafe-dashboard', 'mirror')
+)
+
 
 @st.cache_resource
 def init_gsheets_connection():
@@ -48,8 +92,8 @@ def init_gsheets_connection():
         # יצירת credentials
         creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
 
-        # חיבור ל-gspread
-        gc = gspread.authorize(creds)
+        # חיבור ל-gspread - דרך SheetsClient (הגבלת קצב וניסיונות חוזרים לכל הבקשות)
+        gc = SheetsClient(auth=creds)
         return gc
 
     except Exception as e:
@@ -69,88 +113,313 @@ def get_spreadsheet_url():
     return None
 
 
-@st.cache_resource(ttl=300)  # Cache for 5 minutes
-def get_worksheet(_gc, sheet_name: str):
+def open_worksheet(gc, spreadsheet_url, sheet_name: str):
     """
-    קבלת worksheet ספציפי
+    פתיחת worksheet, או יצירתו עם headers אם לא קיים - בלי cache ובלי קריאות st.
+    לשימוש מ-thread רקע (ReplicationWorker): כל כישלון נזרק לקורא
 
-    Args:
-        _gc: gspread client (underscore prefix to prevent hashing)
-        sheet_name: שם הגיליון
+    Raises:
+        ConnectionError: אין client או שלא הוגדר spreadsheet_url
     """
-    if _gc is None:
-        return None
+    if gc is None:
+        raise ConnectionError("אין חיבור ל-Google Sheets")
+    if not spreadsheet_url:
+        raise ConnectionError("spreadsheet_url לא הוגדר ב-secrets")
 
+    sh = gc.open_by_url(spreadsheet_url)
     try:
-        spreadsheet_url = get_spreadsheet_url()
+        return sh.worksheet(sheet_name)
+    except gspread.WorksheetNotFound:
+        # צור גיליון חדש עם headers
+        ws = sh.add_worksheet(title=sheet_name, rows=1000, cols=20)
+        ws.append_row(REQUIRED_COLUMNS)
+        return ws
 
-        if not spreadsheet_url:
-            st.error("❌ spreadsheet_url לא הוגדר ב-secrets")
-            return None
 
-        sh = _gc.open_by_url(spreadsheet_url)
+@st.cache_resource
+def get_sheet_mirror():
+    """SheetMirror משותף לכל ה-sessions (ול-thread של הסנכרון)"""
+    return SheetMirror()
 
-        # נסה לקבל את הגיליון, או צור אותו אם לא קיים
-        try:
-            return sh.worksheet(sheet_name)
-        except gspread.WorksheetNotFound:
-            # צור גיליון חדש עם headers
-            ws = sh.add_worksheet(title=sheet_name, rows=1000, cols=20)
-            ws.append_row(REQUIRED_COLUMNS)
-            return ws
 
-    except Exception as e:
-        st.error(f"❌ שגיאה בקבלת worksheet '{sheet_name}': {str(e)}")
-        return None
+def read_history(ws, columns: list = None, start_date=None, end_date=None) -> pd.DataFrame:
+    """
+    קריאה ממוקדת של עמודות מהגיליון ישירות לעמודות NumPy מוקלדות
+
+    במקום get_all_records (כל העמודות כמילונים) - batch_get של טווח לכל עמודה מבוקשת.
+    עם טווח תאריכים, עמודת Date נקראת קודם ושאר העמודות נקראות רק בטווח השורות הרלוונטי.
 
+    Args:
+        ws: worksheet
+        columns: עמודות לקריאה (ברירת מחדל: כל העמודות בגיליון)
+        start_date / end_date: הגבלת השורות לטווח תאריכים (כולל)
 
-@st.cache_data(ttl=300, show_spinner="טוען נתונים מהענן...")
-def get_cloud_history(sheet_name: str = "History") -> pd.DataFrame:
+    Returns:
+        DataFrame: NUMERIC_COLUMNS כ-float64, Date כ-datetime64, CATEGORY_COLUMNS כ-category
     """
-    קריאת כל ההיסטוריה מ-Google Sheets
-    עם caching ל-5 דקות
+    headers = ws.row_values(1)
+    columns = [col for col in (columns or headers) if col in headers]
+    if not columns:
+        return pd.DataFrame()
+
+    data = {}
+    row_mask = None
+    first_row, last_row = 2, ''
+
+    if start_date is not None or end_date is not None:
+        dates = _parse_date_column(fetch_sheet_columns(ws, headers, ['Date'])[0])
+        mask = np.ones(len(dates), dtype=bool)
+        if start_date is not None:
+            mask &= (dates >= pd.Timestamp(start_date)).to_numpy()
+        if end_date is not None:
+            mask &= (dates <= pd.Timestamp(end_date)).to_numpy()
+
+        matching = np.flatnonzero(mask)
+        if len(matching) == 0:
+            return pd.DataFrame({col: pd.Series(dtype=_column_dtype(col)) for col in columns})
+
+        # שאר העמודות נקראות רק בטווח השורות שמכיל תאריכים מתאימים
+        lo, hi = matching[0], matching[-1]
+        first_row, last_row = int(lo) + 2, int(hi) + 2
+        row_mask = mask[lo:hi + 1]
+        if 'Date' in columns:
+            data['Date'] = dates.iloc[lo:hi + 1].to_numpy()
+
+    to_fetch = [col for col in columns if col not in data]
+    raw_columns = fetch_sheet_columns(ws, headers, to_fetch, first_row, last_row,
+                                      n_rows=len(row_mask) if row_mask is not None else None)
+    for col, values in zip(to_fetch, raw_columns):
+        data[col] = _typed_column(col, values)
+
+    df = pd.DataFrame({col: data[col] for col in columns})
+
+    if row_mask is None:
+        row_mask = non_empty_rows(raw_columns)
+
+    return df[row_mask].reset_index(drop=True)
+
+
+def fetch_sheet_columns(ws, headers: list, columns: list, first_row: int = 2, last_row='',
+                        n_rows: int = None) -> list:
+    """
+    קריאת batch_get אחת של טווח שורות לכל עמודה מבוקשת
 
-    Args:
-        sheet_name: שם הגיליון (ברירת מחדל: "History")
+    Sheets לא מחזיר תאים ריקים בסוף הטווח, ולכן העמודות מרופדות ב-'' לאורך אחיד
+    (n_rows, או אורך העמודה הארוכה ביותר).
 
     Returns:
-        DataFrame עם כל הנתונים
+        רשימת עמודות של ערכים גולמיים (מחרוזות), באותו סדר כמו columns
     """
-    gc = init_gsheets_connection()
-    if gc is None:
-        return pd.DataFrame(columns=REQUIRED_COLUMNS)
+    if not columns:
+        return []
 
-    try:
-        ws = get_worksheet(gc, sheet_name)
-        if ws is None:
-            return pd.DataFrame(columns=REQUIRED_COLUMNS)
+    def column_range(col):
+        letter = rowcol_to_a1(1, headers.index(col) + 1)[:-1]
+        return f"{letter}{first_row}:{letter}{last_row}"
 
-        # קריאת כל הנתונים
-        data = ws.get_all_records()
-        if not data:
-            return pd.DataFrame(columns=REQUIRED_COLUMNS)
+    raw_columns = [_flatten_column(values) for values in ws.batch_get([column_range(col) for col in columns])]
+    if n_rows is None:
+        n_rows = max(len(values) for values in raw_columns)
+    return [values + [''] * (n_rows - len(values)) for values in raw_columns]
 
-        df = pd.DataFrame(data)
 
-        # המרת עמודות מספריות
-        numeric_columns = ['Quantity', 'Unit_Price', 'Taxable_Amount', 'Sale_Price', 'VAT_Amount']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+def non_empty_rows(raw_columns: list) -> np.ndarray:
+    """מסכה של שורות שיש בהן ערך כלשהו - שורות ריקות לחלוטין (למשל אחרי ניקוי תוכן ידני) נזרקות"""
+    n_rows = len(raw_columns[0]) if raw_columns else 0
+    mask = np.zeros(n_rows, dtype=bool)
+    for values in raw_columns:
+        mask |= np.array(values, dtype=object) != ''
+    return mask
 
-        # המרת תאריכים - תומך בפורמט dd/mm/yyyy
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y', errors='coerce')
 
-        return df
+def typed_history_frame(columns: list, raw_columns: list) -> pd.DataFrame:
+    """עמודות גולמיות מהגיליון ל-DataFrame מוקלד (אותם סוגים כמו read_history), כולל שורות ריקות"""
+    return pd.DataFrame({col: _typed_column(col, values) for col, values in zip(columns, raw_columns)})
+
+
+def _flatten_column(values) -> list:
+    """טווח של עמודה אחת (רשימת שורות) לרשימת ערכים"""
+    return [row[0] if row else '' for row in values]
 
-    except Exception as e:
-        return pd.DataFrame(columns=REQUIRED_COLUMNS)
 
+def _parse_date_column(values) -> pd.Series:
+    return pd.to_datetime(pd.Series(values, dtype=object), format='%d/%m/%Y', errors='coerce')
 
-def clear_cloud_cache():
-    """ניקוי cache של נתוני הענן - קרא אחרי שמירת נתונים חדשים"""
-    get_cloud_history.clear()
+
+def _column_dtype(col):
+    if col in NUMERIC_COLUMNS:
+        return 'float64'
+    if col == 'Date':
+        return 'datetime64[ns]'
+    if col in CATEGORY_COLUMNS:
+        return 'category'
+    return object
+
+
+def _typed_column(col, values):
+    if col in NUMERIC_COLUMNS:
+        return _parse_amounts(values)
+    if col == 'Date':
+        return _parse_date_column(values).to_numpy()
+    if col in CATEGORY_COLUMNS:
+        return pd.Categorical(values)
+    return np.array(values, dtype=object)
+
+
+def _parse_amounts(values) -> np.ndarray:
+    cleaned = pd.Series(values, dtype=object).astype(str).str.replace(r'[,₪\s]', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').fillna(0).to_numpy(dtype='float64')
+
+
+class SheetMirror:
+    """
+    עותק מקומי של גיליון (קובץ Arrow IPC לכל גיליון) עם רענון הדרגתי
+
+    ה-manifest שומר לכל גיליון את שורת הכותרות, את מספר השורה האחרונה שנקראה (last_row),
+    את מספר השורות בעותק, checksum של התאים בשורה האחרונה וזמן הקריאה המלאה האחרונה.
+    רענון קורא בקריאת batch_get אחת את השורות מ-last_row ואילך: אם השורה הראשונה עדיין
+    תואמת ל-checksum, רק השורות שאחריה נוספות לעותק; אחרת (השורה האחרונה נמחקה, זזה או
+    נערכה, כותרות השתנו, עותק פגום) - קריאה מלאה של הגיליון.
+
+    מגבלה: ה-checksum מכסה רק את השורה ב-last_row, ולכן עריכה או מחיקה של שורות קודמות לה
+    לא מתגלה ברענון הדרגתי. לכן כל full_resync_interval שניות הרענון קורא את הגיליון כולו
+    (ומחזיר את כל השורות), וכך עריכות כאלה מגיעות לעותק לכל המאוחר אחרי פרק הזמן הזה.
+    העותק נקרא עם memory map, כך שהפעלה קרה לא מפענחת שוב את הגיליון.
+
+    Args:
+        mirror_dir: תיקיית העותקים וה-manifest
+        full_resync_interval: שניות בין קריאות מלאות של הגיליון
+    """
+
+    def __init__(self, mirror_dir=MIRROR_DIR, full_resync_interval=MIRROR_FULL_RESYNC_SECONDS, clock=time.time):
+        self.mirror_dir = mirror_dir
+        self.full_resync_interval = full_resync_interval
+        self._clock = clock
+        self.manifest_path = os.path.join(mirror_dir, 'manifest.json')
+        self._lock = threading.Lock()
+        os.makedirs(mirror_dir, exist_ok=True)
+
+    def _data_path(self, sheet_key):
+        name = hashlib.sha256(sheet_key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.mirror_dir, f"{name}.arrow")
+
+    def entry(self, sheet_key):
+        """רשומת ה-manifest של הגיליון, או None"""
+        return load_sync_manifest(self.manifest_path).get(sheet_key)
+
+    def refresh(self, ws, sheet_key) -> pd.DataFrame:
+        """
+        עדכון העותק מהגיליון
+
+        Returns:
+            DataFrame מוקלד של השורות שנוספו לעותק (כל השורות אחרי קריאה מלאה)
+        """
+        with self._lock:
+            manifest = load_sync_manifest(self.manifest_path)
+            entry = manifest.get(sheet_key)
+            table = self._open(sheet_key, entry)
+            headers = ws.row_values(1)
+            now = self._clock()
+
+            if (table is not None and entry['columns'] == headers
+                    and now - entry.get('full_read_at', 0) < self.full_resync_interval):
+                raw_columns = fetch_sheet_columns(ws, headers, headers, first_row=entry['last_row'])
+                if raw_columns and raw_columns[0] and _row_checksum(raw_columns, 0) == entry['checksum']:
+                    appended = [values[1:] for values in raw_columns]
+                    delta = self._typed(headers, appended)
+                    if len(appended[0]):
+                        table = pa.concat_tables([table, _to_arrow(delta)])
+                        entry = dict(entry, last_row=entry['last_row'] + len(appended[0]),
+                                     checksum=_row_checksum(appended, -1))
+                        self._save(manifest, sheet_key, entry, table)
+                    return delta
+
+            # קריאה מלאה
+            raw_columns = fetch_sheet_columns(ws, headers, headers)
+            delta = self._typed(headers, raw_columns)
+            n_raw = len(raw_columns[0]) if raw_columns else 0
+            checksum = _row_checksum(raw_columns, -1) if n_raw else _row_checksum([[h] for h in headers], 0)
+            entry = {'columns': headers, 'last_row': n_raw + 1, 'checksum': checksum, 'full_read_at': now}
+            self._save(manifest, sheet_key, entry, _to_arrow(delta))
+            return delta
+
+    def read(self, sheet_key, columns: list = None, start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        קריאה מהעותק - בחירת עמודות וסינון תאריכים נעשים על טבלת ה-Arrow לפני ההמרה ל-pandas
+
+        Returns:
+            DataFrame (כמו read_history), או None אם אין עותק לגיליון
+        """
+        table = self._open(sheet_key, self.entry(sheet_key))
+        if table is None:
+            return None
+
+        if 'Date' in table.column_names and (start_date is not None or end_date is not None):
+            dates = table['Date']
+            mask = pc.is_valid(dates)
+            if start_date is not None:
+                mask = pc.and_(mask, pc.greater_equal(dates, pa.scalar(pd.Timestamp(start_date), dates.type)))
+            if end_date is not None:
+                mask = pc.and_(mask, pc.less_equal(dates, pa.scalar(pd.Timestamp(end_date), dates.type)))
+            table = table.filter(mask)
+
+        if columns is not None:
+            table = table.select([col for col in columns if col in table.column_names])
+        return table.to_pandas()
+
+    def invalidate(self, sheet_key):
+        """מחיקת הרשומה מה-manifest - הרענון הבא יקרא את הגיליון כולו"""
+        with self._lock:
+            invalidate_sync_manifest(sheet_key, self.manifest_path)
+
+    def _open(self, sheet_key, entry):
+        """טבלת העותק (memory map), או None אם חסרה או לא תואמת ל-manifest"""
+        if not entry:
+            return None
+        try:
+            table = pa.ipc.open_file(pa.memory_map(self._data_path(sheet_key))).read_all()
+        except (OSError, pa.ArrowException):
+            return None
+        return table if table.num_rows == entry['rows'] else None
+
+    def _save(self, manifest, sheet_key, entry, table):
+        """כתיבה אטומית של העותק ואז של ה-manifest (עותק בלי manifest תואם נקרא מחדש)"""
+        path = self._data_path(sheet_key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        table = table.unify_dictionaries().combine_chunks()
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        manifest[sheet_key] = dict(entry, rows=table.num_rows)
+        save_sync_manifest(manifest, self.manifest_path)
+
+    @staticmethod
+    def _typed(headers, raw_columns):
+        if not raw_columns:
+            return pd.DataFrame()
+        return typed_history_frame(headers, raw_columns)[non_empty_rows(raw_columns)].reset_index(drop=True)
+
+
+def _row_checksum(raw_columns: list, row: int) -> str:
+    """checksum של התאים הגולמיים בשורה אחת"""
+    return hashlib.sha256('\x1f'.join(values[row] for values in raw_columns).encode('utf-8')).hexdigest()
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """DataFrame מוקלד לטבלת Arrow עם סכמה קבועה לפי שם העמודה (גם כשאין שורות)"""
+    schema = pa.schema([(col, _arrow_type(col)) for col in df.columns])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False).replace_schema_metadata(None)
+
+
+def _arrow_type(col):
+    if col in NUMERIC_COLUMNS:
+        return pa.float64()
+    if col == 'Date':
+        return pa.timestamp('ns')
+    if col in CATEGORY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
 
 
 def transactions_to_flat_df(transactions: list) -> pd.DataFrame:
@@ -177,9 +446,9 @@ def transactions_to_flat_df(transactions: list) -> pd.DataFrame:
             if positive_payments:
                 payment_method = max(positive_payments, key=lambda x: x.get('amount', 0)).get('method', '')
 
-        for item in trans['items']:
-            # יצירת מזהה ייחודי
-            unique_id = f"{trans['date']}_{trans['order_id']}_{item['name']}_{item['quantity']}"
+        for line, item in enumerate(trans['items']):
+            # מזהה קנוני - Z, קופה, הזמנה ומיקום הפריט בהזמנה
+            unique_id = line_key(trans.get('z_number', ''), trans.get('register', 'ראשית'), trans['order_id'], line)
 
             records.append({
                 "Transaction_ID": unique_id,
@@ -196,221 +465,434 @@ def transactions_to_flat_df(transactions: list) -> pd.DataFrame:
                 "Sale_Price": item['total_price'],
                 "VAT_Amount": item.get('vat_amount', 0),
                 "Register": trans.get('register', 'ראשית'),
-                "Cashier": item.get('cashier', '')
+                "Cashier": item.get('cashier', ''),
+                "Z_Number": trans.get('z_number', '')
             })
 
-    return pd.DataFrame(records)
+    return pd.DataFrame(records, columns=REQUIRED_COLUMNS)
+
+
+def legacy_transaction_ids(df: pd.DataFrame) -> pd.Series:
+    """ה-Transaction_ID בפורמט הישן לכל שורה במבנה REQUIRED_COLUMNS - להתאמה לשורות שכבר בגיליון"""
+    dates = pd.to_datetime(df['Date'].astype(str), format='%d/%m/%Y', errors='coerce').dt.strftime('%Y-%m-%d')
+    dates = dates.fillna(df['Date'].astype(str))
+    quantities = pd.to_numeric(df['Quantity'], errors='coerce').astype(float).astype(str)
+    return dates + '_' + df['Order_ID'].astype(str) + '_' + df['Item_Name'].astype(str) + '_' + quantities
+
+
+def _count_legacy_ids(ids, counts=None) -> dict:
+    counts = dict(counts or {})
+    for value in ids:
+        if LEGACY_ID_PATTERN.match(value):
+            counts[value] = counts.get(value, 0) + 1
+    return counts
+
 
+def get_manifest_key(sheet_name: str) -> str:
+    """מפתח הגיליון ב-manifest - URL של ה-Spreadsheet ושם הגיליון"""
+    return f"{get_spreadsheet_url()}#{sheet_name}"
 
-def save_to_cloud(new_df: pd.DataFrame, sheet_name: str = "History") -> int:
+
+def load_sync_manifest(path: str = SYNC_MANIFEST_PATH) -> dict:
+    """קריאת ה-manifest המקומי (מילון ריק אם לא קיים או פגום)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_sync_manifest(manifest: dict, path: str = SYNC_MANIFEST_PATH):
+    """כתיבה אטומית של ה-manifest"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def invalidate_sync_manifest(manifest_key: str, path: str = SYNC_MANIFEST_PATH):
+    """מחיקת רשומת גיליון מה-manifest - אחרי מחיקת שורות, כשמיקומי השורות משתנים"""
+    manifest = load_sync_manifest(path)
+    if manifest.pop(manifest_key, None) is not None:
+        save_sync_manifest(manifest, path)
+
+
+def sync_existing_ids(ws, entry: dict = None) -> dict:
     """
-    שמירת נתונים חדשים ל-Google Sheets (ללא כפילויות)
+    עדכון רשימת ה-Transaction_ID הקיימים בגיליון
+
+    אם יש entry מה-manifest, נקראות רק השורות מה-watermark ואילך בעמודת ה-ID.
+    אם השורה ב-watermark לא מכילה את ה-ID הצפוי (למשל נמחקו שורות) - קריאה מלאה של עמודת ה-ID.
 
     Args:
-        new_df: DataFrame עם נתונים חדשים
-        sheet_name: שם הגיליון
+        ws: worksheet
+        entry: רשומת ה-manifest של הגיליון, או None
 
     Returns:
-        מספר השורות שנוספו
+        רשומה מעודכנת: id_col, last_row, last_id, ids (set), columns (שורת הכותרות),
+        legacy_counts (כמה פעמים מופיע כל מזהה בפורמט הישן)
     """
-    if new_df.empty:
-        return 0
+    if entry and 'columns' in entry:
+        column = rowcol_to_a1(1, entry['id_col'])[:-1]
+        values = ws.get(f"{column}{entry['last_row']}:{column}")
+        first = values[0][0] if values and values[0] else ''
+
+        if first == entry['last_id']:
+            appended = [row[0] if row else '' for row in values[1:]]
+            ids = set(entry['ids'])
+            ids.update(appended)
+            ids.discard('')
+            return {
+                'id_col': entry['id_col'],
+                'last_row': entry['last_row'] + len(appended),
+                'last_id': appended[-1] if appended else entry['last_id'],
+                'ids': ids,
+                'columns': entry['columns'],
+                'legacy_counts': _count_legacy_ids(appended, entry.get('legacy_counts'))
+            }
+
+    # קריאה מלאה - רק עמודת ה-ID
+    headers = ws.row_values(1)
+    if 'Transaction_ID' not in headers:
+        raise ValueError("עמודת Transaction_ID לא נמצאה בגיליון")
+
+    id_col = headers.index('Transaction_ID') + 1
+    column_values = ws.col_values(id_col)
+    return {
+        'id_col': id_col,
+        'last_row': len(column_values),
+        'last_id': column_values[-1],
+        'ids': set(column_values[1:]) - {''},
+        'columns': headers,
+        'legacy_counts': _count_legacy_ids(column_values[1:])
+    }
 
-    gc = init_gsheets_connection()
-    if gc is None:
-        return 0
 
-    try:
-        ws = get_worksheet(gc, sheet_name)
-        if ws is None:
-            return 0
+def ensure_sheet_columns(ws, entry: dict, columns) -> list:
+    """
+    הוספת עמודות חסרות לשורת הכותרות (למשל Z_Number בגיליון ישן) - קריאת update אחת.
+    מחזיר את שורת הכותרות המעודכנת
+    """
+    missing = [col for col in columns if col not in entry['columns']]
+    if missing:
+        headers = entry['columns'] + missing
+        ws.update(range_name=f"A1:{rowcol_to_a1(1, len(headers))}", values=[headers])
+        entry['columns'] = headers
+    return entry['columns']
+
 
-        # קרא נתונים קיימים
-        existing_data = ws.get_all_records()
-        existing_ids = set()
+def append_new_rows(ws, new_df: pd.DataFrame, manifest_key: str = None,
+                    manifest_path: str = SYNC_MANIFEST_PATH, batch_size: int = 100) -> int:
+    """
+    הוספת השורות שה-Transaction_ID שלהן עוד לא בגיליון
+
+    Args:
+        ws: worksheet
+        new_df: DataFrame במבנה REQUIRED_COLUMNS
+        manifest_key: מפתח הגיליון ב-manifest; None = ללא manifest (קריאה מלאה של עמודת ה-ID)
+        manifest_path: נתיב קובץ ה-manifest
+        batch_size: מספר שורות בכל קריאת append (מגבלת API)
 
-        if existing_data:
-            existing_df = pd.DataFrame(existing_data)
-            if 'Transaction_ID' in existing_df.columns:
-                existing_ids = set(existing_df['Transaction_ID'].astype(str))
+    Returns:
+        מספר השורות שנוספו
+    """
+    if new_df.empty:
+        return 0
 
-        # סנן רק שורות חדשות
-        new_df['Transaction_ID'] = new_df['Transaction_ID'].astype(str)
-        new_rows = new_df[~new_df['Transaction_ID'].isin(existing_ids)]
+    manifest = load_sync_manifest(manifest_path) if manifest_key else {}
+    entry = sync_existing_ids(ws, manifest.get(manifest_key))
 
-        if new_rows.empty:
-            return 0
+    # סנן רק שורות חדשות - בדיקה מול אינדקס ה-hash של המזהים הקנוניים
+    new_df = new_df.copy()
+    new_df['Transaction_ID'] = new_df['Transaction_ID'].astype(str)
+    exists = new_df['Transaction_ID'].isin(entry['ids'])
 
-        # המר ל-list של lists והוסף
-        rows_to_add = new_rows.values.tolist()
+    # שורות שהועלו בעבר עם מזהה בפורמט הישן - המופע ה-k של מזהה ישן קיים אם יש בגיליון לפחות k כאלה
+    if entry['legacy_counts']:
+        legacy_ids = legacy_transaction_ids(new_df)
+        occurrence = legacy_ids.groupby(legacy_ids, sort=False).cumcount()
+        exists |= occurrence < legacy_ids.map(entry['legacy_counts']).fillna(0)
+    new_rows = new_df[~exists.to_numpy()]
 
-        # הוסף בקבוצות של 100 שורות (מגבלת API)
-        batch_size = 100
-        added_count = 0
+    # המר ל-list של lists לפי סדר העמודות בגיליון והוסף בקבוצות
+    columns = ensure_sheet_columns(ws, entry, new_df.columns) if not new_rows.empty else entry['columns']
+    rows_to_add = new_rows.reindex(columns=columns, fill_value='').values.tolist()
+    new_ids = new_rows['Transaction_ID'].tolist()
+    added_count = 0
 
+    try:
         for i in range(0, len(rows_to_add), batch_size):
             batch = rows_to_add[i:i + batch_size]
             ws.append_rows(batch, value_input_option='USER_ENTERED')
             added_count += len(batch)
+            entry['ids'].update(new_ids[i:i + batch_size])
+            entry['last_row'] += len(batch)
+            entry['last_id'] = new_ids[i + len(batch) - 1]
+    finally:
+        if manifest_key:
+            manifest[manifest_key] = dict(entry, ids=sorted(entry['ids']))
+            save_sync_manifest(manifest, manifest_path)
 
-        # נקה את ה-cache
-        get_worksheet.clear()
-
-        return added_count
+    return added_count
 
-    except Exception as e:
-        st.error(f"❌ שגיאה בשמירה לענן: {str(e)}")
-        return 0
 
-
-def delete_from_cloud(transaction_ids: list, sheet_name: str = "History") -> int:
+def delete_rows_by_id(ws, transaction_ids, dry_run: bool = False) -> dict:
     """
-    מחיקת טרנזקציות מ-Google Sheets
+    מחיקת כל השורות שה-Transaction_ID שלהן ברשימה, בקריאת API אחת
+
+    קוראת רק את עמודת ה-ID, מאחדת את השורות לטווחים רציפים ושולחת
+    batch_update עם בקשת deleteDimension לכל טווח (מהסוף להתחלה,
+    כך שמחיקת טווח לא מזיזה את הטווחים שלפניו)
 
     Args:
-        transaction_ids: רשימת מזהי טרנזקציות למחיקה
-        sheet_name: שם הגיליון
+        ws: worksheet
+        transaction_ids: מזהים למחיקה
+        dry_run: True - רק דוח, בלי מחיקה
 
     Returns:
-        מספר השורות שנמחקו
+        מילון: rows - מספר שורות, ranges - רשימת (שורה ראשונה, שורה אחרונה) בגיליון,
+        matched_ids / missing_ids - מזהים שנמצאו / לא נמצאו, dry_run
     """
-    if not transaction_ids:
-        return 0
-
-    gc = init_gsheets_connection()
-    if gc is None:
-        return 0
-
-    try:
-        ws = get_worksheet(gc, sheet_name)
-        if ws is None:
-            return 0
+    return _delete_matching_rows(ws, set(str(t) for t in transaction_ids), lambda value: value, dry_run)
 
-        # קרא את כל הנתונים
-        all_data = ws.get_all_values()
-        if len(all_data) <= 1:  # רק headers
-            return 0
 
-        headers = all_data[0]
+def delete_orders_by_key(ws, order_keys, dry_run: bool = False) -> dict:
+    """
+    מחיקת כל שורות הפריטים של הזמנות, לפי מפתח העסקה הקנוני (Transaction_ID בלי מספר השורה).
+    כך נמחקות גם שורות של פריטים שכבר לא קיימים בגרסה החדשה של ההזמנה
 
-        # מצא את אינדקס של Transaction_ID
-        try:
-            id_col = headers.index('Transaction_ID')
-        except ValueError:
-            return 0
+    Returns:
+        כמו delete_rows_by_id - matched_ids / missing_ids הם מפתחות הזמנה
+    """
+    return _delete_matching_rows(ws, set(str(k) for k in order_keys),
+                                 lambda value: value.rpartition('|')[0], dry_run)
+
+
+def _delete_matching_rows(ws, wanted, match_key, dry_run):
+    """מחיקת השורות ש-match_key(Transaction_ID) שלהן ב-wanted - ראה delete_rows_by_id"""
+    headers = ws.row_values(1)
+    if 'Transaction_ID' not in headers:
+        return _delete_report([], wanted, dry_run)
+
+    id_values = ws.col_values(headers.index('Transaction_ID') + 1)
+    row_keys = {row_idx: match_key(value) for row_idx, value in enumerate(id_values[1:], start=2)}
+    rows_to_delete = [row_idx for row_idx, key in row_keys.items() if key in wanted]
+    matched = set(row_keys[row_idx] for row_idx in rows_to_delete)
+
+    ranges = coalesce_row_ranges(rows_to_delete)
+    if ranges and not dry_run:
+        ws.spreadsheet.batch_update({'requests': [
+            {'deleteDimension': {'range': {
+                'sheetId': ws.id,
+                'dimension': 'ROWS',
+                'startIndex': start - 1,
+                'endIndex': end
+            }}}
+            for start, end in reversed(ranges)
+        ]})
+
+    return _delete_report(ranges, wanted, dry_run, matched)
+
+
+def coalesce_row_ranges(rows: list) -> list:
+    """איחוד מספרי שורות לטווחים רציפים: [2, 3, 4, 7] -> [(2, 4), (7, 7)]"""
+    ranges = []
+    for row_idx in sorted(set(rows)):
+        if ranges and row_idx == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], row_idx)
+        else:
+            ranges.append((row_idx, row_idx))
+    return ranges
+
+
+def _delete_report(ranges, wanted, dry_run, matched=frozenset()) -> dict:
+    return {
+        'rows': sum(end - start + 1 for start, end in ranges),
+        'ranges': ranges,
+        'matched_ids': sorted(matched),
+        'missing_ids': sorted(wanted - set(matched)),
+        'dry_run': dry_run
+    }
 
-        # מצא שורות למחיקה (מהסוף להתחלה כדי לא לשבש אינדקסים)
-        rows_to_delete = []
-        for i, row in enumerate(all_data[1:], start=2):  # התחל מ-2 (אחרי headers)
-            if len(row) > id_col and row[id_col] in transaction_ids:
-                rows_to_delete.append(i)
 
-        # מחק מהסוף להתחלה
-        deleted_count = 0
-        for row_idx in sorted(rows_to_delete, reverse=True):
-            ws.delete_rows(row_idx)
-            deleted_count += 1
+def cloud_data_to_store(df: pd.DataFrame) -> TransactionStore:
+    """
+    בניית TransactionStore ישירות מ-DataFrame שטוח של הענן (שורה לכל פריט) - בלי לולאה על שורות
 
-        # נקה את ה-cache
-        get_worksheet.clear()
+    תאריכים ושעות מפוענחים פעם אחת לכל העמודה, וסכומי ההזמנה מחושבים ב-groupby אחד.
+    הזמנה מזוהה במפתח הקנוני (Order_ID, Z_Number, Register); הזמנות ממוינות לפי Order_ID
+    והפריטים שומרים על סדרם בגיליון.
+    """
+    if df.empty:
+        return TransactionStore.from_transactions([])
+
+    def column(col, default):
+        if col in df.columns:
+            return df[col]
+        return pd.Series(default, index=df.index)
+
+    registers = _text_column(column('Register', 'ראשית'))
+    z_numbers = _text_column(column('Z_Number', ''))
+    # שורות ישנות בלי Z - מקבלות את ה-Z של שאר שורות אותה הזמנה באותו יום, אם יש
+    blank_z = (z_numbers == '').to_numpy()
+    if blank_z.any() and not blank_z.all():
+        same_order = [registers, df['Order_ID'].astype(str), column('Date', '').astype(str)]
+        z_numbers = z_numbers.mask(blank_z, z_numbers.mask(blank_z).groupby(same_order).transform('first'))
+        z_numbers = z_numbers.fillna('')
+
+    keys = pd.DataFrame({'order_id': df['Order_ID'], 'z_number': z_numbers, 'register': registers})
+    codes = keys.groupby(['order_id', 'z_number', 'register'], sort=True, dropna=True).ngroup()
+    codes = codes.fillna(-1).to_numpy(dtype=np.int64)
+    rows = np.flatnonzero(codes >= 0)
+    rows = rows[np.argsort(codes[rows], kind='stable')]
+    tx = codes[rows]
+    df = df.iloc[rows]
+    z_numbers = z_numbers.iloc[rows]
+    registers = registers.iloc[rows]
+
+    amounts = pd.DataFrame({
+        'tx': tx,
+        'Sale_Price': _numeric_column(column('Sale_Price', 0)),
+        'Taxable_Amount': _numeric_column(column('Taxable_Amount', 0)),
+        'VAT_Amount': _numeric_column(column('VAT_Amount', 0)),
+    })
+    totals = amounts.groupby('tx', sort=True).agg(
+        total=('Sale_Price', 'sum'),
+        total_items=('Taxable_Amount', 'sum'),
+        total_vat=('VAT_Amount', 'sum'),
+    )
+
+    # שורה ראשונה של כל הזמנה - מקור הכותרת (תאריך, שעה, קופה, אמצעי תשלום)
+    first = np.flatnonzero(np.r_[True, tx[1:] != tx[:-1]])
+    timestamps = (_parse_cloud_dates(column('Date', '').iloc[first]).to_numpy()
+                  + _parse_cloud_times(column('Time', '').iloc[first]).to_numpy())
+
+    transactions = pd.DataFrame({
+        'order_id': df['Order_ID'].iloc[first].astype(str).to_numpy(dtype=object),
+        'invoice_num': column('Invoice_ID', '').iloc[first].astype(str).to_numpy(dtype=object),
+        'transaction_type': '',
+        'z_number': z_numbers.iloc[first].to_numpy(dtype=object),
+        'register': registers.iloc[first].to_numpy(dtype=object),
+        'customer_name': '',
+        'customer_code': '',
+        'total_items': totals['total_items'].to_numpy(),
+        'total_vat': totals['total_vat'].to_numpy(),
+        'total': totals['total'].to_numpy(),
+        'timestamp': timestamps,
+    })
+
+    items = pd.DataFrame({
+        'tx': tx.astype(np.int64),
+        'name': column('Item_Name', '').to_numpy(dtype=object),
+        'code': column('Item_Code', '').to_numpy(dtype=object),
+        'cashier': column('Cashier', '').to_numpy(dtype=object),
+        'quantity': _numeric_column(column('Quantity', 0)),
+        'unit_price': _numeric_column(column('Unit_Price', 0)),
+        'taxable_amount': amounts['Taxable_Amount'].to_numpy(),
+        'total_price': amounts['Sale_Price'].to_numpy(),
+        'vat_amount': amounts['VAT_Amount'].to_numpy(),
+    })
+
+    payments = pd.DataFrame({
+        'tx': np.arange(len(first), dtype=np.int64),
+        'method': column('Payment_Method', '').iloc[first].to_numpy(dtype=object),
+        'amount': totals['total'].to_numpy(),
+        'approval': None,
+        'reference': None,
+    })
+    return TransactionStore(transactions, items, payments)
+
+
+def _text_column(values: pd.Series) -> pd.Series:
+    return values.astype(object).where(values.notna(), '').astype(str).str.strip()
+
+
+def _numeric_column(values: pd.Series) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0).to_numpy(dtype='float64')
+    return _parse_amounts(values.tolist())
+
+
+def _parse_cloud_dates(values: pd.Series) -> pd.Series:
+    """תאריכים בפורמט ישראלי קודם, אחר כך ISO ו-dd-mm-yyyy; תאריך חסר הופך להיום"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        dates = values.dt.normalize()
+    else:
+        text = values.astype(object).where(values.notna(), '').astype(str)
+        dates = pd.to_datetime(text, format='%d/%m/%Y', errors='coerce')
+        for fmt in ['%Y-%m-%d', '%d-%m-%Y']:
+            dates = dates.fillna(pd.to_datetime(text, format=fmt, errors='coerce'))
+        if dates.isna().any():
+            dates = dates.fillna(pd.to_datetime(text, format='mixed', errors='coerce').dt.normalize())
+    return dates.fillna(pd.Timestamp(datetime.now().date())).astype('datetime64[ns]')
+
+
+def _parse_cloud_times(values: pd.Series) -> pd.Series:
+    """שעות HH:MM:SS או HH:MM כהיסט מתחילת היום; שעה חסרה או לא תקינה היא 00:00"""
+    text = values.astype(object).where(values.notna(), '').astype(str)
+    times = pd.to_datetime(text, format='%H:%M:%S', errors='coerce')
+    times = times.fillna(pd.to_datetime(text, format='%H:%M', errors='coerce'))
+    return (times - times.dt.normalize()).fillna(pd.Timedelta(0)).astype('timedelta64[ns]')
 
-        return deleted_count
 
-    except Exception as e:
-        st.error(f"❌ שגיאה במחיקה מהענן: {str(e)}")
-        return 0
+@st.cache_resource
+def get_health_probe(_gc, sheet_name: str = "History"):
+    """
+    HealthProbe משותף לכל ה-sessions - בדיקת קריאה של הגיליון, מתרעננת ברקע כל HEALTH_PROBE_TTL שניות.
+    ה-URL נקרא מ-secrets כאן, ב-thread של הסקריפט - הבדיקה עצמה לא ניגשת ל-st
+    """
+    spreadsheet_url = get_spreadsheet_url()
+    worksheets = {}
+    return HealthProbe(lambda: probe_sheet(_gc, spreadsheet_url, sheet_name, worksheets), ttl=HEALTH_PROBE_TTL)
 
 
-@st.cache_data(ttl=300)
-def cloud_data_to_transactions(_df: pd.DataFrame) -> list:
+def probe_sheet(gc, spreadsheet_url, sheet_name: str = "History", worksheets=None) -> dict:
     """
-    המרת DataFrame מהענן חזרה למבנה transactions
-    מותאם למבנה ה-Google Sheet
+    בדיקת קריאה זולה: התא A1 בלבד.
+
+    רצה ב-thread רקע בלי ScriptRunContext, ולכן לא קוראת ל-st ולא ל-caches של Streamlit -
+    כל כישלון מדווח רק בשדה error של התוצאה.
 
     Args:
-        _df: DataFrame מ-Google Sheets (underscore prefix for caching)
+        worksheets: מילון שבו נשמר ה-worksheet אחרי פתיחה מוצלחת, כך שבדיקה חוזרת היא בקשה אחת
 
     Returns:
-        רשימת טרנזקציות
+        מילון: can_read, can_write, latency_ms, error
     """
-    if _df.empty:
-        return []
-
-    df = _df.copy()  # Work with a copy
-
-    # קבץ לפי Order_ID
-    transactions = []
-
-    for order_id, group in df.groupby('Order_ID'):
-        first_row = group.iloc[0]
-
-        items = []
-        for _, row in group.iterrows():
-            items.append({
-                'name': row.get('Item_Name', ''),
-                'code': row.get('Item_Code', ''),
-                'quantity': float(row.get('Quantity', 0)),
-                'unit_price': float(row.get('Unit_Price', 0)),
-                'taxable_amount': float(row.get('Taxable_Amount', 0)),
-                'total_price': float(row.get('Sale_Price', 0)),
-                'vat_amount': float(row.get('VAT_Amount', 0)),
-                'cashier': row.get('Cashier', '')
-            })
+    result = {'can_read': False, 'can_write': False, 'latency_ms': None, 'error': None}
+    if not spreadsheet_url:
+        result['error'] = "spreadsheet_url לא הוגדר ב-secrets"
+        return result
 
-        # Parse date - תומך בפורמט dd/mm/yyyy
-        date_val = first_row.get('Date')
-        if isinstance(date_val, str):
-            # נסה פורמט ישראלי קודם
-            for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']:
-                try:
-                    date_val = datetime.strptime(date_val, fmt).date()
-                    break
-                except:
-                    continue
-            else:
-                try:
-                    date_val = pd.to_datetime(date_val).date()
-                except:
-                    date_val = datetime.now().date()
-        elif hasattr(date_val, 'date'):
-            date_val = date_val.date()
-
-        # Parse time
-        time_val = first_row.get('Time', '')
-        if isinstance(time_val, str) and time_val:
-            for fmt in ['%H:%M:%S', '%H:%M']:
-                try:
-                    time_val = datetime.strptime(time_val, fmt).time()
-                    break
-                except:
-                    continue
-            else:
-                time_val = datetime.strptime('00:00', '%H:%M').time()
-        elif not time_val:
-            time_val = datetime.strptime('00:00', '%H:%M').time()
-
-        transactions.append({
-            'order_id': str(order_id),
-            'invoice_num': str(first_row.get('Invoice_ID', '')),
-            'date': date_val,
-            'time': time_val,
-            'register': first_row.get('Register', 'ראשית'),
-            'items': items,
-            'payments': [{'method': first_row.get('Payment_Method', ''), 'amount': group['Sale_Price'].sum()}],
-            'total_items': group['Taxable_Amount'].sum(),
-            'total_vat': group['VAT_Amount'].sum(),
-            'total': group['Sale_Price'].sum()
-        })
-
-    return transactions
+    worksheets = {} if worksheets is None else worksheets
+    try:
+        ws = worksheets.get(sheet_name)
+        if ws is None:
+            ws = worksheets[sheet_name] = gc.open_by_url(spreadsheet_url).worksheet(sheet_name)
+        start = time.perf_counter()
+        ws.get('A1')
+        result['latency_ms'] = (time.perf_counter() - start) * 1000
+        result['can_read'] = True
+        result['can_write'] = True
+    except SheetsRateLimitError:
+        result['error'] = RATE_LIMIT_MESSAGE
+    except gspread.WorksheetNotFound:
+        result['error'] = f"הגיליון '{sheet_name}' לא נמצא"
+    except Exception as e:
+        result['error'] = str(e)
+    return result
 
 
 def check_connection_status() -> dict:
     """
     בדיקת סטטוס החיבור ל-Google Sheets
 
+    בדיקת הקריאה היא תוצאת HealthProbe האחרונה (תא אחד, מתרעננת ברקע) - לא קריאה של הגיליון.
+
     Returns:
-        מילון עם סטטוס החיבור
+        מילון עם סטטוס החיבור, זמן התגובה של הבדיקה (latency_ms), גיל הבדיקה (checked_seconds_ago)
+        והמכסה הפנויה של SheetsClient (quota_headroom)
     """
     status = {
         'connected': False,
@@ -418,7 +900,10 @@ def check_connection_status() -> dict:
         'has_url': False,
         'can_read': False,
         'can_write': False,
-        'error': None
+        'error': None,
+        'latency_ms': None,
+        'checked_seconds_ago': None,
+        'quota_headroom': None
     }
 
     # בדוק credentials
@@ -435,13 +920,10 @@ def check_connection_status() -> dict:
         status['connected'] = True
 
         # נסה לקרוא
-        try:
-            ws = get_worksheet(gc, "History")
-            if ws:
-                ws.get_all_values()
-                status['can_read'] = True
-                status['can_write'] = True
-        except Exception as e:
-            status['error'] = str(e)
+        probe = get_health_probe(gc)
+        status.update(probe.get())
+        status['checked_seconds_ago'] = probe.age
+        if hasattr(gc, 'quota_headroom'):
+            status['quota_headroom'] = gc.quota_headroom()
 
     return status
\ No newline at end of file
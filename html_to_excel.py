@@ -4,15 +4,28 @@ HTML to Excel Parser Module - מודול לעיבוד קובץ HTML של דוח
 """
 
 import re
+import os
+import codecs
 from datetime import datetime
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 import io
 
+from transaction_store import TransactionStore
 
-def parse_html_transactions(html_content):
+
+# גרסת הפורמט של פלט ה-parser - יש להעלות בכל שינוי שמשפיע על המילונים שמוחזרים
+# (משמשת כחלק מהמפתח של parse_cache)
+PARSER_VERSION = '1'
+
+
+def parse_html_transactions(html_content, engine='soup'):
     """
     Parse transaction details from HTML
     Returns list of transactions with their details
@@ -23,7 +36,17 @@ def parse_html_transactions(html_content):
     - פריטים בתוך div.table-contents
     - תשלומים בתוך div.table-tenders
     - סיכום בתוך div.table-totals
+
+    Args:
+        html_content: תוכן ה-HTML
+        engine: 'soup' - עץ BeautifulSoup מלא (ברירת מחדל)
+                'stream' - פענוח מבוסס אירועים, בלוק אחר בלוק, בלי להחזיק את כל ה-DOM בזיכרון
     """
+    if engine == 'stream':
+        return list(_iter_stream_transactions([html_content]))
+    if engine != 'soup':
+        raise ValueError(f"Unknown parser engine: {engine}")
+
     soup = BeautifulSoup(html_content, 'html.parser')
 
     transactions = []
@@ -43,6 +66,367 @@ def parse_html_transactions(html_content):
     return transactions
 
 
+# ============================================================
+# STREAMING ENGINE - פענוח בלוק אחר בלוק
+# ============================================================
+
+# תגיות ללא תגית סגירה (כמו ב-BeautifulSoup)
+_VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+])
+
+
+class _BlockNode:
+    """
+    אלמנט HTML מינימלי - מחזיק רק את תת-העץ של data-block אחד.
+    תומך בחלק של ה-API של BeautifulSoup ש-parse_single_block משתמש בו
+    (find, find_all, get_text), כך שאותו קוד משמש את שני המנועים.
+    """
+
+    __slots__ = ('name', 'classes', 'children')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.classes = ()
+        for key, value in attrs:
+            if key == 'class' and value:
+                self.classes = tuple(value.split())
+        self.children = []
+
+    def _matches(self, name, class_):
+        if self.name != name:
+            return False
+        return class_ is None or class_ in self.classes
+
+    def _iter_descendants(self):
+        stack = [iter(self.children)]
+        while stack:
+            for child in stack[-1]:
+                if isinstance(child, _BlockNode):
+                    yield child
+                    stack.append(iter(child.children))
+                    break
+            else:
+                stack.pop()
+
+    def find(self, name, class_=None, recursive=True):
+        candidates = self._iter_descendants() if recursive else (
+            c for c in self.children if isinstance(c, _BlockNode))
+        for node in candidates:
+            if node._matches(name, class_):
+                return node
+        return None
+
+    def find_all(self, name, class_=None, recursive=True):
+        candidates = self._iter_descendants() if recursive else (
+            c for c in self.children if isinstance(c, _BlockNode))
+        return [node for node in candidates if node._matches(name, class_)]
+
+    def get_text(self, strip=False):
+        parts = []
+        stack = [iter(self.children)]
+        while stack:
+            for child in stack[-1]:
+                if isinstance(child, _BlockNode):
+                    stack.append(iter(child.children))
+                    break
+                if strip:
+                    child = child.strip()
+                    if not child:
+                        continue
+                parts.append(child)
+            else:
+                stack.pop()
+        return ''.join(parts)
+
+
+class _DataBlockStreamParser(HTMLParser):
+    """
+    פענוח SAX של דוח הפעולות.
+    מחוץ ל-data-block נשמרים רק שמות התגיות הפתוחות; בתוך בלוק נבנה עץ קטן
+    שמועבר לרשימת completed_blocks ברגע שהבלוק נסגר.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._outer = []       # תגיות פתוחות מחוץ לבלוק
+        self._stack = []       # תגיות פתוחות בתוך הבלוק הנוכחי
+        self.completed_blocks = []
+
+    def handle_starttag(self, tag, attrs):
+        if not self._stack:
+            if tag == 'div' and any(k == 'class' and v and 'data-block' in v.split() for k, v in attrs):
+                self._stack.append(_BlockNode(tag, attrs))
+            elif tag not in _VOID_TAGS:
+                self._outer.append(tag)
+            return
+
+        node = _BlockNode(tag, attrs)
+        self._stack[-1].children.append(node)
+        if tag not in _VOID_TAGS:
+            self._stack.append(node)
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS:
+            return
+
+        if not self._stack:
+            _pop_to_tag(self._outer, tag)
+            return
+
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth].name == tag:
+                if depth == 0:
+                    self._close_block()
+                else:
+                    del self._stack[depth:]
+                return
+
+        # תגית סגירה של אלמנט שמחוץ לבלוק - סוגרת גם את הבלוק
+        if tag in self._outer:
+            self._close_block()
+            _pop_to_tag(self._outer, tag)
+
+    def handle_data(self, data):
+        if not self._stack:
+            return
+        children = self._stack[-1].children
+        if children and isinstance(children[-1], str):
+            children[-1] += data
+        else:
+            children.append(data)
+
+    def _close_block(self):
+        self.completed_blocks.append(self._stack[0])
+        self._stack = []
+
+    def drain(self):
+        """החזרת הבלוקים שנסגרו מאז הקריאה הקודמת"""
+        blocks = self.completed_blocks
+        self.completed_blocks = []
+        return blocks
+
+
+def _pop_to_tag(stack, tag):
+    for depth in range(len(stack) - 1, -1, -1):
+        if stack[depth] == tag:
+            del stack[depth:]
+            return
+
+
+# גודל קריאה בפענוח הדרגתי של קבצים
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def iter_html_transactions(source, encoding='utf-8', chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Generator - מחזיר טרנזקציות אחת-אחת מתוך דוח HTML בלי לטעון את כל הקובץ לזיכרון
+
+    Args:
+        source: נתיב לקובץ, bytes, או אובייקט קובץ בינארי (למשל קובץ שהועלה ב-Streamlit)
+        encoding: קידוד הקובץ
+        chunk_size: גודל כל קריאה בבתים
+
+    Yields:
+        מילון טרנזקציה - זהה לפלט של parse_single_block
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from _iter_stream_transactions(_iter_decoded_chunks(f, encoding, chunk_size))
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield from _iter_stream_transactions(_iter_decoded_chunks(io.BytesIO(source), encoding, chunk_size))
+    elif hasattr(source, 'read'):
+        yield from _iter_stream_transactions(_iter_decoded_chunks(source, encoding, chunk_size))
+    else:
+        raise TypeError(f"Unsupported source type: {type(source).__name__}")
+
+
+def _iter_decoded_chunks(f, encoding, chunk_size):
+    """קריאה ופענוח הדרגתי - תו רב-בתי שנחתך בין שתי קריאות נשמר לקריאה הבאה"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        raw = f.read(chunk_size)
+        if not raw:
+            break
+        text = decoder.decode(raw)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def _iter_stream_transactions(chunks, errors=None):
+    """
+    מריץ את מנוע ה-stream על רצף של מחרוזות HTML ומחזיר טרנזקציות
+    ברגע שכל data-block נסגר
+
+    Args:
+        chunks: רצף מחרוזות HTML
+        errors: רשימה אופציונלית לאיסוף שגיאות בלוקים (במקום הדפסה)
+    """
+    parser = _DataBlockStreamParser()
+
+    def parse_blocks(blocks):
+        for block in blocks:
+            try:
+                transaction = parse_single_block(block)
+                if transaction:
+                    yield transaction
+            except Exception as e:
+                if errors is None:
+                    print(f"Error parsing block: {e}")
+                else:
+                    errors.append(f"Error parsing block: {e}")
+                continue
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parse_blocks(parser.drain())
+
+    parser.close()
+    yield from parse_blocks(parser.drain())
+
+
+# ============================================================
+# PARALLEL INGESTION - פענוח מקבילי של כמה קבצים
+# ============================================================
+
+# קובץ גדול מזה מפוצל לחלקים לפי גבולות data-block
+PARALLEL_CHUNK_BYTES = 4 * 1024 * 1024
+
+_DATA_BLOCK_START = re.compile(rb'<div class="data-block"')
+
+
+def parse_many(files, workers=None, chunk_bytes=PARALLEL_CHUNK_BYTES, cache=None):
+    """
+    פענוח מקבילי של כמה דוחות HTML באמצעות ProcessPoolExecutor
+
+    כל קובץ נשלח לתהליך נפרד; קובץ גדול מ-chunk_bytes מפוצל לחלקים
+    שכל אחד מהם מכיל data-blocks שלמים. התוצאות מאוחדות לפי סדר הקבצים
+    וסדר הבלוקים בתוכם, ללא תלות בסדר סיום התהליכים.
+
+    Args:
+        files: רשימת נתיבים, bytes או אובייקטי קובץ (למשל קבצים שהועלו ב-Streamlit)
+        workers: מספר תהליכים (ברירת מחדל: מספר הליבות). 1 = פענוח בתהליך הנוכחי
+        chunk_bytes: גודל חלק מקסימלי לפיצול קובץ בודד
+        cache: אובייקט עם get(raw)/put(raw, transactions) (למשל parse_cache.ParseCache).
+               קובץ שנמצא ב-cache לא מפוענח; קובץ שפוענח בלי שגיאות נשמר בו
+
+    Returns:
+        (transactions, errors) - רשימת טרנזקציות ורשימת (שם קובץ, הודעת שגיאה)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    names = []
+    tasks = []
+    results = {}
+    uncached = {}
+
+    for file_idx, source in enumerate(files):
+        names.append(_source_name(source, file_idx))
+        try:
+            raw = _read_source_bytes(source)
+        except Exception as e:
+            results[(file_idx, 0)] = (None, [str(e)])
+            continue
+        if cache is not None:
+            cached = cache.get(raw)
+            if cached is not None:
+                results[(file_idx, 0)] = (cached, [])
+                continue
+            uncached[file_idx] = raw
+        for part_idx, part in enumerate(_split_data_blocks(raw, chunk_bytes)):
+            tasks.append((file_idx, part_idx, part))
+
+    if workers <= 1 or len(tasks) <= 1:
+        for file_idx, part_idx, part in tasks:
+            results[(file_idx, part_idx)] = _run_parse_part(part)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            futures = {
+                (file_idx, part_idx): executor.submit(_run_parse_part, part)
+                for file_idx, part_idx, part in tasks
+            }
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    results[key] = (None, [str(e)])
+
+    # איחוד בסדר דטרמיניסטי - קובץ ואז חלק
+    transactions = []
+    errors = []
+    file_parts = {}
+    for file_idx, part_idx in sorted(results):
+        file_parts.setdefault(file_idx, []).append(results[(file_idx, part_idx)])
+
+    for file_idx in sorted(file_parts):
+        file_transactions = []
+        file_errors = []
+        failed = False
+        for part_transactions, part_errors in file_parts[file_idx]:
+            file_errors.extend(part_errors)
+            if part_transactions is None:
+                failed = True
+            else:
+                file_transactions.extend(part_transactions)
+        errors.extend((names[file_idx], message) for message in file_errors)
+        # קובץ שאחד מחלקיו נכשל לא נכלל בכלל - כמו בפענוח רגיל שנכשל
+        if not failed:
+            transactions.extend(file_transactions)
+            if file_idx in uncached and not file_errors:
+                cache.put(uncached[file_idx], file_transactions)
+
+    return transactions, errors
+
+
+def _source_name(source, index):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    return getattr(source, 'name', None) or f"file {index + 1}"
+
+
+def _read_source_bytes(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        return source.read()
+    raise TypeError(f"Unsupported source type: {type(source).__name__}")
+
+
+def _split_data_blocks(raw, chunk_bytes):
+    """פיצול תוכן הקובץ לחלקים שמתחילים בתחילת data-block"""
+    if len(raw) <= chunk_bytes:
+        return [raw]
+
+    parts = []
+    start = 0
+    for match in _DATA_BLOCK_START.finditer(raw):
+        if match.start() - start >= chunk_bytes:
+            parts.append(raw[start:match.start()])
+            start = match.start()
+    parts.append(raw[start:])
+    return parts
+
+
+def _run_parse_part(raw):
+    """נקודת הכניסה של תהליך העבודה - מחזיר (טרנזקציות, שגיאות)"""
+    errors = []
+    try:
+        transactions = list(_iter_stream_transactions([raw.decode('utf-8')], errors))
+    except Exception as e:
+        return None, errors + [str(e)]
+    return transactions, errors
+
+
 def parse_single_block(block):
     """
     Parse a single transaction block
@@ -241,44 +625,21 @@ def create_daily_summary(transactions):
     """
     Summarize transactions by date
     Returns dataframe with daily sales summary
-    """
-    if not transactions:
-        return pd.DataFrame(columns=['date', 'total_sales', 'transaction_count', 'items_count'])
 
-    daily_data = {}
-
-    for trans in transactions:
-        trans_date = trans['date']
-        total = trans['total']
-
-        if trans_date not in daily_data:
-            daily_data[trans_date] = {
-                'date': trans_date,
-                'total_sales': 0,
-                'transaction_count': 0,
-                'items_count': 0,
-                'total_vat': 0
-            }
-
-        daily_data[trans_date]['total_sales'] += total
-        daily_data[trans_date]['transaction_count'] += 1
-        daily_data[trans_date]['items_count'] += len(trans['items'])
-        daily_data[trans_date]['total_vat'] += trans.get('total_vat', 0)
-
-    # Convert to dataframe
-    daily_df = pd.DataFrame(list(daily_data.values()))
-    if not daily_df.empty:
-        daily_df = daily_df.sort_values('date')
-
-    return daily_df
+    transactions יכול להיות רשימה, כל iterable (למשל iter_html_transactions) או TransactionStore.
+    החישוב עצמו וקטורי - ראה TransactionStore.daily_summary
+    """
+    if not isinstance(transactions, TransactionStore):
+        transactions = TransactionStore.from_transactions(transactions)
+    return transactions.daily_summary()
 
 
 def create_detailed_transactions_df(transactions):
     """
     Create detailed transactions dataframe (one row per transaction)
     """
-    if not transactions:
-        return pd.DataFrame(columns=['Order ID', 'Invoice', 'Date', 'Time', 'Item Count', 'Total Amount'])
+    if isinstance(transactions, TransactionStore):
+        return transactions.detailed_transactions_df()
 
     records = []
 
@@ -304,58 +665,30 @@ def create_detailed_transactions_df(transactions):
             'Total Amount': trans['total']
         })
 
+    if not records:
+        return pd.DataFrame(columns=['Order ID', 'Invoice', 'Date', 'Time', 'Item Count', 'Total Amount'])
+
     return pd.DataFrame(records)
 
 
 def create_items_summary_df(transactions):
     """
     Create item-level summary (aggregated by item name)
-    """
-    if not transactions:
-        return pd.DataFrame(columns=['item_name', 'quantity', 'total_amount', 'transaction_count'])
-
-    items_data = {}
 
-    for trans in transactions:
-        for item in trans['items']:
-            item_name = item['name']
-
-            if item_name not in items_data:
-                items_data[item_name] = {
-                    'item_name': item_name,
-                    'item_code': item.get('code', ''),
-                    'quantity': 0,
-                    'total_amount': 0,
-                    'total_vat': 0,
-                    'transaction_count': 0,
-                    'avg_unit_price': 0
-                }
-
-            items_data[item_name]['quantity'] += item['quantity']
-            items_data[item_name]['total_amount'] += item['total_price']
-            items_data[item_name]['total_vat'] += item.get('vat_amount', 0)
-            items_data[item_name]['transaction_count'] += 1
-
-    # Calculate average unit price
-    for item_name in items_data:
-        if items_data[item_name]['quantity'] > 0:
-            items_data[item_name]['avg_unit_price'] = (
-                    items_data[item_name]['total_amount'] / items_data[item_name]['quantity']
-            )
-
-    items_df = pd.DataFrame(list(items_data.values()))
-    if not items_df.empty:
-        items_df = items_df.sort_values('total_amount', ascending=False)
-
-    return items_df
+    transactions יכול להיות רשימה, כל iterable (למשל iter_html_transactions) או TransactionStore.
+    transaction_count סופר עסקאות שונות שבהן הפריט הופיע (ולא שורות פריט)
+    """
+    if not isinstance(transactions, TransactionStore):
+        transactions = TransactionStore.from_transactions(transactions)
+    return transactions.items_summary_df()
 
 
 def create_items_detail_df(transactions):
     """
     Create item-level detail (one row per item sold)
     """
-    if not transactions:
-        return pd.DataFrame()
+    if isinstance(transactions, TransactionStore):
+        return transactions.items_detail_df()
 
     records = []
 
@@ -377,73 +710,73 @@ def create_items_detail_df(transactions):
     return pd.DataFrame(records)
 
 
-def export_to_excel(transactions, filepath):
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+
+
+def write_excel_sheets(target, sheets):
     """
-    Export all data to Excel file with multiple sheets
+    כתיבת קובץ Excel בזרימה - workbook במצב write-only, שורות שלמות נוספות ברצף ונכתבות ישר לדיסק.
+    העיצוב (כותרת ורוחב עמודות) מוגדר פעם אחת לכל עמודה, לא לכל תא, כך שהזיכרון לא גדל עם מספר השורות.
+
+    Args:
+        target: נתיב או אובייקט קובץ (למשל BytesIO)
+        sheets: רשימת (שם גיליון, נתונים, רוחב עמודות). נתונים הם DataFrame או iterable של
+            DataFrames (חלקים עם אותן עמודות); רוחב - מספר לכל העמודות, רשימה לפי עמודה או None
     """
-    wb = Workbook()
+    wb = Workbook(write_only=True)
+
+    for title, data, widths in sheets:
+        ws = wb.create_sheet(title)
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        columns = None
+
+        for chunk in chunks:
+            if columns is None:
+                columns = list(chunk.columns)
+                _write_header(ws, columns, widths)
+            # NaN/NA לא נתמכים ב-Excel - תא ריק
+            values = chunk[columns].astype(object)
+            values = values.where(values.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                ws.append(row)
+
+    wb.save(target)
+
+
+def _write_header(ws, columns, widths):
+    """שורת כותרת מעוצבת ורוחב עמודות - פעם אחת לכל עמודה"""
+    if widths is not None:
+        if not isinstance(widths, (list, tuple)):
+            widths = [widths] * len(columns)
+        for col_idx, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    header = []
+    for name in columns:
+        cell = WriteOnlyCell(ws, value=str(name))
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        header.append(cell)
+    ws.append(header)
 
-    # Style definitions
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
 
-    # Daily Summary Sheet
+def export_to_excel(transactions, filepath):
+    """
+    Export all data to Excel file with multiple sheets
+    """
     daily_df = create_daily_summary(transactions)
-    ws_daily = wb.active
-    ws_daily.title = "Daily Summary"
-
-    # Add headers
-    headers = ['Date', 'Total Sales', 'Transaction Count', 'Items Count', 'Total VAT']
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws_daily.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-
-    # Add data
-    for row_idx, row in enumerate(daily_df.values, 2):
-        for col_idx, value in enumerate(row, 1):
-            ws_daily.cell(row=row_idx, column=col_idx, value=value)
-
-    # Adjust column widths
-    for col in ['A', 'B', 'C', 'D', 'E']:
-        ws_daily.column_dimensions[col].width = 15
-
-    # Detailed Transactions Sheet
     trans_df = create_detailed_transactions_df(transactions)
-    ws_trans = wb.create_sheet("Transactions")
-
-    headers = list(trans_df.columns)
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws_trans.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-
-    for row_idx, row in enumerate(trans_df.values, 2):
-        for col_idx, value in enumerate(row, 1):
-            ws_trans.cell(row=row_idx, column=col_idx, value=value)
-
-    for i, col in enumerate(['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J']):
-        ws_trans.column_dimensions[col].width = 12
-
-    # Items Summary Sheet
     items_df = create_items_summary_df(transactions)
-    ws_items = wb.create_sheet("Items Summary")
-
-    headers = list(items_df.columns)
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws_items.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-
-    for row_idx, row in enumerate(items_df.values, 2):
-        for col_idx, value in enumerate(row, 1):
-            ws_items.cell(row=row_idx, column=col_idx, value=value)
 
-    ws_items.column_dimensions['A'].width = 30
-    for col in ['B', 'C', 'D', 'E', 'F', 'G']:
-        ws_items.column_dimensions[col].width = 15
+    # סיכום יומי ריק חוזר בלי total_vat - שורת הכותרות הקבועה נכתבת בכל מקרה
+    daily_sheet = daily_df.reindex(columns=['date', 'total_sales', 'transaction_count', 'items_count', 'total_vat'])
 
-    # Save
-    wb.save(filepath)
+    write_excel_sheets(filepath, [
+        ("Daily Summary", daily_sheet.set_axis(
+            ['Date', 'Total Sales', 'Transaction Count', 'Items Count', 'Total VAT'], axis=1), 15),
+        ("Transactions", trans_df, [12] * min(len(trans_df.columns), 10)),
+        ("Items Summary", items_df, [30] + [15] * 6),
+    ])
 
     return daily_df, trans_df, items_df
\ No newline at end of file
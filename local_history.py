@@ -0,0 +1,497 @@
+"""
+Local History Module - היסטוריה מקומית (SQLite) כמקור הנתונים הראשי
+
+ההיסטוריה נשמרת בקובץ SQLite מקומי בשלוש טבלאות במבנה של TransactionStore, עם מפתח העסקה הקנוני
+(z_number|register|order_id) ואינדקסים על יום, מספר הזמנה ושם פריט:
+- קריאה לדשבורד היא שאילתת טווח על אינדקס היום - מילישניות, בלי קריאה ל-Google Sheets
+- טרנזקציות מפוענחות נקלטות ישירות (ingest); עסקה שהתוכן שלה לא השתנה (לפי hash) לא נכתבת שוב
+- כל עסקה מסומנת במקור שלה (html / cloud) ובדגל synced - מה עוד לא הועלה לגיליון
+
+SheetReplicator מעלה לגיליון את העסקאות שלא סונכרנו ומושך ממנו שורות חדשות ועריכות,
+ו-ReplicationWorker מריץ אותו ב-thread ברקע כל כמה דקות. עסקה שמקורה ב-HTML מקומי גוברת על
+הגרסה שבגיליון; עסקאות שמקורן בגיליון מתעדכנות לפי העריכות בו.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from google_sheets_connector import (
+    TRANSACTION_MODEL_COLUMNS, append_new_rows, cloud_data_to_store, delete_orders_by_key,
+    invalidate_sync_manifest, read_history, transactions_to_flat_df
+)
+from transaction_store import (
+    TransactionStore, combine_fingerprints,
+    TRANSACTION_COLUMNS, TRANSACTION_NUMERIC_COLUMNS,
+    ITEM_COLUMNS, ITEM_NUMERIC_COLUMNS, PAYMENT_COLUMNS
+)
+
+
+DEFAULT_HISTORY_PATH = os.environ.get(
+    'CAFE_DASHBOARD_HISTORY_DB',
+    os.path.join(os.path.expanduser('~'), '.cache', 'cafe-dashboard', 'history.sqlite3')
+)
+
+SOURCE_HTML = 'html'
+SOURCE_CLOUD = 'cloud'
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS transactions (
+    key TEXT PRIMARY KEY,
+    {', '.join(f'{col} TEXT' for col in TRANSACTION_COLUMNS)},
+    {', '.join(f'{col} REAL' for col in TRANSACTION_NUMERIC_COLUMNS)},
+    ts INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    content_hash INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS transactions_day ON transactions (day, ts);
+CREATE INDEX IF NOT EXISTS transactions_order ON transactions (order_id);
+CREATE INDEX IF NOT EXISTS transactions_pending ON transactions (synced) WHERE synced = 0;
+
+CREATE TABLE IF NOT EXISTS items (
+    key TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    {', '.join(f'{col} TEXT' for col in ITEM_COLUMNS)},
+    {', '.join(f'{col} REAL' for col in ITEM_NUMERIC_COLUMNS)},
+    PRIMARY KEY (key, line)
+);
+CREATE INDEX IF NOT EXISTS items_name ON items (name);
+
+CREATE TABLE IF NOT EXISTS payments (
+    key TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    method TEXT, amount REAL, approval TEXT, reference TEXT,
+    PRIMARY KEY (key, line)
+);
+
+-- עסקאות שגרסה שלהן כבר נמצאת בגיליון - גרסה חדשה שלהן מחליפה את השורות הקיימות בהעלאה
+CREATE TABLE IF NOT EXISTS replicated (
+    key TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_TX_SELECT = ', '.join(TRANSACTION_COLUMNS + TRANSACTION_NUMERIC_COLUMNS)
+
+
+class LocalHistory:
+    """
+    היסטוריית עסקאות מקומית ב-SQLite
+
+    Args:
+        path: נתיב קובץ מסד הנתונים (נוצר אם לא קיים)
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # כתיבות מה-thread של הסנכרון ומהאפליקציה - אחת בכל פעם
+        self._write_lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            # מסדי נתונים מלפני טבלת replicated - כל מה שסונכרן כבר נמצא בגיליון
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO replicated SELECT key FROM transactions WHERE synced = 1')
+
+    def _connect(self):
+        # חיבור לכל פעולה - sqlite3 לא משתף חיבור בין threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+
+    @property
+    def revision(self) -> int:
+        """מונה שעולה בכל כתיבה שמשנה נתונים - מפתח זול ל-caches של הקריאה"""
+        return int(self.get_meta('revision', 0))
+
+    def get_meta(self, name, default=None):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, name, value):
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, str(value)))
+
+    # ------------------------------------------------------------
+    # כתיבה
+    # ------------------------------------------------------------
+
+    def ingest(self, transactions, source=SOURCE_HTML):
+        """קליטת רשימת טרנזקציות מה-parser - ראה ingest_store"""
+        return self.ingest_store(TransactionStore.from_transactions(list(transactions)), source)
+
+    def ingest_store(self, store, source=SOURCE_HTML):
+        """
+        קליטת עסקאות: עסקה חדשה נוספת, עסקה קיימת שהתוכן שלה השתנה מוחלפת.
+        מ-HTML: העסקאות מסומנות כממתינות להעלאה. מהגיליון (source=cloud): מסומנות כמסונכרנות,
+        ועסקה קיימת מתעדכנת רק אם גם היא הגיעה מהגיליון - HTML מקומי גובר.
+        הזמנה שמופיעה כמה פעמים באותה קליטה - המופע האחרון קובע (כמו ב-Dataset.merge: קובץ מאוחר
+        מחליף קובץ קודם, וזה מה שהדשבורד מציג).
+
+        Returns:
+            (added, updated) - רשימות מפתחות העסקאות שנוספו ושעודכנו
+        """
+        if len(store) == 0:
+            return [], []
+
+        keys = store.transaction_keys().astype(str)
+        # המופע האחרון של כל מפתח: np.unique מחזיר מופע ראשון, ולכן על המערך ההפוך
+        _, last_reversed = np.unique(keys[::-1], return_index=True)
+        latest = np.sort(len(keys) - 1 - last_reversed)
+        keys = keys[latest]
+        hashes = store.transaction_hashes()[latest].view(np.int64)
+
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            if source == SOURCE_CLOUD:
+                conn.executemany('INSERT OR IGNORE INTO replicated (key) VALUES (?)', [(k,) for k in keys])
+            existing = _existing_rows(conn, keys)
+            current = existing.reindex(keys)
+            is_new = current['content_hash'].isna().to_numpy()
+            changed = ~is_new & (current['content_hash'].to_numpy() != hashes)
+            if source == SOURCE_CLOUD:
+                changed &= (current['source'] == SOURCE_CLOUD).to_numpy()
+
+            write = np.flatnonzero(is_new | changed)
+            if len(write) == 0:
+                return [], []
+
+            part = store.take(latest[write])
+            write_keys = keys[write].tolist()
+            conn.executemany('DELETE FROM transactions WHERE key = ?', [(k,) for k in write_keys])
+            conn.executemany('DELETE FROM items WHERE key = ?', [(k,) for k in write_keys])
+            conn.executemany('DELETE FROM payments WHERE key = ?', [(k,) for k in write_keys])
+            _insert_store(conn, part, write_keys, hashes[write], source, synced=source == SOURCE_CLOUD)
+            _bump_revision(conn)
+
+        return keys[is_new].tolist(), keys[changed].tolist()
+
+    def mark_synced(self, keys, hashes):
+        """
+        סימון עסקאות כמסונכרנות לגיליון - רק אם התוכן עדיין זהה למה שהועלה
+        (עסקה שנקלטה מחדש בינתיים נשארת ממתינה)
+        """
+        rows = [(k, int(h)) for k, h in zip(keys, np.asarray(hashes).view(np.int64))]
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany('UPDATE transactions SET synced = 1 WHERE key = ? AND content_hash = ?', rows)
+            conn.executemany('INSERT OR IGNORE INTO replicated (key) VALUES (?)', [(k,) for k, _ in rows])
+
+    def replicated_keys(self, keys) -> list:
+        """מבין keys - העסקאות שגרסה כלשהי שלהן כבר נמצאת בגיליון"""
+        keys = list(keys)
+        found = []
+        with closing(self._connect()) as conn:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                found.extend(row[0] for row in conn.execute(
+                    f"SELECT key FROM replicated WHERE key IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    # ------------------------------------------------------------
+    # קריאה
+    # ------------------------------------------------------------
+
+    def load_store(self, start_date=None, end_date=None, where='', params=()):
+        """
+        TransactionStore של הטווח (כולל), ממוין לפי זמן ומספר הזמנה - שאילתת טווח על אינדקס היום.
+        ה-fingerprint נגזר מה-revision ומהטווח, בלי hash של התוכן
+        """
+        conditions, args = [], []
+        if start_date is not None:
+            conditions.append('day >= ?')
+            args.append(_day_number(start_date))
+        if end_date is not None:
+            conditions.append('day <= ?')
+            args.append(_day_number(end_date))
+        if where:
+            conditions.append(where)
+            args.extend(params)
+        clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with closing(self._connect()) as conn:
+            # snapshot אחד לכל השאילתות - כתיבה מה-thread של הסנכרון לא נראית באמצע
+            conn.execute('BEGIN')
+            revision = int((conn.execute("SELECT value FROM meta WHERE name = 'revision'").fetchone() or [0])[0])
+            tx = pd.read_sql_query(
+                f'SELECT key, {_TX_SELECT}, ts FROM transactions {clause} ORDER BY ts, order_id', conn, params=args)
+            selected = f'SELECT key FROM transactions {clause}'
+            items = pd.read_sql_query(
+                f"SELECT key, line, {', '.join(ITEM_COLUMNS + ITEM_NUMERIC_COLUMNS)} FROM items "
+                f'WHERE key IN ({selected})', conn, params=args)
+            payments = pd.read_sql_query(
+                f"SELECT key, line, {', '.join(PAYMENT_COLUMNS)} FROM payments "
+                f'WHERE key IN ({selected})', conn, params=args)
+
+        return _to_store(tx, items, payments,
+                         fingerprint=combine_fingerprints('local-history', revision, start_date, end_date, where, *params))
+
+    def pending_store(self):
+        """העסקאות שעוד לא הועלו לגיליון"""
+        return self.load_store(where='synced = 0')
+
+    def pending_count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM transactions WHERE synced = 0').fetchone()[0]
+
+
+class SheetReplicator:
+    """
+    סנכרון דו-כיווני בין LocalHistory לגיליון History
+
+    Args:
+        history: LocalHistory
+        worksheet_factory: פונקציה שמחזירה את ה-worksheet (או None אם אין חיבור)
+        manifest_key: מפתח הגיליון ב-manifest של append_new_rows (None - קריאה מלאה של עמודת ה-ID)
+        mirror: SheetMirror למשיכה הדרגתית (None - קריאת הגיליון כולו בכל מחזור)
+    """
+
+    def __init__(self, history, worksheet_factory, manifest_key=None, mirror=None):
+        self.history = history
+        self.worksheet_factory = worksheet_factory
+        self.manifest_key = manifest_key
+        self.mirror = mirror
+
+    def push(self, ws) -> int:
+        """
+        העלאת העסקאות שלא סונכרנו - שורות שכבר בגיליון מסוננות לפי Transaction_ID.
+        עסקה שגרסה קודמת שלה כבר בגיליון (למשל HTML שהועלה מחדש עם שינוי) - השורות הישנות שלה
+        נמחקות קודם, והגרסה החדשה נוספת במקומן
+        """
+        pending = self.history.pending_store()
+        if len(pending) == 0:
+            return 0
+        keys = pending.transaction_keys().astype(str).tolist()
+
+        stale = self.history.replicated_keys(keys)
+        if stale:
+            report = delete_orders_by_key(ws, stale)
+            if report['rows']:
+                # מיקומי השורות השתנו - ה-watermark של הסנכרון ההדרגתי וה-last_row של העותק כבר לא תקפים
+                if self.manifest_key:
+                    invalidate_sync_manifest(self.manifest_key)
+                if self.mirror is not None:
+                    self.mirror.invalidate(self.manifest_key or ws.title)
+
+        added = append_new_rows(ws, transactions_to_flat_df(pending.to_transactions()), self.manifest_key)
+        self.history.mark_synced(keys, pending.transaction_hashes())
+        return added
+
+    def pull(self, ws):
+        """
+        קליטת שורות חדשות ועריכות מהגיליון - (added, updated)
+
+        עם mirror נקראות רק השורות שנוספו לגיליון מאז הרענון הקודם; כל הזמנה שמופיעה בהן
+        נבנית מחדש מכל שורותיה בעותק (append_new_rows עשוי לפצל הזמנה בין כמה קריאות append).
+        עריכה של שורות ישנות מגיעה רק בקריאה המלאה התקופתית של ה-mirror (full_resync_interval),
+        שמחזירה את כל השורות - ingest_store מעדכן מהן רק הזמנות שהתוכן שלהן השתנה
+        """
+        if self.mirror is None:
+            cloud_df = read_history(ws, TRANSACTION_MODEL_COLUMNS)
+        else:
+            sheet_key = self.manifest_key or ws.title
+            delta = self.mirror.refresh(ws, sheet_key)
+            if delta.empty or 'Order_ID' not in delta.columns:
+                return [], []
+            cloud_df = self.mirror.read(sheet_key, TRANSACTION_MODEL_COLUMNS)
+            cloud_df = cloud_df[cloud_df['Order_ID'].isin(delta['Order_ID'])].reset_index(drop=True)
+        if cloud_df.empty:
+            return [], []
+        return self.history.ingest_store(cloud_data_to_store(cloud_df), source=SOURCE_CLOUD)
+
+    def run_once(self) -> dict:
+        """מחזור סנכרון אחד: העלאה ואז משיכה"""
+        ws = self.worksheet_factory()
+        if ws is None:
+            raise ConnectionError("אין חיבור לגיליון")
+        pushed = self.push(ws)
+        added, updated = self.pull(ws)
+        self.history.set_meta('last_sync', time.time())
+        return {'pushed': pushed, 'pulled': len(added), 'updated': len(updated)}
+
+
+class ReplicationWorker:
+    """
+    thread רקע שמריץ SheetReplicator.run_once כל interval שניות, או מיד אחרי trigger()
+
+    stale-while-revalidate: בזמן מחזור הממשק ממשיך להציג את הגרסה הקודמת. בסוף מחזור
+    שבו ההיסטוריה השתנתה, ה-worker טוען את הגרסה החדשה (snapshot) ומחליף אותה בהשמה אחת,
+    כך שהממשק רק מחליף גרסה ולא ממתין לשאילתה.
+
+    Args:
+        replicator: SheetReplicator
+        interval: שניות בין מחזורים
+        preload: טעינת snapshot של ההיסטוריה כולה בסוף כל מחזור
+    """
+
+    def __init__(self, replicator, interval=300, preload=True):
+        self.replicator = replicator
+        self.interval = interval
+        self.preload = preload
+        self.last_result = None
+        self.last_error = None
+        self.last_run = None
+        self.last_success = None
+        self.refreshing = False
+        # (revision, store) - הגרסה האחרונה שנטענה מההיסטוריה
+        self.snapshot = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='sheets-replication', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def trigger(self):
+        """הרצת מחזור בהקדם (למשל אחרי קליטת קבצים חדשים)"""
+        self._wake.set()
+
+    def run_once(self) -> dict:
+        """מחזור סנכרון אחד בתוך ה-thread הקורא; שגיאה נשמרת ב-last_error ונזרקת הלאה"""
+        with self._lock:
+            self.refreshing = True
+            try:
+                self.last_result = self.replicator.run_once()
+                self.last_error = None
+                if self.preload:
+                    self._load_snapshot()
+                self.last_success = time.time()
+                return self.last_result
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            finally:
+                self.last_run = time.time()
+                self.refreshing = False
+
+    def _load_snapshot(self):
+        history = self.replicator.history
+        revision = history.revision
+        if self.snapshot is None or self.snapshot[0] != revision:
+            self.snapshot = (revision, history.load_store())
+
+    def _loop(self):
+        while True:
+            # מחזור ראשון מיד (אלא אם כבר רץ אחד), ואחר כך כל interval או אחרי trigger
+            if self.last_run is not None:
+                self._wake.wait(max(0.0, self.last_run + self.interval - time.time()))
+                self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.run_once()
+            except Exception:
+                pass  # נשמר ב-last_error; ננסה שוב במחזור הבא
+
+
+def _day_number(value) -> int:
+    return int(pd.Timestamp(value).to_datetime64().astype('datetime64[D]').astype(np.int64))
+
+
+def _bump_revision(conn):
+    conn.execute("INSERT INTO meta (name, value) VALUES ('revision', '1') "
+                 "ON CONFLICT(name) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+
+def _existing_rows(conn, keys):
+    """content_hash ו-source של העסקאות הקיימות מבין keys, באינדקס לפי מפתח"""
+    rows = []
+    keys = list(keys)
+    # מגבלת משתנים של SQLite
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        rows.extend(conn.execute(
+            f"SELECT key, content_hash, source FROM transactions WHERE key IN ({', '.join('?' * len(chunk))})",
+            chunk).fetchall())
+    return pd.DataFrame(rows, columns=['key', 'content_hash', 'source']).set_index('key')
+
+
+def _insert_store(conn, store, keys, hashes, source, synced):
+    keys = np.asarray(keys, dtype=object)
+    tx = store.transactions
+    timestamps = tx['timestamp'].to_numpy().astype('datetime64[s]')
+
+    tx_rows = pd.DataFrame({'key': keys})
+    for col in TRANSACTION_COLUMNS:
+        tx_rows[col] = tx[col].astype(object).where(tx[col].notna(), None).to_numpy()
+    for col in TRANSACTION_NUMERIC_COLUMNS:
+        tx_rows[col] = tx[col].to_numpy(dtype=float)
+    tx_rows['ts'] = timestamps.astype(np.int64)
+    tx_rows['day'] = timestamps.astype('datetime64[D]').astype(np.int64)
+    tx_rows['content_hash'] = np.asarray(hashes, dtype=np.int64)
+    tx_rows['source'] = source
+    tx_rows['synced'] = int(synced)
+    _insert_rows(conn, 'transactions', tx_rows)
+
+    for table, name in ((store.items, 'items'), (store.payments, 'payments')):
+        if table.empty:
+            continue
+        tx_positions = table['tx'].to_numpy()
+        rows = pd.DataFrame({
+            'key': keys[tx_positions],
+            # מיקום השורה בתוך העסקה
+            'line': pd.Series(tx_positions).groupby(tx_positions).cumcount().to_numpy()
+        })
+        for col in table.columns.drop('tx'):
+            values = table[col]
+            rows[col] = values.astype(object).where(values.notna(), None).to_numpy() \
+                if values.dtype.kind not in 'fi' else values.to_numpy(dtype=float)
+        _insert_rows(conn, name, rows)
+
+
+def _insert_rows(conn, table, rows):
+    columns = list(rows.columns)
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        rows.itertuples(index=False, name=None))
+
+
+def _to_store(tx, items, payments, fingerprint=None):
+    """טבלאות ה-SQL -> TransactionStore עם אותם סוגי עמודות כמו TransactionStore.from_transactions"""
+    positions = pd.Index(tx['key']).get_indexer(items['key'])
+    items = items.assign(tx=positions).sort_values(['tx', 'line'], kind='stable')
+    payment_positions = pd.Index(tx['key']).get_indexer(payments['key'])
+    payments = payments.assign(tx=payment_positions).sort_values(['tx', 'line'], kind='stable')
+
+    tx_df = pd.DataFrame({col: tx[col].fillna('').tolist() for col in TRANSACTION_COLUMNS})
+    for col in TRANSACTION_NUMERIC_COLUMNS:
+        tx_df[col] = tx[col].astype('float64').to_numpy()
+    tx_df['timestamp'] = pd.to_datetime(tx['ts'].to_numpy(dtype=np.int64), unit='s').astype('datetime64[us]')
+
+    items_df = pd.DataFrame({'tx': items['tx'].to_numpy(dtype=np.int64)})
+    for col in ITEM_COLUMNS:
+        items_df[col] = items[col].fillna('').tolist()
+    for col in ITEM_NUMERIC_COLUMNS:
+        items_df[col] = items[col].astype('float64').to_numpy()
+
+    payments_df = pd.DataFrame({'tx': payments['tx'].to_numpy(dtype=np.int64)})
+    for col in PAYMENT_COLUMNS:
+        values = payments[col]
+        payments_df[col] = values.astype('float64').to_numpy() if col == 'amount' else \
+            values.astype(object).where(values.notna(), None).tolist()
+
+    return TransactionStore(tx_df, items_df, payments_df, fingerprint=fingerprint)
@@ -0,0 +1,124 @@
+"""
+Parse Cache Module - cache קבוע על הדיסק לתוצאות פענוח של דוחות HTML
+
+המפתח הוא SHA-256 של תוכן הקובץ הגולמי יחד עם PARSER_VERSION, כך שהעלאה חוזרת
+של אותו קובץ (גם אחרי הפעלה מחדש של האפליקציה) לא מפוענחת שוב.
+כל רשומה נשמרת כתיקייה עם שלוש טבלאות Parquet - הטבלאות של TransactionStore.
+גודל ה-cache מוגבל והרשומות הישנות ביותר (לפי זמן גישה אחרון) נמחקות ראשונות.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import pandas as pd
+import pyarrow as pa
+
+from html_to_excel import PARSER_VERSION
+from transaction_store import TransactionStore
+
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'CAFE_DASHBOARD_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'cafe-dashboard', 'parse')
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ParseCache:
+    """
+    cache מבוסס תוכן לתוצאות parse_many / parse_html_transactions
+
+    Args:
+        cache_dir: תיקיית ה-cache
+        max_bytes: גודל מקסימלי כולל; מעבר לו נמחקות הרשומות שלא נקראו הכי הרבה זמן
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(raw):
+        """מפתח ה-cache - SHA-256 של גרסת ה-parser ותוכן הקובץ"""
+        digest = hashlib.sha256()
+        digest.update(f"parser-v{PARSER_VERSION}\0".encode('utf-8'))
+        digest.update(raw)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, raw):
+        """
+        קריאת טרנזקציות מה-cache
+
+        Returns:
+            רשימת טרנזקציות, או None אם הקובץ לא נמצא ב-cache
+        """
+        path = self._entry_path(self.key(raw))
+        if not os.path.isdir(path):
+            return None
+
+        try:
+            tx_df = pd.read_parquet(os.path.join(path, 'transactions.parquet'))
+            items_df = pd.read_parquet(os.path.join(path, 'items.parquet'))
+            payments_df = pd.read_parquet(os.path.join(path, 'payments.parquet'))
+        except Exception:
+            # רשומה פגומה - מחק ופענח מחדש
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        # עדכון זמן הגישה עבור ה-LRU
+        os.utime(path)
+        return TransactionStore(tx_df, items_df, payments_df).to_transactions()
+
+    def put(self, raw, transactions):
+        """שמירת תוצאת פענוח של קובץ ב-cache - best-effort: כישלון בכתיבה משאיר את הקובץ לא שמור"""
+        path = self._entry_path(self.key(raw))
+        if os.path.isdir(path):
+            os.utime(path)
+            return
+
+        store = TransactionStore.from_transactions(transactions)
+
+        # כתיבה לתיקייה זמנית והחלפה אטומית, כדי שקורא מקביל לא יראה רשומה חלקית
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            store.transactions.to_parquet(os.path.join(tmp_path, 'transactions.parquet'), index=False)
+            store.items.to_parquet(os.path.join(tmp_path, 'items.parquet'), index=False)
+            store.payments.to_parquet(os.path.join(tmp_path, 'payments.parquet'), index=False)
+            os.rename(tmp_path, path)
+        except (OSError, pa.ArrowException):
+            # תהליך אחר כתב את אותה רשומה במקביל, הדיסק מלא, או ערך שלא ניתן לשמור ב-Parquet
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+
+        self._evict(keep=path)
+
+    def _evict(self, keep=None):
+        """מחיקת הרשומות הישנות ביותר עד שהגודל הכולל קטן מ-max_bytes (פרט לרשומה keep)"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.stat(path).st_mtime, size, path))
+            total += size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """מחיקת כל ה-cache"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
@@ -0,0 +1,174 @@
+"""
+Rollup Cube Module - קובייה מצטברת של מכירות
+
+הקובייה נבנית פעם אחת לכל טעינת נתונים ומחזיקה שתי טבלאות עובדות, ממוינות לפי יום:
+- transactions: יום × שעה × קופה × אמצעי תשלום -> עסקאות, הכנסה, מע״מ, שורות פריט
+- items: יום × שעה × קופה × אמצעי תשלום × פריט -> כמות, הכנסה, שורות
+
+כל המדדים אדיטיביים, ולכן כל שאילתה (יומי, שבועי, חודשי, פריטים, קטגוריות) היא חיתוך של טווח ימים
+בחיפוש בינארי ו-groupby קטן על שורות הקובייה - בלי מעבר על העסקאות עצמן.
+עדכון אינקרמנטלי (update) מוסיף או מחסיר את הקובייה של העסקאות שהשתנו.
+"""
+
+import numpy as np
+import pandas as pd
+
+from categories import CategoryClassifier
+
+
+DIMENSIONS = ['day', 'hour', 'register', 'payment_method']
+TRANSACTION_MEASURES = ['transactions', 'revenue', 'vat', 'lines']
+ITEM_MEASURES = ['quantity', 'revenue', 'lines']
+
+
+def _day(value) -> np.datetime64:
+    return pd.Timestamp(value).to_datetime64().astype('datetime64[D]')
+
+
+def week_starts(days: np.ndarray) -> np.ndarray:
+    """תחילת השבוע הישראלי (יום ראשון) לכל יום במערך datetime64"""
+    days = days.astype('datetime64[D]')
+    # 1970-01-01 היה יום חמישי - ארבעה ימים אחרי יום ראשון
+    offsets = (days.astype(np.int64) + 4) % 7
+    return days - offsets.astype('timedelta64[D]')
+
+
+class RollupCube:
+    """
+    קובייה מצטברת על שתי טבלאות עובדות (עסקאות ופריטים) הממוינות לפי יום
+
+    Args:
+        transactions: DataFrame עם DIMENSIONS ו-TRANSACTION_MEASURES
+        items: DataFrame עם DIMENSIONS, item ו-ITEM_MEASURES
+    """
+
+    def __init__(self, transactions, items):
+        self.transactions = transactions
+        self.items = items
+
+    @classmethod
+    def from_store(cls, store):
+        """בניית הקובייה מ-TransactionStore - groupby אחד לכל טבלה"""
+        tx = store.transactions
+        timestamps = tx['timestamp']
+        tx_dims = pd.DataFrame({
+            'day': store.day_index(),
+            'hour': timestamps.dt.hour.to_numpy(dtype=np.int64),
+            'register': tx['register'].fillna('').astype(str).to_numpy(dtype=object),
+            'payment_method': store.primary_payment_methods()
+        })
+
+        transactions = tx_dims.assign(
+            transactions=1,
+            revenue=tx['total'].to_numpy(),
+            vat=tx['total_vat'].to_numpy(),
+            lines=store.item_counts()
+        )
+
+        item_tx = store.items['tx'].to_numpy()
+        items = tx_dims.iloc[item_tx].reset_index(drop=True).assign(
+            item=store.items['name'].astype(str).to_numpy(dtype=object),
+            quantity=store.items['quantity'].to_numpy(),
+            revenue=store.items['total_price'].to_numpy(),
+            lines=1
+        )
+
+        return cls(
+            _rollup(transactions, DIMENSIONS, TRANSACTION_MEASURES),
+            _rollup(items, DIMENSIONS + ['item'], ITEM_MEASURES)
+        )
+
+    def update(self, added=None, removed=None):
+        """
+        קובייה חדשה אחרי הוספת העסקאות ב-added והסרת העסקאות ב-removed (שניהם TransactionStore).
+        עסקה שעודכנה מופיעה בשניהם - הגרסה הישנה ב-removed והחדשה ב-added
+        """
+        tx_parts, item_parts = [self.transactions], [self.items]
+        for store, sign in ((added, 1), (removed, -1)):
+            if store is None or len(store) == 0:
+                continue
+            delta = RollupCube.from_store(store)
+            tx_parts.append(_signed(delta.transactions, TRANSACTION_MEASURES, sign))
+            item_parts.append(_signed(delta.items, ITEM_MEASURES, sign))
+
+        if len(tx_parts) == 1:
+            return self
+        transactions = _rollup(pd.concat(tx_parts, ignore_index=True), DIMENSIONS, TRANSACTION_MEASURES)
+        items = _rollup(pd.concat(item_parts, ignore_index=True), DIMENSIONS + ['item'], ITEM_MEASURES)
+        # צירופים שכל העסקאות שלהם הוסרו
+        return RollupCube(
+            transactions[transactions['transactions'] != 0].reset_index(drop=True),
+            items[items['lines'] != 0].reset_index(drop=True)
+        )
+
+    # ------------------------------------------------------------
+    # שאילתות - start_date/end_date כוללים; None פירושו ללא גבול
+    # ------------------------------------------------------------
+
+    def _range(self, frame, start_date=None, end_date=None):
+        days = frame['day'].to_numpy()
+        lo = 0 if start_date is None else np.searchsorted(days, _day(start_date).astype(days.dtype), side='left')
+        hi = len(days) if end_date is None else np.searchsorted(days, _day(end_date).astype(days.dtype), side='right')
+        return frame.iloc[lo:hi]
+
+    def totals(self, start_date=None, end_date=None):
+        """סיכום הטווח: transactions, revenue, vat, lines"""
+        part = self._range(self.transactions, start_date, end_date)
+        return {col: part[col].sum() for col in TRANSACTION_MEASURES}
+
+    def daily(self, start_date=None, end_date=None):
+        """סיכום יומי במבנה של TransactionStore.daily_summary"""
+        part = self._range(self.transactions, start_date, end_date)
+        daily_df = part.groupby('day', sort=True).agg(
+            total_sales=('revenue', 'sum'),
+            transaction_count=('transactions', 'sum'),
+            items_count=('lines', 'sum'),
+            total_vat=('vat', 'sum')
+        ).reset_index().rename(columns={'day': 'date'})
+        daily_df['date'] = pd.to_datetime(daily_df['date'])
+        return daily_df
+
+    def weekly(self, start_date=None, end_date=None):
+        """סיכום לפי שבוע ישראלי: week_start, revenue, transactions"""
+        part = self._range(self.transactions, start_date, end_date)
+        weekly_df = part.groupby(week_starts(part['day'].to_numpy()), sort=True).agg(
+            revenue=('revenue', 'sum'),
+            transactions=('transactions', 'sum')
+        )
+        weekly_df.index = pd.to_datetime(weekly_df.index)
+        return weekly_df.rename_axis('week_start').reset_index()
+
+    def item_totals(self, start_date=None, end_date=None):
+        """סיכום לפי פריט: quantity, revenue - ממוין לפי הכנסה יורדת"""
+        part = self._range(self.items, start_date, end_date)
+        totals = part.groupby('item', sort=False)[['quantity', 'revenue']].sum()
+        return totals.sort_values('revenue', ascending=False)
+
+    def category_totals(self, categories, start_date=None, end_date=None):
+        """
+        כמות והכנסה לכל קטגוריה - groupby אחד על עמודת category של סיכום הפריטים בטווח.
+        פריט נספר בכל קטגוריה שמתאימה לו (CategoryClassifier.match_many), כמו יעדי הקטגוריות המקוריים:
+        "כריך סלמון" נספר גם ב"סלמון" וגם ב"כריך סלמון"
+
+        Args:
+            categories: CategoryClassifier, או רשימת שמות קטגוריה (פריט שייך לקטגוריה אם שמה מופיע בשם הפריט)
+        """
+        classifier = categories if isinstance(categories, CategoryClassifier) else \
+            CategoryClassifier.from_names(categories)
+        items = self.item_totals(start_date, end_date)
+        # שורה לכל (פריט, קטגוריה מתאימה); פריט בלי קטגוריה נשאר עם NaN ולא נספר
+        items = items.assign(category=classifier.match_many(items.index)).explode('category')
+        totals = items.groupby('category', sort=False)[['quantity', 'revenue']].sum()
+        return totals.reindex(classifier.categories, fill_value=0)
+
+def _rollup(frame, keys, measures):
+    rolled = frame.groupby(keys, sort=False, dropna=False)[measures].sum().reset_index()
+    return rolled.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def _signed(frame, measures, sign):
+    if sign == 1:
+        return frame
+    frame = frame.copy()
+    frame[measures] = -frame[measures]
+    return frame
@@ -0,0 +1,275 @@
+"""
+Sheets Client Module - שכבת מכסה וניסיונות חוזרים לכל הקריאות של gspread
+
+כל קריאה של gspread ל-API (פתיחת ה-Spreadsheet, קריאה, כתיבה, מחיקה) עוברת דרך Client.request.
+SheetsClient יורש מ-gspread.Client ועוטף את request:
+- token bucket נפרד לקריאות ולכתיבות, בגודל המכסה לדקה של Sheets API
+- ניסיון חוזר על 429 ו-5xx עם backoff מעריכי ו-jitter (או לפי Retry-After)
+- בקשות קריאה זהות שרצות במקביל מאוחדות לבקשה אחת לשרת
+- מונים: בקשות, ניסיונות חוזרים, 429, שגיאות, בקשות מאוחדות, זמן המתנה למכסה ובתים
+
+429 שנשאר אחרי כל הניסיונות נזרק כ-SheetsRateLimitError, כדי שהקוראים יוכלו להציג אותו
+במקום להחזיר "אין נתונים".
+"""
+
+import random
+import threading
+import time
+from json import dumps
+
+import gspread
+from gspread.exceptions import APIError
+
+
+# מכסות Sheets API לדקה (למשתמש, לכל פרויקט)
+READ_REQUESTS_PER_MINUTE = 60
+WRITE_REQUESTS_PER_MINUTE = 60
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+METRIC_NAMES = ['calls', 'retries', 'rate_limited', 'errors', 'coalesced', 'throttle_seconds',
+                'bytes_sent', 'bytes_received']
+
+
+class SheetsRateLimitError(APIError):
+    """429 שנשאר אחרי כל הניסיונות החוזרים - מכסת הבקשות לדקה נוצלה"""
+
+
+class TokenBucket:
+    """
+    token bucket בטוח ל-threads
+
+    Args:
+        per_minute: קצב המילוי (אסימונים לדקה)
+        capacity: גודל הדלי - כמה בקשות אפשר לשלוח ברצף (ברירת מחדל: per_minute)
+    """
+
+    def __init__(self, per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """לקיחת אסימון, בהמתנה אם הדלי ריק - מחזיר את זמן ההמתנה בשניות"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def available(self) -> float:
+        """מספר האסימונים בדלי כרגע (אחרי מילוי)"""
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+    def drain(self):
+        """ריקון הדלי אחרי 429 - גם שאר ה-threads ממתינים לפני הבקשה הבאה"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+
+class _Flight:
+    """בקשת קריאה שנמצאת באוויר - ה-threads שמבקשים אותה ממתינים לתוצאה שלה"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class SheetsClient(gspread.Client):
+    """
+    gspread.Client עם הגבלת קצב, ניסיונות חוזרים, איחוד בקשות ומונים
+
+    Args:
+        auth: credentials (כמו ב-gspread.Client)
+        session: session של requests (ברירת מחדל: AuthorizedSession; בבדיקות - FakeSheetsSession)
+        read_limiter / write_limiter: TokenBucket לבקשות GET ולשאר הבקשות
+        max_retries: מספר הניסיונות החוזרים על 429 / 5xx
+        backoff_base / backoff_max: ההמתנה לפני הניסיון החוזר הראשון והמקסימלית (שניות)
+    """
+
+    def __init__(self, auth, session=None, read_limiter=None, write_limiter=None, max_retries=5,
+                 backoff_base=1.0, backoff_max=32.0, sleep=time.sleep):
+        super().__init__(auth, session)
+        self.read_limiter = read_limiter or TokenBucket(READ_REQUESTS_PER_MINUTE)
+        self.write_limiter = write_limiter or TokenBucket(WRITE_REQUESTS_PER_MINUTE)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._metrics = dict.fromkeys(METRIC_NAMES, 0)
+        self._metrics_lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def metrics(self) -> dict:
+        """עותק של המונים"""
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+    def quota_headroom(self) -> dict:
+        """כמה בקשות אפשר לשלוח עכשיו בלי להמתין - קריאות, כתיבות, והמכסה לדקה"""
+        return {
+            'read': int(self.read_limiter.available()),
+            'write': int(self.write_limiter.available()),
+            'read_per_minute': self.read_limiter.capacity,
+            'write_per_minute': self.write_limiter.capacity,
+        }
+
+    def _count(self, **deltas):
+        with self._metrics_lock:
+            for name, delta in deltas.items():
+                self._metrics[name] += delta
+
+    def request(self, method, endpoint, params=None, data=None, json=None, files=None, headers=None):
+        if method != 'get':
+            return self._send(method, endpoint, params, data, json, files, headers)
+
+        key = (endpoint, _freeze(params))
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            self._count(coalesced=1)
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = self._send(method, endpoint, params, data, json, files, headers)
+            return flight.response
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def _send(self, method, endpoint, params, data, json, files, headers):
+        limiter = self.read_limiter if method == 'get' else self.write_limiter
+        for attempt in range(self.max_retries + 1):
+            waited = limiter.acquire()
+            self._count(calls=1, throttle_seconds=waited, bytes_sent=_payload_size(data, json))
+            try:
+                response = super().request(method, endpoint, params=params, data=data, json=json,
+                                           files=files, headers=headers)
+            except APIError as e:
+                status = e.response.status_code
+                self._count(bytes_received=len(e.response.content or b''))
+                if status == 429:
+                    self._count(rate_limited=1)
+                    limiter.drain()
+                if status not in RETRY_STATUSES or attempt == self.max_retries:
+                    self._count(errors=1)
+                    if status == 429:
+                        raise SheetsRateLimitError(e.response) from e
+                    raise
+                self._count(retries=1)
+                self._sleep(self._backoff(attempt, e.response))
+                continue
+
+            self._count(bytes_received=len(response.content or b''))
+            return response
+
+    def _backoff(self, attempt, response) -> float:
+        """Retry-After אם השרת שלח; אחרת backoff מעריכי עם jitter (חצי קבוע, חצי אקראי)"""
+        retry_after = response.headers.get('Retry-After') if response.headers else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _freeze(params):
+    """פרמטרים של בקשה כמפתח hashable (רשימות - למשל ranges של batchGet - הופכות ל-tuple)"""
+    if not params:
+        return ()
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+
+
+def _payload_size(data, json) -> int:
+    if json is not None:
+        return len(dumps(json, ensure_ascii=False).encode('utf-8'))
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    return 0
+
+
+class HealthProbe:
+    """
+    תוצאת בדיקת חיבור אחרונה עם רענון ברקע (stale-while-revalidate)
+
+    הקריאה הראשונה מריצה את הבדיקה; אחר כך get() מחזיר מיד את התוצאה האחרונה,
+    ואם היא ישנה מ-ttl שניות - מתחיל רענון ב-thread רקע (אחד בכל פעם).
+
+    Args:
+        probe: פונקציה בלי ארגומנטים שמחזירה מילון תוצאה
+        ttl: שניות עד שהתוצאה נחשבת ישנה
+    """
+
+    def __init__(self, probe, ttl=30, clock=time.monotonic):
+        self.probe = probe
+        self.ttl = ttl
+        self.result = None
+        self.checked_at = None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._first_lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def age(self):
+        """שניות מאז הבדיקה האחרונה, או None"""
+        return None if self.checked_at is None else self._clock() - self.checked_at
+
+    def get(self) -> dict:
+        if self.result is None:
+            with self._first_lock:
+                if self.result is None:
+                    self._run()
+            return self.result
+
+        with self._lock:
+            background = self._clock() - self.checked_at >= self.ttl and not self._refreshing
+            if background:
+                self._refreshing = True
+        if background:
+            threading.Thread(target=self._run, name='sheets-health-probe', daemon=True).start()
+        return self.result
+
+    def _run(self):
+        try:
+            result = self.probe()
+            with self._lock:
+                self.result = result
+                self.checked_at = self._clock()
+        finally:
+            self._refreshing = False
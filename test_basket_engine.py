@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+from functools import lru_cache
+from itertools import combinations
+
+import pandas as pd
+
+from basket_engine import BasketEngine
+from html_to_excel import parse_html_transactions
+from transaction_store import TransactionStore
+
+FILES = ['week1_01-07-dec.html', 'week2_08-14-dec.html']
+
+
+@lru_cache(maxsize=None)
+def _parsed():
+    transactions = []
+    for path in FILES:
+        with open(path, 'r', encoding='utf-8') as f:
+            transactions.extend(parse_html_transactions(f.read(), engine='stream'))
+    return transactions
+
+
+def load_transactions():
+    return list(_parsed())
+
+
+def test_pairs_match_combinations():
+    transactions = load_transactions()
+    engine = BasketEngine.from_store(TransactionStore.from_transactions(transactions))
+
+    expected = Counter()
+    for t in transactions:
+        expected.update(combinations(sorted(set(item['name'] for item in t['items'])), 2))
+
+    pairs = engine.pairs()
+    assert dict(zip(zip(pairs['item_a'], pairs['item_b']), pairs['count'])) == dict(expected)
+    assert engine.multi_item_count == sum(1 for t in transactions if len(t['items']) >= 2)
+
+    singles = Counter(name for t in transactions for name in set(item['name'] for item in t['items']))
+    first = pairs.iloc[0]
+    assert first['confidence_ab'] == first['count'] / singles[first['item_a']]
+    assert abs(first['lift'] - first['count'] * len(transactions)
+               / (singles[first['item_a']] * singles[first['item_b']])) < 1e-9
+
+
+def test_triples_match_combinations():
+    transactions = load_transactions()
+    engine = BasketEngine.from_store(TransactionStore.from_transactions(transactions))
+
+    expected = Counter()
+    for t in transactions:
+        expected.update(combinations(sorted(set(item['name'] for item in t['items'])), 3))
+    expected = {k: v for k, v in expected.items() if v >= 2}
+
+    triples = engine.triples(min_count=2)
+    assert dict(zip(zip(triples['item_a'], triples['item_b'], triples['item_c']), triples['count'])) == expected
+
+
+def test_related_uses_inverted_index():
+    transactions = load_transactions()
+    engine = BasketEngine.from_store(TransactionStore.from_transactions(transactions))
+    product = engine.pairs().iloc[0]['item_a']
+
+    containing = [t for t in transactions if any(item['name'] == product for item in t['items'])]
+    assert len(engine.transactions_with(product)) == len(containing)
+
+    expected = Counter()
+    for t in containing:
+        expected.update(set(item['name'] for item in t['items']) - {product})
+
+    related, base = engine.related(product, top=None)
+    assert dict(zip(related['product'], related['count'])) == dict(expected)
+    assert base == sum(1 for t in containing if len(t['items']) >= 2)
+
+
+def test_frequent_itemsets_match_brute_force():
+    transactions = load_transactions()
+    engine = BasketEngine.from_store(TransactionStore.from_transactions(transactions))
+    min_count = 8
+
+    expected = Counter()
+    for t in transactions:
+        names = sorted(set(item['name'] for item in t['items']))
+        for size in range(1, len(names) + 1):
+            expected.update(combinations(names, size))
+    expected = {k: v for k, v in expected.items() if v >= min_count}
+
+    itemsets = engine.frequent_itemsets(min_support=min_count / len(transactions))
+    assert dict(zip(itemsets['items'], itemsets['count'])) == expected
+    assert itemsets['size'].max() >= 3
+
+    rules = engine.association_rules(min_support=min_count / len(transactions), min_confidence=0.6, min_size=3)
+    assert (rules['size'] >= 3).all() and (rules['confidence'] >= 0.6).all()
+    rule = rules.iloc[0]
+    itemset = tuple(sorted(rule['antecedent'] + (rule['consequent'],)))
+    assert rule['count'] == expected[itemset]
+    assert rule['confidence'] == expected[itemset] / expected[rule['antecedent']]
+
+
+def test_rules_derive_from_given_itemsets_without_mining_again():
+    transactions = load_transactions()
+    engine = BasketEngine.from_store(TransactionStore.from_transactions(transactions))
+    min_support = 8 / len(transactions)
+    expected = engine.association_rules(min_support, min_confidence=0.6, min_size=3)
+
+    itemsets = engine.frequent_itemsets(min_support)
+    engine._mine = None
+    rules = engine.association_rules(min_support, min_confidence=0.6, min_size=3, itemsets=itemsets)
+    pd.testing.assert_frame_equal(rules, expected)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from categories import CategoryClassifier
+from html_to_excel import parse_html_transactions
+from transaction_store import TransactionStore
+
+KEYWORDS = {
+    'קפה חם': ['אספרסו', 'קפה הפוך', 'אמריקנו', 'לאטה'],
+    'קפה קר': ['אייס', 'קר'],
+    'תה': ['תה', 'נענע'],
+    'עוגות': ['עוגה', 'עוגת'],
+}
+
+
+def first_match(name, keywords=KEYWORDS, default='אחר'):
+    """הלולאה המקורית - הקטגוריה הראשונה שאחת ממילות המפתח שלה מופיעה בשם"""
+    for category, words in keywords.items():
+        if any(word in name for word in words):
+            return category
+    return default
+
+
+def test_matches_keyword_loop_with_priority():
+    classifier = CategoryClassifier(KEYWORDS)
+    names = ['אייס לאטה', 'לאטה קר', 'תה נענע', 'עוגת גזר', 'מים', 'אמריקנו גדול', 'קרואסון', 'עוגה', 'אספרס']
+    for name in names:
+        assert classifier.classify(name) == first_match(name)
+
+
+def test_overlapping_keywords_are_all_found():
+    # "ab" בתוך "xabc" נמצא דרך קישור כישלון מתוך "abc"
+    classifier = CategoryClassifier({'first': ['ab'], 'second': ['xabc'], 'third': ['bcd']})
+    assert classifier.classify('xabc') == 'first'
+    assert classifier.classify('zbcd') == 'third'
+    assert classifier.classify('xab') == 'first'
+    assert classifier.classify('xa') == 'אחר'
+
+
+def test_classifies_each_distinct_name_once():
+    with open('example_report.html', 'r', encoding='utf-8') as f:
+        store = TransactionStore.from_transactions(parse_html_transactions(f.read()))
+    classifier = CategoryClassifier.from_names(['קפה', 'תה', 'עוגת'])
+
+    categories = classifier.classify_many(store.items['name'])
+    assert len(classifier._cache) == store.items['name'].nunique()
+    expected = [first_match(name, {c: [c] for c in classifier.categories}, '') for name in store.items['name']]
+    assert pd.Series(categories).fillna('').tolist() == expected
+    assert set(expected) > {'קפה', 'תה'}
+
+    # כל ההתאמות מאותה סריקה - בלי מעבר נוסף על השמות
+    matches = classifier.match_many(store.items['name'])
+    assert len(classifier._cache) == store.items['name'].nunique()
+    assert matches.tolist() == [tuple(c for c in classifier.categories if c in name) for name in store.items['name']]
+
+
+def test_matches_returns_every_category_in_priority_order():
+    classifier = CategoryClassifier.from_names(['סלמון', 'כריך סלמון', 'כריך', 'קפה'])
+    assert classifier.matches('כריך סלמון גדול') == ('סלמון', 'כריך סלמון', 'כריך')
+    assert classifier.classify('כריך סלמון גדול') == 'סלמון'
+    assert classifier.matches('מים') == () and classifier.classify('מים') is None
+    assert CategoryClassifier({'a': ['ab'], 'b': ['xabc'], 'c': ['bcd']}).matches('xabcd') == ('a', 'b', 'c')
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import copy
+import datetime
+
+import pandas as pd
+
+from dataset import Dataset
+from html_to_excel import parse_html_transactions
+from transaction_store import TransactionStore
+
+
+def load_transactions():
+    with open('example_report.html', 'r', encoding='utf-8') as f:
+        transactions = parse_html_transactions(f.read())
+    for i, t in enumerate(transactions):
+        t['date'] = datetime.date(2025, 12, 1 + i % 10)
+    return transactions
+
+
+def test_merge_reports_added_and_updated_orders():
+    transactions = load_transactions()
+    dataset = Dataset.from_transactions(transactions[:20])
+
+    changed = copy.deepcopy(transactions[3])
+    changed['total'] += 5
+    added, updated = dataset.merge(transactions[15:] + [changed])
+
+    assert added == [t['order_id'] for t in transactions[20:]]
+    assert updated == [changed['order_id']]
+    assert dataset.merge(transactions[:3]) == ([], [])
+
+
+def test_merge_matches_full_rebuild():
+    transactions = load_transactions()
+    dataset = Dataset.from_transactions(transactions[12:])
+    dataset.merge(transactions[:12])
+    rebuilt = Dataset.from_transactions(transactions)
+
+    assert dataset.fingerprint == rebuilt.fingerprint
+    assert dataset.store.to_transactions() == rebuilt.store.to_transactions()
+    pd.testing.assert_frame_equal(dataset.cube.transactions, rebuilt.cube.transactions)
+    pd.testing.assert_frame_equal(dataset.cube.items, rebuilt.cube.items)
+
+
+def test_merge_keeps_fingerprints_of_untouched_days():
+    transactions = load_transactions()
+    dataset = Dataset.from_transactions(transactions)
+    first_days = dataset.range_fingerprint(datetime.date(2025, 12, 1), datetime.date(2025, 12, 5))
+    all_days = dataset.fingerprint
+
+    changed = copy.deepcopy(next(t for t in transactions if t['date'].day == 8))
+    changed['items'] = changed['items'][:1]
+    dataset.merge([changed])
+
+    assert dataset.range_fingerprint(datetime.date(2025, 12, 1), datetime.date(2025, 12, 5)) == first_days
+    assert dataset.fingerprint != all_days
+    sliced = dataset.date_slice(datetime.date(2025, 12, 8), datetime.date(2025, 12, 8)).to_transactions()
+    assert changed in sliced and all(t['date'] == datetime.date(2025, 12, 8) for t in sliced)
+
+
+def test_merge_keys_on_z_number_and_register():
+    transactions = load_transactions()[:5]
+    dataset = Dataset.from_transactions(transactions)
+
+    # אותו מספר הזמנה בדוח Z אחר - מכירה אחרת
+    other_z = copy.deepcopy(transactions[0])
+    other_z['z_number'] = '1287'
+    assert dataset.merge([other_z]) == ([other_z['order_id']], [])
+
+    # שורת ענן ישנה בלי Z - מותאמת להזמנה הקיימת לפי קופה והזמנה
+    legacy = copy.deepcopy(transactions[1])
+    legacy['z_number'] = ''
+    assert dataset.merge([legacy]) == ([], [legacy['order_id']])
+    assert len(dataset) == 6
+
+
+def test_later_file_wins_within_one_merge():
+    transactions = load_transactions()
+    dataset = Dataset.from_transactions(transactions[:10])
+
+    earlier, later = copy.deepcopy(transactions[12]), copy.deepcopy(transactions[12])
+    earlier['total'] += 1
+    later['total'] += 2
+    stale = copy.deepcopy(transactions[4])
+    stale['total'] += 3
+    # שני קבצים באותו מיזוג: הראשון עם גרסה ישנה של 4 ו-12, השני עם 4 המקורית ו-12 המעודכנת
+    first_file = transactions[10:12] + [earlier, transactions[13], stale]
+    second_file = [later, transactions[4]]
+    added, updated = dataset.merge(first_file + second_file)
+
+    assert sorted(added) == sorted(t['order_id'] for t in transactions[10:14]) and updated == []
+    merged = {t['order_id']: t for t in dataset.store.to_transactions()}
+    assert merged[later['order_id']]['total'] == later['total']
+    assert merged[stale['order_id']] == transactions[4]
+    assert len(dataset) == 14
+
+
+def test_merge_accepts_per_file_stores():
+    transactions = load_transactions()
+    from_dicts = Dataset.from_transactions(transactions[:10])
+    from_stores = Dataset.from_transactions(transactions[:10])
+
+    # כמו באפליקציה: כל קובץ מפוענח ל-store נפרד, והמיזוג מקבל את האיחוד שלהם
+    changed = copy.deepcopy(transactions[4])
+    changed['total'] += 1
+    files = [transactions[10:13], [changed, transactions[13]]]
+    result = from_dicts.merge([t for f in files for t in f])
+    assert from_stores.merge(TransactionStore.concat(TransactionStore.from_transactions(f) for f in files)) == result
+    assert from_stores.store.to_transactions() == from_dicts.store.to_transactions()
+    assert from_stores.fingerprint == from_dicts.fingerprint
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import io
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from html_to_excel import (
+    parse_html_transactions,
+    create_detailed_transactions_df,
+    export_to_excel,
+    write_excel_sheets
+)
+
+
+def load_transactions():
+    with open('example_report.html', 'r', encoding='utf-8') as f:
+        return parse_html_transactions(f.read())
+
+
+def test_export_to_excel_round_trip(tmp_path):
+    transactions = load_transactions()
+    path = tmp_path / 'report.xlsx'
+    daily_df, trans_df, items_df = export_to_excel(transactions, path)
+
+    wb = load_workbook(path)
+    assert wb.sheetnames == ['Daily Summary', 'Transactions', 'Items Summary']
+    header = wb['Transactions'][1]
+    assert [cell.value for cell in header] == list(trans_df.columns)
+    assert header[0].font.bold and header[0].fill.start_color.rgb.endswith('366092')
+    assert wb['Items Summary'].column_dimensions['A'].width == 30
+
+    read_back = pd.read_excel(path, sheet_name='Items Summary')
+    pd.testing.assert_frame_equal(read_back, items_df.reset_index(drop=True), check_dtype=False)
+    assert wb['Transactions'].max_row == len(trans_df) + 1
+
+
+def test_empty_export_writes_headers(tmp_path):
+    path = tmp_path / 'empty.xlsx'
+    export_to_excel([], path)
+
+    wb = load_workbook(path)
+    daily = list(wb['Daily Summary'].values)
+    assert daily == [('Date', 'Total Sales', 'Transaction Count', 'Items Count', 'Total VAT')]
+    assert wb['Transactions'].max_row == 1 and wb['Items Summary'].max_row == 1
+
+
+def test_chunks_and_missing_values():
+    frame = pd.DataFrame({'name': ['a', None, 'c', 'd'], 'value': [1.5, np.nan, 3.0, 4.0]})
+    output = io.BytesIO()
+    write_excel_sheets(output, [('data', (frame.iloc[i:i + 2] for i in range(0, 4, 2)), None),
+                                ('empty', iter([]), 10)])
+
+    output.seek(0)
+    wb = load_workbook(output)
+    rows = list(wb['data'].values)
+    assert rows == [('name', 'value'), ('a', 1.5), (None, None), ('c', 3.0), ('d', 4.0)]
+    assert wb['empty'].max_row == 1 and wb['empty']['A1'].value is None
+
+
+def test_dashboard_frames_survive_export():
+    trans_df = create_detailed_transactions_df(load_transactions())
+    output = io.BytesIO()
+    write_excel_sheets(output, [('טרנזקציות', trans_df, 12)])
+
+    output.seek(0)
+    read_back = pd.read_excel(output, sheet_name='טרנזקציות')
+    assert list(read_back.columns) == list(trans_df.columns)
+    assert read_back['Total Amount'].sum() == trans_df['Total Amount'].sum()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+import datetime
+import threading
+import time
+
+import pytest
+
+from dataset import Dataset
+from fake_gspread import FakeClient, FakeWorksheet, FakeSpreadsheet
+from google_sheets_connector import REQUIRED_COLUMNS, SheetMirror, open_worksheet, transactions_to_flat_df
+from html_to_excel import parse_html_transactions
+from local_history import LocalHistory, SheetReplicator, ReplicationWorker
+from transaction_store import TransactionStore, transaction_key
+
+
+def load_week(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_html_transactions(f.read(), engine='stream')
+
+
+def key_of(t):
+    return transaction_key(t['z_number'], t['register'], t['order_id'])
+
+
+def test_ingest_and_load_round_trip(tmp_path):
+    transactions = load_week('week1_01-07-dec.html')
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+
+    added, updated = history.ingest(transactions)
+    assert len(added) == len(history) == len(transactions) and updated == []
+    assert history.ingest(transactions) == ([], [])
+
+    expected = TransactionStore.from_transactions(transactions)
+    expected = expected.take(expected.date_order())
+    store = history.load_store()
+    assert (store.transaction_hashes() == expected.transaction_hashes()).all()
+    assert store.to_transactions() == expected.to_transactions()
+
+    start, end = datetime.date(2025, 12, 3), datetime.date(2025, 12, 5)
+    assert history.load_store(start, end).to_transactions() == expected.date_slice(start, end).to_transactions()
+
+    # הזמנה שהתוכן שלה השתנה מוחלפת, וה-revision עולה
+    revision = history.revision
+    changed = dict(transactions[0], total=transactions[0]['total'] + 1)
+    assert history.ingest([changed]) == ([], [key_of(changed)])
+    assert history.revision == revision + 1
+    assert len(history) == len(transactions)
+
+
+def test_saving_two_uploads_keeps_the_later_copy_of_an_order(tmp_path):
+    week1 = load_week('week1_01-07-dec.html')
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+
+    # אותה הזמנה בשתי העלאות - כמו בכפתור השמירה, הקבצים לפי סדר ההעלאה
+    first_upload = week1[:5]
+    second_upload = [dict(week1[2], total=week1[2]['total'] + 100)]
+    added, updated = history.ingest(first_upload + second_upload)
+    assert len(added) == 5 and updated == []
+
+    saved = {key_of(t): t for t in history.load_store().to_transactions()}
+    assert saved[key_of(week1[2])]['total'] == second_upload[0]['total']
+
+    # אותה גרסה שהדשבורד מציג אחרי מיזוג אותן העלאות
+    dataset = Dataset.from_transactions([])
+    dataset.merge(first_upload + second_upload)
+    shown = {key_of(t): t for t in dataset.store.to_transactions()}
+    assert shown[key_of(week1[2])] == saved[key_of(week1[2])]
+
+
+def test_replication_pushes_pending_and_pulls_remote_edits(tmp_path):
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    worker = ReplicationWorker(SheetReplicator(history, lambda: ws))
+
+    week1 = load_week('week1_01-07-dec.html')
+    history.ingest(week1)
+    result = worker.run_once()
+    line_count = sum(len(t['items']) for t in week1)
+    assert result == {'pushed': line_count, 'pulled': 0, 'updated': 0}
+    assert history.pending_count() == 0
+    assert len(ws.get_all_values()) == line_count + 1
+
+    # לקוח אחר העלה שבוע נוסף ישירות לגיליון
+    week2 = load_week('week2_08-14-dec.html')
+    ws.append_rows(transactions_to_flat_df(week2).values.tolist())
+    result = worker.run_once()
+    assert result['pushed'] == 0 and result['pulled'] == len(week2)
+    assert len(history) == len(week1) + len(week2)
+
+    # עריכה בגיליון: שורה של שבוע 2 (מקור ענן) מתעדכנת, שורה של שבוע 1 (HTML מקומי) לא
+    price_col = REQUIRED_COLUMNS.index('Sale_Price')
+    ws._rows[1][price_col] = '999'
+    ws._rows[line_count + 1][price_col] = '999'
+    result = worker.run_once()
+    assert result == {'pushed': 0, 'pulled': 0, 'updated': 1}
+    assert worker.last_error is None and history.get_meta('last_sync') is not None
+
+
+def test_changed_order_replaces_its_rows_in_the_sheet(tmp_path):
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+    ws = FakeSpreadsheet([FakeWorksheet(rows=[REQUIRED_COLUMNS])]).worksheet('History')
+    replicator = SheetReplicator(history, lambda: ws)
+    week1 = load_week('week1_01-07-dec.html')
+    history.ingest(week1)
+    replicator.run_once()
+    line_count = len(ws.get_all_values()) - 1
+
+    # העלאה מחדש של ההזמנה עם מחיר שונה ובלי הפריט האחרון
+    order = next(t for t in week1 if len(t['items']) > 1)
+    items = [dict(item, total_price=999.0) for item in order['items'][:-1]]
+    changed = dict(order, items=items)
+    assert history.ingest([changed]) == ([], [key_of(order)])
+    assert history.pending_count() == 1
+
+    replicator.run_once()
+    assert history.pending_count() == 0
+    rows = [dict(zip(REQUIRED_COLUMNS, row)) for row in ws.get_all_values()[1:]]
+    order_rows = [row for row in rows if row['Transaction_ID'].rpartition('|')[0] == key_of(order)]
+    assert [row['Sale_Price'] for row in order_rows] == ['999'] * len(items)
+    assert len(rows) == line_count - 1
+    assert len(set(row['Transaction_ID'] for row in rows)) == len(rows)
+
+
+def test_mirror_pull_reads_only_appended_rows(tmp_path):
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    replicator = SheetReplicator(history, lambda: ws, mirror=SheetMirror(str(tmp_path / 'mirror')))
+    week1 = load_week('week1_01-07-dec.html')
+    history.ingest(week1)
+    replicator.run_once()
+
+    # שבוע 2 מועלה בשתי קריאות append שמפצלות הזמנה באמצע
+    week2 = load_week('week2_08-14-dec.html')
+    flat = transactions_to_flat_df(week2).values.tolist()
+    n_split = next(i for i, t in enumerate(week2) if len(t['items']) > 1)
+    split = sum(len(t['items']) for t in week2[:n_split]) + 1
+    ws.append_rows(flat[:split])
+    ws.cells_read = 0
+    assert replicator.run_once()['pulled'] == n_split + 1
+    assert ws.cells_read < 5 * len(REQUIRED_COLUMNS) * split
+
+    ws.append_rows(flat[split:])
+    result = replicator.run_once()
+    assert result['pulled'] == len(week2) - n_split - 1 and result['updated'] == 1
+
+    # ההזמנה המפוצלת נבנתה מחדש מכל שורותיה - כמו במשיכה מלאה של הגיליון
+    full = LocalHistory(str(tmp_path / 'full.sqlite3'))
+    SheetReplicator(full, lambda: ws).pull(ws)
+    start, end = datetime.date(2025, 12, 8), datetime.date(2025, 12, 14)
+    assert (history.load_store(start, end).transaction_hashes() == full.load_store(start, end).transaction_hashes()).all()
+
+
+def test_mirror_pull_picks_up_remote_edits_on_full_resync(tmp_path):
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    ws.append_rows(transactions_to_flat_df(load_week('week2_08-14-dec.html')).values.tolist())
+    now = [0.0]
+    mirror = SheetMirror(str(tmp_path / 'mirror'), full_resync_interval=3600, clock=lambda: now[0])
+    replicator = SheetReplicator(history, lambda: ws, mirror=mirror)
+    replicator.run_once()
+
+    # עריכה בגיליון של שורה ישנה - מתגלה רק בקריאה המלאה התקופתית
+    ws._rows[1][REQUIRED_COLUMNS.index('Sale_Price')] = '999'
+    now[0] = 60
+    assert replicator.run_once()['updated'] == 0
+    now[0] = 3600
+    assert replicator.run_once() == {'pushed': 0, 'pulled': 0, 'updated': 1}
+    assert 999 in [item['total_price'] for t in history.load_store().to_transactions() for item in t['items']]
+
+
+def test_worker_records_connection_errors(tmp_path):
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+    worker = ReplicationWorker(SheetReplicator(history, lambda: None))
+    try:
+        worker.run_once()
+    except ConnectionError:
+        pass
+    assert worker.last_error and worker.last_run is not None
+
+
+def test_worker_opens_the_sheet_without_streamlit_and_recovers(tmp_path, monkeypatch):
+    import streamlit as st
+
+    shown = []
+    for name in ('error', 'warning'):
+        monkeypatch.setattr(st, name, lambda *args, **kwargs: shown.append(args))
+
+    class FlakyClient(FakeClient):
+        failures = 1
+
+        def open_by_url(self, url):
+            if self.failures:
+                self.failures -= 1
+                raise OSError('network down')
+            return super().open_by_url(url)
+
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+    history.ingest(load_week('week1_01-07-dec.html')[:3])
+    client = FlakyClient(FakeSpreadsheet([]))
+    worker = ReplicationWorker(SheetReplicator(history, lambda: open_worksheet(client, 'url', 'History')))
+
+    def cycle():
+        with pytest.raises(OSError):
+            worker.run_once()
+
+    thread = threading.Thread(target=cycle)
+    thread.start()
+    thread.join()
+    assert worker.last_error == 'network down' and shown == []
+
+    # המחזור הבא פותח שוב (אין None שמור) ויוצר את הגיליון החסר עם headers
+    worker.run_once()
+    assert worker.last_error is None and history.pending_count() == 0
+    assert client.spreadsheet.worksheet('History').get_all_values()[0] == REQUIRED_COLUMNS
+    with pytest.raises(ConnectionError):
+        open_worksheet(client, None, 'History')
+
+
+def test_background_cycle_swaps_in_new_snapshot(tmp_path):
+    history = LocalHistory(str(tmp_path / 'history.sqlite3'))
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    week1 = load_week('week1_01-07-dec.html')
+    ws.append_rows(transactions_to_flat_df(week1).values.tolist())
+
+    seen = []
+
+    def worksheet():
+        # בזמן המחזור הגרסה הקודמת (אין) עדיין מוצגת
+        seen.append((worker.refreshing, worker.snapshot))
+        return ws
+
+    worker = ReplicationWorker(SheetReplicator(history, worksheet), interval=3600)
+    worker.start()
+    for _ in range(100):
+        if worker.last_success is not None:
+            break
+        time.sleep(0.05)
+    worker.stop(timeout=5)
+
+    assert seen[0] == (True, None) and not worker.refreshing
+    revision, store = worker.snapshot
+    assert revision == history.revision and len(store) == len(week1)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+
+from html_to_excel import parse_html_transactions, parse_many
+from parse_cache import ParseCache
+
+
+def load_example_bytes():
+    with open('example_report.html', 'rb') as f:
+        return f.read()
+
+
+def test_cache_round_trip(tmp_path):
+    raw = load_example_bytes()
+    expected = parse_html_transactions(raw.decode('utf-8'))
+    cache = ParseCache(str(tmp_path))
+
+    assert cache.get(raw) is None
+    cache.put(raw, expected)
+
+    # מופע חדש - כמו הפעלה מחדש של האפליקציה
+    assert ParseCache(str(tmp_path)).get(raw) == expected
+
+
+def test_parse_many_skips_cached_files(tmp_path, monkeypatch):
+    raw = load_example_bytes()
+    cache = ParseCache(str(tmp_path))
+    first, _ = parse_many([raw], workers=1, cache=cache)
+
+    def fail(_raw):
+        raise AssertionError("cached file was parsed again")
+
+    monkeypatch.setattr('html_to_excel._run_parse_part', fail)
+    second, errors = parse_many([raw], workers=1, cache=cache)
+
+    assert second == first and errors == []
+
+
+def test_lru_eviction(tmp_path):
+    raw = load_example_bytes()
+    transactions = parse_html_transactions(raw.decode('utf-8'))
+    cache = ParseCache(str(tmp_path), max_bytes=1)
+
+    cache.put(raw, transactions)
+    cache.put(raw + b' ', transactions)
+
+    # רק הרשומה האחרונה נשארת כשהמגבלה קטנה מרשומה אחת
+    assert os.listdir(str(tmp_path)) == [ParseCache.key(raw + b' ')]
+    assert cache.get(raw) is None
+
+
+def test_put_is_best_effort_when_arrow_cannot_serialise(tmp_path):
+    raw = load_example_bytes()
+    transactions = parse_html_transactions(raw.decode('utf-8'))
+    # עמודה עם טיפוסים מעורבים - pyarrow לא יכול לכתוב אותה ל-Parquet
+    transactions[0]['items'][0]['code'] = object()
+    cache = ParseCache(str(tmp_path))
+
+    cache.put(raw, transactions)
+    assert os.listdir(str(tmp_path)) == [] and cache.get(raw) is None
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+import pandas as pd
+
+from html_to_excel import parse_html_transactions
+from rollup_cube import RollupCube
+from transaction_store import TransactionStore
+
+
+def load_store():
+    with open('example_report.html', 'r', encoding='utf-8') as f:
+        transactions = parse_html_transactions(f.read())
+    for i, t in enumerate(transactions):
+        t['date'] = datetime.date(2025, 11 + i % 2, 1 + (i * 5) % 28)
+    return TransactionStore.from_transactions(transactions).sort_by_date()
+
+
+def test_daily_matches_store_summary():
+    store = load_store()
+    expected = store.daily_summary()
+    expected['date'] = pd.to_datetime(expected['date'])
+
+    pd.testing.assert_frame_equal(RollupCube.from_store(store).daily(), expected, check_dtype=False)
+
+
+def test_range_queries_match_sliced_store():
+    store = load_store()
+    cube = RollupCube.from_store(store)
+    start, end = datetime.date(2025, 11, 10), datetime.date(2025, 12, 3)
+    part = store.date_slice(start, end)
+
+    totals = cube.totals(start, end)
+    assert totals['transactions'] == len(part)
+    assert abs(totals['revenue'] - part.transactions['total'].sum()) < 1e-6
+
+    weekly = cube.weekly(start, end)
+    assert (weekly['week_start'].dt.dayofweek == 6).all()
+    assert weekly['transactions'].sum() == len(part)
+
+    items = cube.item_totals(start, end)
+    expected = part.items.groupby('name')['quantity'].sum()
+    assert items['quantity'].sort_index().to_dict() == expected.sort_index().to_dict()
+
+
+def test_incremental_update_matches_rebuild():
+    store = load_store()
+    head, tail = store.slice_rows(0, 20), store.slice_rows(20, len(store))
+    cube = RollupCube.from_store(store)
+
+    added = RollupCube.from_store(head).update(added=tail)
+    pd.testing.assert_frame_equal(added.transactions, cube.transactions)
+    pd.testing.assert_frame_equal(added.items, cube.items)
+
+    removed = cube.update(removed=tail)
+    pd.testing.assert_frame_equal(removed.daily(), RollupCube.from_store(head).daily())
+
+
+def test_goal_categories_are_counted_independently():
+    store = load_store()
+    cube = RollupCube.from_store(store)
+    goals = ['סלמון', 'כריך סלמון', 'קפה', 'קפה גדול']
+
+    totals = cube.category_totals(goals)
+    # כמו הלולאה המקורית: כל יעד סופר את כל הפריטים ששמו מופיע בהם, גם אם יעד אחר כבר ספר אותם
+    for category in goals:
+        expected = sum(q for name, q in zip(store.items['name'], store.items['quantity']) if category in name)
+        assert totals.loc[category, 'quantity'] == expected > 0
+    assert totals.loc['סלמון', 'quantity'] == totals.loc['כריך סלמון', 'quantity']
+    assert totals.loc['קפה', 'quantity'] > totals.loc['קפה גדול', 'quantity']
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+import streamlit as st
+from gspread.exceptions import APIError
+
+from fake_gspread import FakeClient, FakeWorksheet, FakeSpreadsheet, FakeSheetsSession
+from google_sheets_connector import REQUIRED_COLUMNS, probe_sheet, read_history
+from sheets_client import HealthProbe, SheetsClient, SheetsRateLimitError, TokenBucket
+from test_sheets_sync import make_rows
+
+
+def make_client(delay=0.0, **kwargs):
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS] + make_rows(0, 30).values.tolist())
+    session = FakeSheetsSession(FakeSpreadsheet([ws]), delay=delay)
+    sleeps = []
+    # מכסה גבוהה - ריקון הדלי אחרי 429 לא מעכב את הבדיקות
+    client = SheetsClient(None, session=session, read_limiter=TokenBucket(6000), sleep=sleeps.append, **kwargs)
+    return client, session, sleeps
+
+
+def test_retries_429_and_5xx_with_backoff():
+    client, session, sleeps = make_client()
+    ws = client.open_by_url(session.URL).worksheet('History')
+
+    session.fail(429, times=2)
+    session.fail(503)
+    df = read_history(ws, ['Order_ID', 'Sale_Price'])
+    assert df['Order_ID'].tolist() == [str(i) for i in range(30)]
+
+    metrics = client.metrics
+    assert metrics['retries'] == 3 and metrics['rate_limited'] == 2 and metrics['errors'] == 0
+    # backoff מעריכי: כל המתנה בין חצי למלוא 1, 2, 4 שניות
+    assert len(sleeps) == 3 and all(limit / 2 <= slept <= limit for slept, limit in zip(sleeps, [1, 2, 4]))
+    assert metrics['bytes_received'] > 0 and metrics['calls'] == len(session.requests)
+
+
+def test_exhausted_retries_surface_rate_limit():
+    client, session, sleeps = make_client(max_retries=2)
+    ws = client.open_by_url(session.URL).worksheet('History')
+
+    session.fail(429, times=3, retry_after=7)
+    with pytest.raises(SheetsRateLimitError):
+        ws.row_values(1)
+    assert sleeps == [7, 7]
+
+    # שגיאה שאינה זמנית לא נשלחת שוב
+    session.fail(400)
+    with pytest.raises(APIError) as info:
+        ws.row_values(1)
+    assert not isinstance(info.value, SheetsRateLimitError)
+    assert client.metrics['retries'] == 2 and client.metrics['errors'] == 2
+
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(60, capacity=2, clock=lambda: now[0], sleep=sleep)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(1.0)
+
+    now[0] += 5
+    bucket.drain()
+    assert bucket.acquire() == pytest.approx(1.0) and len(sleeps) == 2
+
+
+def test_concurrent_identical_reads_are_coalesced():
+    client, session, _ = make_client(delay=0.2)
+    ws = client.open_by_url(session.URL).worksheet('History')
+    session.requests.clear()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ws.batch_get(['A1:A5', 'C1:C5'])))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(session.requests) == 1 and client.metrics['coalesced'] == 3
+    assert all(result == results[0] for result in results)
+
+
+def test_quota_headroom_tracks_requests():
+    client, session, _ = make_client(write_limiter=TokenBucket(60))
+    ws = client.open_by_url(session.URL).worksheet('History')
+    headroom = client.quota_headroom()
+
+    ws.get('A1')
+    ws.append_rows([['x']])
+    after = client.quota_headroom()
+    assert after['write'] == headroom['write'] - 1 and after['write_per_minute'] == 60
+    assert after['read'] < headroom['read']
+
+
+def test_health_probe_serves_last_result_and_refreshes_in_background():
+    now = [0.0]
+    calls = []
+    release = threading.Event()
+
+    def probe():
+        calls.append(now[0])
+        if len(calls) > 1:
+            release.wait(5)
+        return {'can_read': True, 'latency_ms': len(calls)}
+
+    health = HealthProbe(probe, ttl=30, clock=lambda: now[0])
+    assert health.get()['latency_ms'] == 1
+    now[0] = 10
+    assert health.get()['latency_ms'] == 1 and len(calls) == 1 and health.age == 10
+
+    # ישנה - התוצאה הקודמת מוחזרת מיד ורענון אחד רץ ברקע
+    now[0] = 40
+    assert health.get()['latency_ms'] == 1 and health.get()['latency_ms'] == 1
+    release.set()
+    for _ in range(100):
+        if health.result['latency_ms'] == 2:
+            break
+        time.sleep(0.01)
+    assert health.get()['latency_ms'] == 2 and len(calls) == 2 and health.age == 0
+
+
+def test_probe_reports_failures_without_streamlit_calls(monkeypatch):
+    shown = []
+    for name in ('error', 'warning', 'info'):
+        monkeypatch.setattr(st, name, lambda *args, **kwargs: shown.append(args))
+
+    class BrokenClient:
+        def open_by_url(self, url):
+            raise ConnectionError('network down')
+
+    results = []
+    worksheets = {}
+    probe = threading.Thread(target=lambda: results.append(probe_sheet(BrokenClient(), 'url', 'History', worksheets)))
+    probe.start()
+    probe.join()
+    assert results[0]['error'] == 'network down' and not results[0]['can_read']
+    assert shown == [] and worksheets == {}
+
+    # אחרי כישלון הבדיקה הבאה פותחת שוב; worksheet שנפתח נשמר לבדיקות הבאות
+    client = FakeClient(FakeSpreadsheet([FakeWorksheet(rows=[REQUIRED_COLUMNS])]))
+    assert probe_sheet(client, 'url', 'History', worksheets)['can_read']
+    assert probe_sheet(client, 'url', 'Missing')['error'] and shown == []
+    assert probe_sheet(client, None)['error'] and 'History' in worksheets
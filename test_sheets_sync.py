@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from fake_gspread import FakeWorksheet, FakeSpreadsheet
+from google_sheets_connector import (
+    REQUIRED_COLUMNS,
+    TRANSACTION_MODEL_COLUMNS,
+    append_new_rows,
+    cloud_data_to_store,
+    legacy_transaction_ids,
+    transactions_to_flat_df,
+    delete_rows_by_id,
+    read_history,
+    load_sync_manifest,
+    SheetMirror
+)
+from html_to_excel import parse_html_transactions
+
+
+def make_rows(start, count):
+    rows = []
+    for i in range(start, start + count):
+        row = {col: '' for col in REQUIRED_COLUMNS}
+        row.update({'Transaction_ID': f'id-{i}', 'Date': '01/12/2025', 'Order_ID': str(i), 'Sale_Price': 10.0})
+        rows.append(row)
+    return pd.DataFrame(rows, columns=REQUIRED_COLUMNS)
+
+
+def test_incremental_sync_reads_only_rows_past_watermark(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+
+    assert append_new_rows(ws, make_rows(0, 300), 'sheet', manifest_path) == 300
+    assert load_sync_manifest(manifest_path)['sheet']['last_row'] == 301
+
+    ws.calls.clear()
+    ws.cells_read = 0
+    # חפיפה חלקית - רק 50 שורות חדשות
+    assert append_new_rows(ws, make_rows(250, 100), 'sheet', manifest_path) == 50
+
+    assert 'col_values' not in ws.calls and 'get_all_records' not in ws.calls
+    assert ws.cells_read == 1  # רק תא ה-watermark
+    assert len(ws.get_all_values()) == 351
+
+
+def test_rows_appended_by_another_client_are_not_duplicated(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    append_new_rows(ws, make_rows(0, 10), 'sheet', manifest_path)
+
+    # לקוח אחר הוסיף שורות אחרי ה-watermark
+    ws.append_rows(make_rows(10, 5).values.tolist())
+
+    assert append_new_rows(ws, make_rows(0, 20), 'sheet', manifest_path) == 5
+    ids = [row[0] for row in ws.get_all_values()[1:]]
+    assert len(ids) == len(set(ids)) == 20
+
+
+def test_stale_watermark_falls_back_to_full_id_read(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    append_new_rows(ws, make_rows(0, 10), 'sheet', manifest_path)
+
+    # מחיקה מחוץ לאפליקציה - השורה ב-watermark כבר לא מכילה את ה-ID הצפוי
+    ws.delete_rows(2, 4)
+    ws.calls.clear()
+
+    assert append_new_rows(ws, make_rows(0, 10), 'sheet', manifest_path) == 3
+    assert 'col_values' in ws.calls
+    assert len(ws.get_all_values()) == 11
+
+
+def test_batch_delete_coalesces_ranges_into_one_call():
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    spreadsheet = FakeSpreadsheet([ws])
+    ws.append_rows(make_rows(0, 500).values.tolist())
+    doomed = [f'id-{i}' for i in list(range(10, 310)) + list(range(400, 405))] + ['id-missing']
+
+    report = delete_rows_by_id(ws, doomed, dry_run=True)
+    assert report['rows'] == 305 and report['ranges'] == [(12, 311), (402, 406)]
+    assert report['missing_ids'] == ['id-missing']
+    assert spreadsheet.calls == [] and len(ws.get_all_values()) == 501
+
+    report = delete_rows_by_id(ws, doomed)
+    assert spreadsheet.calls == ['batch_update'] and 'delete_rows' not in ws.calls
+    remaining = [row[0] for row in ws.get_all_values()[1:]]
+    assert len(remaining) == 195 and not set(remaining) & set(doomed)
+
+
+def test_read_history_projects_columns_and_types():
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    rows = make_rows(0, 40)
+    rows['Date'] = [f'{day:02d}/12/2025' for day in range(1, 21)] * 2
+    rows['Item_Name'] = 'סקונס'
+    rows['Sale_Price'] = '1,250.50'
+    ws.append_rows(rows.values.tolist())
+    ws.cells_read = 0
+
+    df = read_history(ws, ['Date', 'Item_Name', 'Sale_Price'])
+
+    assert list(df.columns) == ['Date', 'Item_Name', 'Sale_Price'] and len(df) == 40
+    assert str(df['Item_Name'].dtype) == 'category'
+    assert df['Sale_Price'].dtype == 'float64' and df['Sale_Price'].iloc[0] == 1250.5
+    assert str(df['Date'].dtype).startswith('datetime64')
+    # שורת הכותרות + שלוש עמודות
+    assert ws.cells_read == len(REQUIRED_COLUMNS) + 3 * 40
+
+
+def test_read_history_date_range():
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    rows = make_rows(0, 31)
+    rows['Date'] = [f'{day:02d}/12/2025' for day in range(1, 32)]
+    ws.append_rows(rows.values.tolist())
+    ws.cells_read = 0
+
+    df = read_history(ws, ['Order_ID', 'Sale_Price'], start_date='2025-12-10', end_date='2025-12-12')
+
+    assert df['Order_ID'].tolist() == ['9', '10', '11']
+    # שורת הכותרות, עמודת התאריך כולה ושתי עמודות רק בטווח
+    assert ws.cells_read == len(REQUIRED_COLUMNS) + 31 + 2 * 3
+
+
+def test_cloud_rows_rebuild_store():
+    with open('example_report.html', 'r', encoding='utf-8') as f:
+        transactions = parse_html_transactions(f.read())
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    ws.append_rows(transactions_to_flat_df(transactions)[REQUIRED_COLUMNS].astype(str).values.tolist())
+
+    store = cloud_data_to_store(read_history(ws, TRANSACTION_MODEL_COLUMNS))
+
+    by_order = sorted(transactions, key=lambda t: t['order_id'])
+    assert store.transactions['order_id'].tolist() == [t['order_id'] for t in by_order]
+    assert np.allclose(store.transactions['total'], [sum(i['total_price'] for i in t['items']) for t in by_order])
+    assert store.item_counts().tolist() == [len(t['items']) for t in by_order]
+    assert store.dates().tolist() == [t['date'] for t in by_order]
+    assert store.payments['amount'].tolist() == store.transactions['total'].tolist()
+
+
+def order_with_repeated_item():
+    with open('example_report.html', 'r', encoding='utf-8') as f:
+        order = parse_html_transactions(f.read())[1]
+    order['items'] = order['items'] + [dict(order['items'][0])]
+    return order
+
+
+def test_repeated_item_lines_get_distinct_ids():
+    flat = transactions_to_flat_df([order_with_repeated_item()])
+
+    assert flat['Transaction_ID'].is_unique
+    assert flat['Z_Number'].iloc[0] == '1286'
+
+
+def test_legacy_sheet_gets_missing_lines_only():
+    flat = transactions_to_flat_df([order_with_repeated_item()])
+    # גיליון ישן: בלי Z_Number, מזהים בפורמט הישן, והשורה החוזרת "נבלעה" כפילות
+    legacy = flat.drop(columns='Z_Number').assign(Transaction_ID=legacy_transaction_ids(flat))
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS[:-1]])
+    ws.append_rows(legacy.iloc[:-1].astype(str).values.tolist())
+
+    assert append_new_rows(ws, flat) == 1
+    assert ws.row_values(1) == REQUIRED_COLUMNS
+    assert append_new_rows(ws, flat) == 0
+    assert len(ws.get_all_values()) == len(flat) + 1
+
+
+def test_mirror_fetches_only_appended_rows(tmp_path):
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    rows = make_rows(0, 60)
+    rows['Date'] = [f'{day:02d}/12/2025' for day in range(1, 31)] * 2
+    ws.append_rows(rows.values.tolist())
+
+    mirror = SheetMirror(str(tmp_path))
+    assert mirror.read('sheet') is None
+    assert len(mirror.refresh(ws, 'sheet')) == 60
+
+    ws.append_rows(make_rows(60, 5).values.tolist())
+    ws.cells_read = 0
+    delta = mirror.refresh(ws, 'sheet')
+    assert delta['Transaction_ID'].tolist() == [f'id-{i}' for i in range(60, 65)]
+    # שורת הכותרות, ואז שורת ה-checksum וחמש השורות החדשות - ארבעה תאים לא ריקים בכל שורה
+    assert ws.cells_read == len(REQUIRED_COLUMNS) + 6 * 4
+    assert mirror.refresh(ws, 'sheet').empty
+    assert mirror.entry('sheet')['rows'] == 65 and mirror.entry('sheet')['last_row'] == 66
+
+    # הפעלה קרה - עותק חדש באותה תיקייה קורא מהדיסק, עם אותם סוגים כמו read_history
+    df = SheetMirror(str(tmp_path)).read('sheet', ['Date', 'Order_ID', 'Sale_Price'],
+                                         start_date='2025-12-10', end_date='2025-12-11')
+    expected = read_history(ws, ['Date', 'Order_ID', 'Sale_Price'], start_date='2025-12-10', end_date='2025-12-11')
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    assert df['Sale_Price'].dtype == 'float64' and str(df['Date'].dtype).startswith('datetime64')
+
+
+def test_mirror_reloads_after_rows_change(tmp_path):
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    ws.append_rows(make_rows(0, 20).values.tolist())
+    mirror = SheetMirror(str(tmp_path))
+    mirror.refresh(ws, 'sheet')
+
+    # מחיקת שורות - השורה ב-watermark כבר לא תואמת ל-checksum
+    ws.delete_rows(2, 4)
+    assert len(mirror.refresh(ws, 'sheet')) == 17
+    assert mirror.read('sheet', ['Order_ID'])['Order_ID'].tolist() == [str(i) for i in range(3, 20)]
+
+    # עריכת השורה האחרונה
+    ws.update(range_name='D18', values=[['edited']])
+    assert mirror.refresh(ws, 'sheet')['Order_ID'].iloc[-1] == 'edited'
+
+    # עותק פגום
+    with open(mirror._data_path('sheet'), 'wb') as f:
+        f.write(b'broken')
+    assert mirror.read('sheet') is None
+    assert len(mirror.refresh(ws, 'sheet')) == 17
+
+
+def test_mirror_full_resync_picks_up_edits_to_earlier_rows(tmp_path):
+    ws = FakeWorksheet(rows=[REQUIRED_COLUMNS])
+    ws.append_rows(make_rows(0, 10).values.tolist())
+    now = [0.0]
+    mirror = SheetMirror(str(tmp_path), full_resync_interval=3600, clock=lambda: now[0])
+    mirror.refresh(ws, 'sheet')
+
+    # עריכה של שורה 2 - מתחת ל-last_row, ולכן הרענון ההדרגתי לא רואה אותה (המגבלה המתועדת)
+    price_col = REQUIRED_COLUMNS.index('Sale_Price')
+    ws._rows[1][price_col] = '999'
+    now[0] = 60
+    assert mirror.refresh(ws, 'sheet').empty
+    assert mirror.read('sheet', ['Sale_Price'])['Sale_Price'].iloc[0] != 999
+
+    # אחרי full_resync_interval - קריאה מלאה שמחזירה את כל השורות, כולל העריכה
+    now[0] = 3600
+    delta = mirror.refresh(ws, 'sheet')
+    assert len(delta) == 10 and delta['Sale_Price'].iloc[0] == 999
+    assert mirror.read('sheet', ['Sale_Price'])['Sale_Price'].iloc[0] == 999
+    assert mirror.entry('sheet')['full_read_at'] == 3600 and mirror.refresh(ws, 'sheet').empty
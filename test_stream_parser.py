@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import io
+
+from html_to_excel import (
+    parse_html_transactions,
+    iter_html_transactions,
+    parse_many,
+    create_daily_summary,
+    create_items_summary_df,
+    _iter_stream_transactions
+)
+
+
+def load_example():
+    with open('example_report.html', 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_stream_engine_matches_soup():
+    html_content = load_example()
+    expected = parse_html_transactions(html_content)
+
+    assert len(expected) > 0
+    assert parse_html_transactions(html_content, engine='stream') == expected
+
+
+def test_stream_engine_handles_arbitrary_chunk_boundaries():
+    html_content = load_example()
+    expected = parse_html_transactions(html_content)
+
+    chunks = [html_content[i:i + 777] for i in range(0, len(html_content), 777)]
+    assert list(_iter_stream_transactions(chunks)) == expected
+
+
+def test_iter_html_transactions_sources():
+    html_content = load_example()
+    expected = parse_html_transactions(html_content)
+    raw = html_content.encode('utf-8')
+
+    assert list(iter_html_transactions('example_report.html')) == expected
+    assert list(iter_html_transactions(raw)) == expected
+    # chunk קטן ואי-זוגי חותך תווים עבריים באמצע
+    assert list(iter_html_transactions(io.BytesIO(raw), chunk_size=101)) == expected
+
+
+def test_aggregators_consume_generator():
+    expected = parse_html_transactions(load_example())
+
+    daily_df = create_daily_summary(iter_html_transactions('example_report.html'))
+    items_df = create_items_summary_df(iter_html_transactions('example_report.html'))
+
+    assert daily_df.equals(create_daily_summary(expected))
+    assert items_df.equals(create_items_summary_df(expected))
+    assert list(create_daily_summary(iter([])).columns) == ['date', 'total_sales', 'transaction_count', 'items_count']
+
+
+def test_parse_many_merges_in_order_and_reports_errors():
+    expected = parse_html_transactions(load_example())
+
+    # chunk_bytes קטן מפצל את הקובץ לכמה חלקים
+    transactions, errors = parse_many(
+        ['example_report.html', b'\xff not utf-8', 'example_report.html'],
+        workers=2, chunk_bytes=20000
+    )
+
+    assert transactions == expected + expected
+    assert len(errors) == 1 and errors[0][0] == 'file 2'
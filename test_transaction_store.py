@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from html_to_excel import (
+    parse_html_transactions,
+    create_daily_summary,
+    create_detailed_transactions_df,
+    create_items_summary_df,
+    create_items_detail_df
+)
+from transaction_store import TransactionStore
+
+
+def load_transactions():
+    with open('example_report.html', 'r', encoding='utf-8') as f:
+        return parse_html_transactions(f.read())
+
+
+def assert_same_frame(left, right):
+    pd.testing.assert_frame_equal(left.reset_index(drop=True), right.reset_index(drop=True), check_dtype=False)
+
+
+def test_round_trip():
+    transactions = load_transactions()
+    assert TransactionStore.from_transactions(transactions).to_transactions() == transactions
+
+
+def reference_daily_summary(transactions):
+    """סיכום יומי בלולאה פשוטה על רשימת המילונים - מול המימוש הוקטורי"""
+    daily = {}
+    for t in transactions:
+        row = daily.setdefault(t['date'], {'date': t['date'], 'total_sales': 0, 'transaction_count': 0,
+                                           'items_count': 0, 'total_vat': 0})
+        row['total_sales'] += t['total']
+        row['transaction_count'] += 1
+        row['items_count'] += len(t['items'])
+        row['total_vat'] += t.get('total_vat', 0)
+    return pd.DataFrame(list(daily.values())).sort_values('date')
+
+
+def reference_items_summary(transactions):
+    """סיכום פריטים בלולאה פשוטה; transaction_count - מספר העסקאות השונות שבהן הפריט הופיע"""
+    items = {}
+    for tx, t in enumerate(transactions):
+        for item in t['items']:
+            row = items.setdefault(item['name'], {'item_name': item['name'], 'item_code': item.get('code', ''),
+                                                  'quantity': 0, 'total_amount': 0, 'total_vat': 0, 'txs': set()})
+            row['quantity'] += item['quantity']
+            row['total_amount'] += item['total_price']
+            row['total_vat'] += item.get('vat_amount', 0)
+            row['txs'].add(tx)
+    for row in items.values():
+        row['transaction_count'] = len(row.pop('txs'))
+        row['avg_unit_price'] = row['total_amount'] / row['quantity'] if row['quantity'] > 0 else 0
+    return pd.DataFrame(list(items.values())).sort_values('item_name')
+
+
+def test_vectorized_frames_match_list_implementation():
+    transactions = load_transactions()
+    store = TransactionStore.from_transactions(transactions)
+
+    assert_same_frame(create_daily_summary(store), reference_daily_summary(transactions))
+    assert_same_frame(create_detailed_transactions_df(store), create_detailed_transactions_df(transactions))
+    assert_same_frame(create_items_detail_df(store), create_items_detail_df(transactions))
+    assert_same_frame(create_items_summary_df(store).sort_values('item_name'), reference_items_summary(transactions))
+
+
+def test_items_summary_counts_distinct_transactions():
+    transactions = load_transactions()[:2]
+    # אותו פריט פעמיים באותה עסקה
+    transactions[0]['items'] = transactions[0]['items'] + [dict(transactions[0]['items'][0])]
+    name = transactions[0]['items'][0]['name']
+
+    items_df = create_items_summary_df(transactions).set_index('item_name')
+    expected = sum(1 for t in transactions if any(item['name'] == name for item in t['items']))
+
+    assert items_df.loc[name, 'transaction_count'] == expected
+
+
+def test_take_renumbers_transactions():
+    transactions = load_transactions()
+    store = TransactionStore.from_transactions(transactions)
+    positions = [5, 0, 3]
+
+    assert store.take(positions).to_transactions() == [transactions[i] for i in positions]
+
+
+def test_fingerprint_tracks_content():
+    transactions = load_transactions()
+    store = TransactionStore.from_transactions(transactions)
+
+    assert store.fingerprint == TransactionStore.from_transactions(load_transactions()).fingerprint
+    assert store.take([0, 1]).fingerprint == store.take([0, 1]).fingerprint
+    assert store.take([0, 1]).fingerprint != store.take([1, 0]).fingerprint
+
+    transactions[3]['total'] += 1
+    assert TransactionStore.from_transactions(transactions).fingerprint != store.fingerprint
+
+
+def test_date_slices_match_filtered_list():
+    import datetime
+
+    transactions = load_transactions()
+    for i, t in enumerate(transactions):
+        t['date'] = datetime.date(2025, 11 + i % 2, 1 + (i * 7) % 28)
+    store = TransactionStore.from_transactions(transactions).sort_by_date()
+    ordered = store.to_transactions()
+    start, end = datetime.date(2025, 11, 15), datetime.date(2025, 12, 8)
+
+    assert store.date_slice(start, end).to_transactions() == [t for t in ordered if start <= t['date'] <= end]
+    assert store.months() == [(2025, 11), (2025, 12)]
+    lo, hi = store.month_bounds(2025, 12)
+    assert ordered[lo:hi] == [t for t in ordered if t['date'].month == 12]
+
+
+def test_date_sortedness_is_checked_once():
+    import datetime
+
+    transactions = load_transactions()
+    for i, t in enumerate(transactions):
+        t['date'] = datetime.date(2025, 12, 28 - i % 28)
+    unsorted = TransactionStore.from_transactions(transactions)
+    with pytest.raises(ValueError):
+        unsorted.date_bounds(datetime.date(2025, 12, 1), datetime.date(2025, 12, 31))
+
+    store = unsorted.sort_by_date()
+    checks = []
+    store.day_index = lambda days=store.day_index(): checks.append(1) or days
+    sliced = store.date_slice(datetime.date(2025, 12, 5), datetime.date(2025, 12, 20))
+    store.date_bounds(datetime.date(2025, 12, 1), datetime.date(2025, 12, 31))
+    # רק חיפוש בינארי - בלי מעבר נוסף לבדיקת המיון, גם לא בחיתוך
+    assert len(checks) == 2 and sliced.is_date_sorted()
+
+
+def test_time_profile_matches_groupby():
+    import datetime
+
+    transactions = load_transactions()
+    for i, t in enumerate(transactions):
+        t['date'] = datetime.date(2025, 12, 1 + i % 5)
+    store = TransactionStore.from_transactions(transactions)
+    # שורה לכל עסקה: שעה, יום בשבוע (ראשון=0) והכנסה - ישירות מהמילונים
+    hourly_df = pd.DataFrame({
+        'hour': [t['time'].hour if t.get('time') else 0 for t in transactions],
+        'day_num': [(t['date'].weekday() + 1) % 7 for t in transactions],
+        'revenue': [t['total'] for t in transactions]
+    })
+
+    profile = store.time_profile(60)
+    by_hour = hourly_df.groupby('hour')['revenue'].agg(['sum', 'count'])
+    assert profile['buckets']['label'].tolist() == [f'{h:02d}:00' for h in by_hour.index]
+    assert profile['buckets']['revenue'].round(6).tolist() == by_hour['sum'].round(6).tolist()
+    assert profile['buckets']['transactions'].tolist() == by_hour['count'].tolist()
+
+    by_day = hourly_df.groupby('day_num')['revenue'].sum()
+    assert profile['weekdays']['day_num'].tolist() == by_day.index.tolist()
+    assert profile['heatmap'].sum(axis=1).round(6).tolist() == by_day.round(6).tolist()
+
+    timestamps = store.transactions['timestamp']
+    half_hours = (timestamps.dt.hour * 60 + timestamps.dt.minute) // 30 * 30
+    expected = store.transactions['total'].groupby(half_hours.to_numpy()).sum()
+    buckets = store.time_profile(30)['buckets']
+    assert buckets['start_minute'].tolist() == expected.index.tolist()
+    assert buckets['revenue'].round(6).tolist() == expected.round(6).tolist()
@@ -0,0 +1,475 @@
+"""
+Transaction Store Module - אחסון עמודתי של טרנזקציות
+
+במקום רשימת מילונים עם רשימות items/payments מקוננות, הנתונים נשמרים בשלוש טבלאות:
+- transactions: שורה לכל עסקה
+- items: שורה לכל פריט שנמכר, עמודת tx מצביעה על מיקום העסקה ב-transactions
+- payments: שורה לכל אמצעי תשלום, גם כן עם עמודת tx
+
+כל הסיכומים מחושבים בפעולות וקטוריות על הטבלאות, בלי לולאות Python על העסקאות.
+
+store שממוין לפי תאריך (sort_by_date) מחזיק אינדקס ימים, כך שחיתוך לטווח תאריכים, שבוע או חודש
+הוא חיפוש בינארי וחיתוך רציף של הטבלאות - בלי מעבר על כל ההיסטוריה.
+
+לכל store יש fingerprint - תקציר יציב של התוכן (לא hash() של Python, שמשתנה בין תהליכים),
+שמחושב פעם אחת ומשמש כמפתח לכל ה-caches של הסיכומים.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+TRANSACTION_COLUMNS = [
+    'order_id', 'invoice_num', 'transaction_type', 'z_number', 'register',
+    'customer_name', 'customer_code'
+]
+TRANSACTION_NUMERIC_COLUMNS = ['total_items', 'total_vat', 'total']
+ITEM_COLUMNS = ['name', 'code', 'cashier']
+ITEM_NUMERIC_COLUMNS = ['quantity', 'unit_price', 'taxable_amount', 'total_price', 'vat_amount']
+PAYMENT_COLUMNS = ['method', 'amount', 'approval', 'reference']
+
+DAY_NAMES_HEB = {
+    6: 'ראשון', 0: 'שני', 1: 'שלישי', 2: 'רביעי',
+    3: 'חמישי', 4: 'שישי', 5: 'שבת'
+}
+
+
+def transaction_key(z_number, register, order_id) -> str:
+    """
+    מפתח עסקה קנוני: z_number|register|order_id.
+    מספרי הזמנה חוזרים בין דוחות Z ובין קופות, ולכן order_id לבדו אינו מזהה
+    """
+    return f"{z_number or ''}|{register or ''}|{order_id}"
+
+
+def line_key(z_number, register, order_id, line) -> str:
+    """מפתח שורת פריט קנוני - מפתח העסקה ומיקום הפריט בעסקה"""
+    return f"{transaction_key(z_number, register, order_id)}|{line}"
+
+
+def combine_fingerprints(*parts) -> str:
+    """תקציר יציב של רצף חלקים (מחרוזות, bytes או מערכי numpy)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part).tobytes()
+        elif not isinstance(part, bytes):
+            part = str(part).encode('utf-8')
+        digest.update(len(part).to_bytes(8, 'little'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """תקציר תוכן של DataFrame - שמות העמודות וה-hash הוקטורי של כל השורות"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return combine_fingerprints('|'.join(map(str, df.columns)), row_hashes)
+
+
+class TransactionStore:
+    """
+    שלוש טבלאות עמודתיות המקושרות באינדקס עסקה שלם (tx)
+
+    Args:
+        transactions: DataFrame עם TRANSACTION_COLUMNS, TRANSACTION_NUMERIC_COLUMNS ו-timestamp
+        items: DataFrame עם tx, ITEM_COLUMNS ו-ITEM_NUMERIC_COLUMNS
+        payments: DataFrame עם tx ו-PAYMENT_COLUMNS
+        fingerprint: תקציר ידוע מראש; אם לא ניתן - מחושב מהתוכן בגישה הראשונה
+    """
+
+    def __init__(self, transactions, items, payments, fingerprint=None):
+        self.transactions = transactions.reset_index(drop=True)
+        self.items = items.reset_index(drop=True)
+        self.payments = payments.reset_index(drop=True)
+        self._fingerprint = fingerprint
+        self._days = None
+        self._date_sorted = None
+
+    @property
+    def fingerprint(self) -> str:
+        """תקציר יציב של תוכן ה-store - מחושב פעם אחת"""
+        if self._fingerprint is None:
+            self._fingerprint = combine_fingerprints(
+                frame_fingerprint(self.transactions),
+                frame_fingerprint(self.items),
+                frame_fingerprint(self.payments)
+            )
+        return self._fingerprint
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        """
+        בניית store מרשימת טרנזקציות (או כל iterable, למשל iter_html_transactions)
+        """
+        tx_records = {col: [] for col in TRANSACTION_COLUMNS + TRANSACTION_NUMERIC_COLUMNS + ['timestamp']}
+        item_records = {col: [] for col in ['tx'] + ITEM_COLUMNS + ITEM_NUMERIC_COLUMNS}
+        payment_records = {col: [] for col in ['tx'] + PAYMENT_COLUMNS}
+
+        for tx, trans in enumerate(transactions):
+            for col in TRANSACTION_COLUMNS:
+                tx_records[col].append(trans.get(col, ''))
+            for col in TRANSACTION_NUMERIC_COLUMNS:
+                tx_records[col].append(trans.get(col, 0))
+            tx_records['timestamp'].append(
+                pd.Timestamp.combine(trans['date'], trans['time']) if trans.get('time')
+                else pd.Timestamp(trans['date'])
+            )
+
+            for item in trans['items']:
+                item_records['tx'].append(tx)
+                for col in ITEM_COLUMNS:
+                    item_records[col].append(item.get(col, ''))
+                for col in ITEM_NUMERIC_COLUMNS:
+                    item_records[col].append(item.get(col, 0))
+
+            for payment in trans.get('payments', []):
+                payment_records['tx'].append(tx)
+                for col in PAYMENT_COLUMNS:
+                    payment_records[col].append(payment.get(col))
+
+        tx_df = pd.DataFrame(tx_records)
+        tx_df['timestamp'] = pd.to_datetime(tx_df['timestamp'])
+        tx_df = tx_df.astype({col: 'float64' for col in TRANSACTION_NUMERIC_COLUMNS})
+        items_df = pd.DataFrame(item_records).astype(
+            {'tx': 'int64', **{col: 'float64' for col in ITEM_NUMERIC_COLUMNS}})
+        payments_df = pd.DataFrame(payment_records).astype({'tx': 'int64', 'amount': 'float64'})
+        return cls(tx_df, items_df, payments_df)
+
+    def to_transactions(self):
+        """המרה חזרה לרשימת מילונים במבנה של parse_single_block"""
+        header_columns = TRANSACTION_COLUMNS + TRANSACTION_NUMERIC_COLUMNS
+        transactions = []
+        for values in zip(*(self.transactions[col].tolist() for col in header_columns),
+                          self.transactions['timestamp'].tolist()):
+            trans = dict(zip(header_columns, values[:-1]))
+            trans['date'] = values[-1].date()
+            trans['time'] = values[-1].time()
+            trans['items'] = []
+            trans['payments'] = []
+            transactions.append(trans)
+
+        item_columns = ITEM_COLUMNS + ITEM_NUMERIC_COLUMNS
+        for values in zip(self.items['tx'].tolist(), *(self.items[col].tolist() for col in item_columns)):
+            transactions[values[0]]['items'].append(dict(zip(item_columns, values[1:])))
+
+        for values in zip(self.payments['tx'].tolist(), *(self.payments[col].tolist() for col in PAYMENT_COLUMNS)):
+            # שדות תשלום שלא הופיעו ב-HTML לא נשמרים במילון המקורי
+            payment = {col: value for col, value in zip(PAYMENT_COLUMNS, values[1:])
+                       if value is not None and not (isinstance(value, float) and value != value)}
+            transactions[values[0]]['payments'].append(payment)
+
+        return transactions
+
+    @classmethod
+    def concat(cls, stores):
+        """איחוד כמה stores לפי הסדר - tx של כל store מוסט במספר העסקאות שלפניו"""
+        stores = list(stores)
+        offsets = np.cumsum([0] + [len(store) for store in stores[:-1]])
+
+        def shifted(frames):
+            return pd.concat([frame.assign(tx=frame['tx'].to_numpy() + offset)
+                              for frame, offset in zip(frames, offsets)], ignore_index=True)
+
+        return cls(
+            pd.concat([store.transactions for store in stores], ignore_index=True),
+            shifted(store.items for store in stores),
+            shifted(store.payments for store in stores)
+        )
+
+    def __len__(self):
+        return len(self.transactions)
+
+    def transaction_keys(self):
+        """מפתח קנוני לכל עסקה (ראה transaction_key) כמערך מחרוזות"""
+        tx = self.transactions
+        return (tx['z_number'].fillna('').astype(str) + '|' + tx['register'].fillna('').astype(str)
+                + '|' + tx['order_id'].astype(str)).to_numpy(dtype=object)
+
+    def transaction_hashes(self):
+        """
+        hash של 64 ביט לכל עסקה - כותרת, פריטים ותשלומים.
+        הפריטים והתשלומים נסכמים (מודולו 2^64), כך שה-hash לא תלוי בסדר שלהם בתוך העסקה
+        """
+        hashes = pd.util.hash_pandas_object(self.transactions, index=False).to_numpy().copy()
+        for table, salt in ((self.items, 0x9E3779B97F4A7C15), (self.payments, 0xC2B2AE3D27D4EB4F)):
+            if table.empty:
+                continue
+            rows = pd.util.hash_pandas_object(table.drop(columns='tx'), index=False).to_numpy()
+            sums = np.zeros(len(self.transactions), dtype=np.uint64)
+            np.add.at(sums, table['tx'].to_numpy(), rows)
+            hashes += sums * np.uint64(salt)
+        return hashes
+
+    def take(self, positions, fingerprint=None):
+        """
+        store חדש עם העסקאות במיקומים הנתונים (מערך מיקומים או מסכה בוליאנית),
+        כש-tx ממוספר מחדש לפי הסדר החדש.
+        ה-fingerprint של התוצאה נגזר מזה של ה-store והמיקומים, אלא אם ניתן במפורש
+        """
+        positions = np.asarray(positions)
+        if positions.dtype == bool:
+            positions = np.flatnonzero(positions)
+        positions = positions.astype(np.int64, copy=False)
+        if fingerprint is None:
+            fingerprint = combine_fingerprints(self.fingerprint, positions)
+
+        remap = np.full(len(self.transactions), -1, dtype=np.int64)
+        remap[positions] = np.arange(len(positions))
+
+        items = self.items[remap[self.items['tx'].to_numpy()] >= 0].copy()
+        items['tx'] = remap[items['tx'].to_numpy()]
+        payments = self.payments[remap[self.payments['tx'].to_numpy()] >= 0].copy()
+        payments['tx'] = remap[payments['tx'].to_numpy()]
+
+        return TransactionStore(
+            self.transactions.iloc[positions],
+            items.sort_values('tx', kind='stable'),
+            payments.sort_values('tx', kind='stable'),
+            fingerprint=fingerprint
+        )
+
+    def slice_rows(self, lo, hi, fingerprint=None):
+        """
+        store חדש עם העסקאות lo עד hi (לא כולל) - חיתוך רציף של הטבלאות, בלי מסכה ובלי מיון.
+        פריטים ותשלומים ממוינים לפי tx, ולכן גם הטווח שלהם נמצא בחיפוש בינארי
+        """
+        lo = max(0, min(int(lo), len(self.transactions)))
+        hi = max(lo, min(int(hi), len(self.transactions)))
+        if fingerprint is None:
+            fingerprint = combine_fingerprints(self.fingerprint, 'rows', lo, hi)
+
+        def tx_range(df):
+            start, stop = np.searchsorted(df['tx'].to_numpy(), [lo, hi])
+            part = df.iloc[start:stop]
+            return part.assign(tx=part['tx'].to_numpy() - lo) if lo else part
+
+        sliced = TransactionStore(
+            self.transactions.iloc[lo:hi], tx_range(self.items), tx_range(self.payments),
+            fingerprint=fingerprint
+        )
+        if self._days is not None:
+            sliced._days = self._days[lo:hi]
+        if self._date_sorted:
+            sliced._date_sorted = True
+        return sliced
+
+    # ------------------------------------------------------------
+    # אינדקס תאריכים
+    # ------------------------------------------------------------
+
+    def day_index(self):
+        """היום של כל עסקה כמערך datetime64[D] - מחושב פעם אחת"""
+        if self._days is None:
+            self._days = self.transactions['timestamp'].to_numpy().astype('datetime64[D]')
+        return self._days
+
+    def date_order(self):
+        """מיקומי העסקאות בסדר כרונולוגי; עסקאות באותו זמן ממוינות לפי order_id"""
+        keys = pd.DataFrame({
+            'timestamp': self.transactions['timestamp'].to_numpy(),
+            'order_id': self.transactions['order_id'].astype(str).to_numpy()
+        })
+        return keys.sort_values(['timestamp', 'order_id'], kind='stable').index.to_numpy()
+
+    def is_date_sorted(self):
+        """האם העסקאות ממוינות לפי יום - נבדק פעם אחת ונשמר (הטבלאות לא משתנות אחרי הבנייה)"""
+        if self._date_sorted is None:
+            days = self.day_index()
+            self._date_sorted = bool(np.all(days[1:] >= days[:-1]))
+        return self._date_sorted
+
+    def sort_by_date(self):
+        """store ממוין לפי זמן העסקה - תנאי מוקדם ל-date_bounds ו-date_slice"""
+        if self.is_date_sorted():
+            return self
+        sorted_store = self.take(self.date_order())
+        sorted_store._date_sorted = True
+        return sorted_store
+
+    def date_bounds(self, start_date, end_date):
+        """
+        טווח המיקומים [lo, hi) של העסקאות בין start_date ל-end_date (כולל) - חיפוש בינארי.
+        דורש store ממוין לפי תאריך
+        """
+        if not self.is_date_sorted():
+            raise ValueError("TransactionStore is not sorted by date - call sort_by_date() first")
+        days = self.day_index()
+        lo = np.searchsorted(days, pd.Timestamp(start_date).to_datetime64().astype('datetime64[D]'), side='left')
+        hi = np.searchsorted(days, pd.Timestamp(end_date).to_datetime64().astype('datetime64[D]'), side='right')
+        return int(lo), int(hi)
+
+    def date_slice(self, start_date, end_date):
+        """העסקאות בין start_date ל-end_date (כולל) כחיתוך רציף"""
+        return self.slice_rows(*self.date_bounds(start_date, end_date))
+
+    def month_bounds(self, year, month):
+        """טווח המיקומים של חודש קלנדרי"""
+        start = pd.Timestamp(year=year, month=month, day=1)
+        return self.date_bounds(start, start + pd.offsets.MonthEnd(0))
+
+    def months(self):
+        """החודשים שיש בהם עסקאות כרשימת (year, month) ממוינת"""
+        months = np.unique(self.day_index().astype('datetime64[M]')).astype(np.int64)
+        return [(int(m // 12) + 1970, int(m % 12) + 1) for m in months]
+
+    # ------------------------------------------------------------
+    # עמודות נגזרות
+    # ------------------------------------------------------------
+
+    def dates(self):
+        """תאריכי העסקאות כאובייקטי datetime.date"""
+        return self.transactions['timestamp'].dt.date
+
+    def item_counts(self):
+        """מספר שורות פריט לכל עסקה"""
+        return np.bincount(self.items['tx'].to_numpy(), minlength=len(self.transactions))
+
+    def primary_payment_methods(self):
+        """
+        אמצעי התשלום העיקרי לכל עסקה - התשלום החיובי הגדול ביותר (הראשון מביניהם בשוויון)
+        """
+        methods = np.full(len(self.transactions), '', dtype=object)
+        positive = self.payments[self.payments['amount'] > 0]
+        if not positive.empty:
+            top = positive.sort_values(['tx', 'amount'], ascending=[True, False], kind='stable')
+            top = top.drop_duplicates('tx')
+            methods[top['tx'].to_numpy()] = top['method'].fillna('').to_numpy(dtype=object)
+        return methods
+
+    # ------------------------------------------------------------
+    # סיכומים וקטוריים - מקבילים לפונקציות create_* ב-html_to_excel
+    # ------------------------------------------------------------
+
+    def daily_summary(self):
+        """
+        סיכום יומי - groupby אחד על רמת העסקה; items_count הוא מספר שורות הפריט ביום
+        """
+        if len(self.transactions) == 0:
+            return pd.DataFrame(columns=['date', 'total_sales', 'transaction_count', 'items_count'])
+
+        frame = pd.DataFrame({
+            'date': self.dates(),
+            'total_sales': self.transactions['total'],
+            'items_count': self.item_counts(),
+            'total_vat': self.transactions['total_vat']
+        })
+        daily_df = frame.groupby('date', sort=True).agg(
+            total_sales=('total_sales', 'sum'),
+            transaction_count=('total_sales', 'size'),
+            items_count=('items_count', 'sum'),
+            total_vat=('total_vat', 'sum')
+        ).reset_index()
+        return daily_df
+
+    def detailed_transactions_df(self):
+        """מקביל ל-create_detailed_transactions_df"""
+        if len(self.transactions) == 0:
+            return pd.DataFrame(columns=['Order ID', 'Invoice', 'Date', 'Time', 'Item Count', 'Total Amount'])
+
+        timestamps = self.transactions['timestamp']
+        return pd.DataFrame({
+            'Order ID': self.transactions['order_id'],
+            'Invoice': self.transactions['invoice_num'],
+            'Date': timestamps.dt.date,
+            'Time': timestamps.dt.time,
+            'Register': self.transactions['register'],
+            'Payment Method': self.primary_payment_methods(),
+            'Item Count': self.item_counts(),
+            'Total Items': self.transactions['total_items'],
+            'Total VAT': self.transactions['total_vat'],
+            'Total Amount': self.transactions['total']
+        })
+
+    def items_summary_df(self):
+        """
+        סיכום לפי פריט - groupby אחד על טבלת הפריטים.
+        transaction_count הוא מספר העסקאות השונות שבהן הפריט הופיע
+        """
+        if self.items.empty:
+            return pd.DataFrame(columns=['item_name', 'quantity', 'total_amount', 'transaction_count'])
+
+        items_df = self.items.groupby('name', sort=False).agg(
+            item_code=('code', 'first'),
+            quantity=('quantity', 'sum'),
+            total_amount=('total_price', 'sum'),
+            total_vat=('vat_amount', 'sum'),
+            transaction_count=('tx', 'nunique')
+        ).reset_index().rename(columns={'name': 'item_name'})
+
+        quantity = items_df['quantity'].to_numpy()
+        items_df['avg_unit_price'] = np.divide(
+            items_df['total_amount'].to_numpy(), quantity,
+            out=np.zeros(len(items_df)), where=quantity > 0
+        )
+        return items_df.sort_values('total_amount', ascending=False)
+
+    def time_profile(self, bucket_minutes=60):
+        """
+        פרופיל זמנים לטאב שעות השיא - מעבר וקטורי אחד: כל עסקה ממופה לתא (יום בשבוע, חלון זמן)
+        ו-bincount אחד נותן הכנסה ומספר עסקאות לכל תא. סיכום החלונות וסיכום הימים הם שוליים של המטריצה.
+
+        Args:
+            bucket_minutes: גודל חלון הזמן בדקות (15, 30, 60...)
+
+        Returns:
+            dict עם:
+                buckets: start_minute, label (HH:MM), revenue, transactions, avg - רק חלונות עם עסקאות
+                weekdays: day_num (ראשון=0), day_name, revenue, transactions, avg - לפי סדר השבוע הישראלי
+                heatmap: הכנסה לפי יום (שורות) × חלון (עמודות)
+        """
+        n_buckets = -(-24 * 60 // bucket_minutes)
+        timestamps = self.transactions['timestamp']
+        valid = timestamps.notna().to_numpy()
+        timestamps = timestamps[valid]
+        minutes = (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy(dtype=np.int64)
+        day_num = ((timestamps.dt.weekday + 1) % 7).to_numpy(dtype=np.int64)
+        cells = day_num * n_buckets + minutes // bucket_minutes
+
+        revenue = np.bincount(cells, weights=self.transactions['total'].to_numpy(dtype=float)[valid],
+                              minlength=7 * n_buckets).reshape(7, n_buckets)
+        counts = np.bincount(cells, minlength=7 * n_buckets).reshape(7, n_buckets)
+
+        starts = np.arange(n_buckets) * bucket_minutes
+        labels = np.array([f'{m // 60:02d}:{m % 60:02d}' for m in starts], dtype=object)
+        day_names = np.array([DAY_NAMES_HEB[(d - 1) % 7] for d in range(7)], dtype=object)
+        active_buckets = counts.sum(axis=0) > 0
+        active_days = counts.sum(axis=1) > 0
+
+        def summary(keys, revenue, counts, active):
+            frame = pd.DataFrame(keys)
+            frame['revenue'] = revenue
+            frame['transactions'] = counts
+            frame['avg'] = revenue / np.maximum(counts, 1)
+            return frame[active].reset_index(drop=True)
+
+        return {
+            'buckets': summary({'start_minute': starts, 'label': labels},
+                               revenue.sum(axis=0), counts.sum(axis=0), active_buckets),
+            'weekdays': summary({'day_num': np.arange(7), 'day_name': day_names},
+                                revenue.sum(axis=1), counts.sum(axis=1), active_days),
+            'heatmap': pd.DataFrame(revenue[np.ix_(active_days, active_buckets)],
+                                    index=pd.Index(day_names[active_days], name='day_name'),
+                                    columns=pd.Index(labels[active_buckets], name='bucket'))
+        }
+
+    def items_detail_df(self):
+        """מקביל ל-create_items_detail_df"""
+        if self.items.empty:
+            return pd.DataFrame()
+
+        tx = self.items['tx'].to_numpy()
+        timestamps = self.transactions['timestamp'].to_numpy()[tx]
+        return pd.DataFrame({
+            'Date': pd.Series(timestamps).dt.date,
+            'Time': pd.Series(timestamps).dt.time,
+            'Order ID': self.transactions['order_id'].to_numpy()[tx],
+            'Item Name': self.items['name'].to_numpy(),
+            'Item Code': self.items['code'].to_numpy(),
+            'Quantity': self.items['quantity'].to_numpy(),
+            'Unit Price': self.items['unit_price'].to_numpy(),
+            'Total Price': self.items['total_price'].to_numpy(),
+            'VAT Amount': self.items['vat_amount'].to_numpy(),
+            'Cashier': self.items['cashier'].to_numpy()
+        })